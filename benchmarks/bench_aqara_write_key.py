@@ -0,0 +1,54 @@
+"""Per-write overhead of Aqara gateway write key.
+
+"old" derives the key the way AqaraGateway.get_key did before caching: new
+AES-CBC cipher from gwpasswd, encrypt token and hex-encode on every write.
+"cached" is AqaraGateway.get_key with key cached per token, "new token" derives
+key again after every token change.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_aqara_write_key
+"""
+
+from __future__ import annotations
+import binascii
+from time import perf_counter
+from typing import Callable
+from Cryptodome.Cipher import AES
+from pyiot.zigbee.aqaragateway import AqaraGateway
+
+WRITES = 100000
+PASSWD = "fedcba9876543210"
+TOKEN = "0123456789abcdef"
+
+
+def run(name: str, call: Callable[[int], str]) -> None:
+    start = perf_counter()
+    for i in range(WRITES):
+        call(i)
+    elapsed = perf_counter() - start
+    print(f"{name:9}: {elapsed / WRITES * 1e6:6.2f} us per write")
+
+
+def main() -> None:
+    gateway = AqaraGateway("127.0.0.1", 9, sid="gw", gwpasswd=PASSWD)
+    gateway.token = TOKEN
+    iv = gateway.aes_key_iv
+
+    def old(_: int) -> str:
+        cipher = AES.new(PASSWD.encode("utf8"), AES.MODE_CBC, iv=iv)
+        return binascii.hexlify(cipher.encrypt(TOKEN.encode("utf8"))).decode()
+
+    def new_token(i: int) -> str:
+        gateway.token = f"{i:016d}"
+        return gateway.get_key()
+
+    assert old(0) == gateway.get_key()
+    run("old", old)
+    run("cached", lambda _: gateway.get_key())
+    run("new token", new_token)
+    gateway.conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Time of Bravia status refresh against a local stand-in tv answering after 20 ms.
+
+"sequential" is how the tv was refreshed before batching: getPowerStatus,
+getSystemInformation and getPlayingContentInfo one after another. "batch" and
+"async" send the same calls with BraviaApi.batch and BraviaApi.async_batch.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_bravia_batch
+"""
+
+from __future__ import annotations
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Thread
+from time import perf_counter, sleep
+from pyiot.sony.bravia import BraviaApi
+
+ROUNDS = 50
+LATENCY = 0.02
+CALLS = [
+    ("system", "getPowerStatus"),
+    ("system", "getSystemInformation"),
+    ("avContent", "getPlayingContentInfo"),
+]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        msg = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        sleep(LATENCY)
+        body = json.dumps({"result": [{"method": msg["method"]}], "id": 10}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def report(name: str, elapsed: float) -> None:
+    print(f"{name:10}: {elapsed / ROUNDS * 1000:6.1f} ms per refresh")
+
+
+def main() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    api = BraviaApi(f"127.0.0.1:{server.server_address[1]}")
+
+    start = perf_counter()
+    for _ in range(ROUNDS):
+        [api._send(*call) for call in CALLS]
+    report("sequential", perf_counter() - start)
+
+    start = perf_counter()
+    for _ in range(ROUNDS):
+        api.batch(CALLS)
+    report("batch", perf_counter() - start)
+
+    async def refresh() -> None:
+        for _ in range(ROUNDS):
+            await api.async_batch(CALLS)
+
+    start = perf_counter()
+    asyncio.run(refresh())
+    report("async", perf_counter() - start)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Construct 10k zigbee sub-devices and report how long it takes.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_device_init
+"""
+
+from __future__ import annotations
+from time import perf_counter
+from typing import Any, Dict, List
+
+from pyiot.traits import (
+    Contact,
+    HumidityStatus,
+    IlluminanceStatus,
+    MotionStatus,
+    OnOff,
+    PressureStatus,
+    TemperatureStatus,
+)
+from pyiot.zigbee import ZigbeeDevice, ZigbeeGateway
+
+COUNT = 10000
+
+
+class NullGateway(ZigbeeGateway):
+    """Gateway stub that keeps sub-devices in memory and never touches the network."""
+
+    def __init__(self) -> None:
+        self._subdevices: Dict[str, ZigbeeDevice] = {}
+
+    def set_device(self, device_id: str, payload: Dict[str, Any]) -> None:
+        pass
+
+    def send_command(self, device_id: str, argument_name: str, value: str):
+        pass
+
+    def get_device(self, device_id: str) -> Dict[str, Any]:
+        return {}
+
+    def get_device_list(self) -> List[Dict[str, Any]]:
+        return []
+
+    def set_accept_join(self, status: bool = True) -> None:
+        pass
+
+    def remove_device(self, device_id: str) -> None:
+        pass
+
+    def register_sub_device(self, device: ZigbeeDevice) -> None:
+        self._subdevices[device.status.sid] = device
+
+    def unregister_sub_device(self, device_id: str):
+        del self._subdevices[device_id]
+
+    def get_watcher(self):
+        return None
+
+
+class Weather(ZigbeeDevice, TemperatureStatus, HumidityStatus, PressureStatus):
+    def __init__(self, sid: str, gateway: ZigbeeGateway):
+        super().__init__(sid, gateway)
+        self.status.model = "weather.v1"
+        self.gateway.register_sub_device(self)
+
+
+class Motion(ZigbeeDevice, MotionStatus, IlluminanceStatus):
+    def __init__(self, sid: str, gateway: ZigbeeGateway):
+        super().__init__(sid, gateway)
+        self.status.model = "sensor_motion.aq2"
+        self.status.add_alias("lux", "illuminance")
+        self.gateway.register_sub_device(self)
+
+
+class Door(ZigbeeDevice, Contact):
+    def __init__(self, sid: str, gateway: ZigbeeGateway):
+        super().__init__(sid, gateway)
+        self.status.model = "magnet"
+        self.gateway.register_sub_device(self)
+
+    def is_open(self) -> bool:
+        return not self.status.contact
+
+    def is_close(self) -> bool:
+        return self.status.contact
+
+
+class Wall(ZigbeeDevice, OnOff):
+    def __init__(self, sid: str, gateway: ZigbeeGateway):
+        super().__init__(sid, gateway)
+        self.status.model = "ctrl_neutral1"
+        self.status.add_alias("state", "power")
+        self.gateway.register_sub_device(self)
+
+    def on(self):
+        pass
+
+    def off(self):
+        pass
+
+    def is_on(self) -> bool:
+        return self.status.power == "on"
+
+    def is_off(self) -> bool:
+        return self.status.power == "off"
+
+
+MODELS = (Weather, Motion, Door, Wall)
+
+
+def build(count: int = COUNT) -> NullGateway:
+    gateway = NullGateway()
+    for i in range(count):
+        MODELS[i % len(MODELS)](f"158d{i:010x}", gateway)
+    return gateway
+
+
+def main() -> None:
+    build(100)
+    best = float("inf")
+    for _ in range(5):
+        start = perf_counter()
+        build()
+        best = min(best, perf_counter() - start)
+    print(
+        f"construct {COUNT} zigbee devices: {best * 1000:.1f} ms "
+        f"({best / COUNT * 1e6:.2f} us/device)"
+    )
+
+
+if __name__ == "__main__":
+    main()
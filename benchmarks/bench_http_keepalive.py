@@ -0,0 +1,81 @@
+"""Requests/sec of HttpConnection against a local stand-in HTTP server.
+
+"urlopen" is how HttpConnection sent requests before the connection pool: a new
+TCP connection for every request. "pooled" is HttpConnection with keep-alive
+connections. Both post a Bravia-like JSON-RPC call from 1 and 4 threads.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_http_keepalive
+"""
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from threading import Thread
+from time import perf_counter
+from typing import Callable
+from urllib.request import Request, urlopen
+from pyiot.connections.http import HttpConnection
+
+REQUESTS = 2000
+BODY = json.dumps({"result": [{"status": "active"}], "id": 10}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, avoid Nagle delay on kept-alive socket
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def run(name: str, call: Callable[[], int], threads: int) -> None:
+    start = perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        codes = list(pool.map(lambda _: call(), range(REQUESTS)))
+    elapsed = perf_counter() - start
+    assert codes == [200] * REQUESTS
+    print(f"{name:8} threads {threads}: {REQUESTS / elapsed:8.0f} req/s")
+
+
+def main() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/sony"
+    data = json.dumps({"method": "getPowerStatus", "params": [], "id": 10})
+    conn = HttpConnection(url)
+
+    def old() -> int:
+        req = Request(
+            f"{url}/system",
+            method="POST",
+            data=data.encode(),
+            headers=dict(conn.headers),
+        )
+        with urlopen(req, timeout=5) as resp:
+            resp.read()
+            return resp.code
+
+    def pooled() -> int:
+        return conn.post("system", raw=data).code
+
+    for threads in (1, 4):
+        run("urlopen", old, threads)
+        run("pooled", pooled, threads)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Measure the memory held by the status of 10k zigbee sub-devices with tracemalloc.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_status_memory
+"""
+
+from __future__ import annotations
+import gc
+import tracemalloc
+
+from benchmarks.bench_device_init import COUNT, build
+
+
+def main() -> None:
+    build(100)
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    gateway = build()
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    total = after - before
+    print(
+        f"{len(gateway._subdevices)} devices: {total / 1024 / 1024:.2f} MiB "
+        f"({total / COUNT:.0f} B/device, peak {peak / 1024 / 1024:.2f} MiB)"
+    )
+
+
+if __name__ == "__main__":
+    main()
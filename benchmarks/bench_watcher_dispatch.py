@@ -0,0 +1,85 @@
+"""Compare thread per event dispatch with the Watcher worker pool.
+
+A synthetic driver emits 5k events/sec spread over 200 sids, every handler call
+sleeps 2 ms. Reported latency is time from emitting an event to the end
+of its handler call. Watcher without workers uses the shared pool of
+DEFAULT_WORKERS threads.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_watcher_dispatch
+"""
+
+from __future__ import annotations
+from threading import Event, Lock, Thread, active_count
+from time import monotonic, perf_counter, sleep
+from typing import Any, Callable, Dict, List, Optional
+from pyiot.watchers import Watcher, WatcherBaseDriver
+
+RATE = 5000
+SECONDS = 3
+SIDS = 200
+
+
+class SyntheticDriver(WatcherBaseDriver):
+    def __init__(self) -> None:
+        self.done = Event()
+
+    def watch(self, handler: Callable[[Optional[Dict[str, Any]]], None]) -> None:
+        tick = 0.01
+        batch = int(RATE * tick)
+        start = perf_counter()
+        for i in range(RATE * SECONDS):
+            if i % batch == 0:
+                sleep(max(0.0, start + i / RATE - perf_counter()))
+            handler({"cmd": "report", "sid": f"sid{i % SIDS}", "sent": monotonic()})
+        self.done.set()
+
+    def stop(self) -> None:
+        pass
+
+
+class ThreadPerEventWatcher(Watcher):
+    """Dispatch used before the worker pool: a new thread for every event"""
+
+    def _handler(self, msg: Dict[str, Any]) -> None:
+        Thread(target=self._handle_events, args=(msg,)).start()
+
+
+def run(watcher_class: type, **kwargs: Any) -> None:
+    latency: List[float] = []
+    lock = Lock()
+
+    def handler(event: Dict[str, Any]) -> None:
+        sleep(0.002)
+        with lock:
+            latency.append(monotonic() - event["sent"])
+
+    driver = SyntheticDriver()
+    start = perf_counter()
+    watcher = watcher_class(driver, **kwargs)
+    watcher.add_report_handler(handler)
+    threads = 0
+    while not driver.done.wait(0.005):
+        threads = max(threads, active_count())
+    while len(latency) < RATE * SECONDS and perf_counter() - start < SECONDS * 10:
+        sleep(0.01)
+    elapsed = perf_counter() - start
+    latency.sort()
+    p99 = latency[int(len(latency) * 0.99)] if latency else 0
+    print(
+        f"{watcher_class.__name__:22} {kwargs or ''}: "
+        f"{len(latency) / elapsed:7.0f} events/s, p99 {p99 * 1000:7.2f} ms, "
+        f"peak threads {threads}"
+    )
+
+
+def main() -> None:
+    run(ThreadPerEventWatcher)
+    run(Watcher, workers=4)
+    run(Watcher, workers=8)
+    run(Watcher)
+
+
+if __name__ == "__main__":
+    main()
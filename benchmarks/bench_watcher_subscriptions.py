@@ -0,0 +1,80 @@
+"""Dispatch cost with 1k handlers where 1% of them match every event.
+
+Handlers are spread over 100 device sids, 10 handlers per sid. "filter in
+handler" registers all of them with add_report_handler and every handler checks
+the sid itself (how automations were written before subscriptions), "subscribe"
+registers them with Watcher.subscribe(sid=...).
+
+Run from the repository root::
+
+    python -m benchmarks.bench_watcher_subscriptions
+"""
+
+from __future__ import annotations
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+from pyiot.watchers import Watcher, WatcherBaseDriver
+
+HANDLERS = 1000
+SIDS = 100
+EVENTS = 20000
+
+
+class NullDriver(WatcherBaseDriver):
+    def watch(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+def events() -> List[Dict[str, Any]]:
+    return [
+        {
+            "cmd": "report",
+            "sid": f"sid{i % SIDS}",
+            "model": "plug",
+            "data": {"load_power": i},
+        }
+        for i in range(EVENTS)
+    ]
+
+
+def run(subscribe: bool) -> float:
+    watcher = Watcher(NullDriver())
+    calls = [0]
+
+    for i in range(HANDLERS):
+        sid = f"sid{i % SIDS}"
+        if subscribe:
+
+            def handler(event: Dict[str, Any]) -> None:
+                calls[0] += 1
+
+            watcher.subscribe(handler, sid=sid)
+        else:
+
+            def handler(event: Dict[str, Any], sid: str = sid) -> None:
+                if event.get("sid") == sid:
+                    calls[0] += 1
+
+            watcher.add_report_handler(handler)
+
+    batch = events()
+    start = perf_counter()
+    for event in batch:
+        watcher._handle_events(event)
+    elapsed = perf_counter() - start
+    assert calls[0] == EVENTS * HANDLERS // SIDS
+    return elapsed
+
+
+def main() -> None:
+    print(f"{HANDLERS} handlers, {100 // SIDS}% match rate, {EVENTS} events")
+    for name, subscribe in (("filter in handler", False), ("subscribe", True)):
+        elapsed = run(subscribe)
+        print(f"{name:18}: {elapsed / EVENTS * 1e6:8.1f} us/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,53 @@
 from __future__ import annotations
 
 __version__ = "0.2"
-from typing import Any, Set, Dict, Tuple, List
-from pyiot.status import DeviceStatus, Attribute
+import json
+from typing import Any, Dict, Tuple
+from pyiot.status import DeviceStatus, Attribute, ReadOnlyDict
 from pyiot.traits import Trait
-from copy import deepcopy
 
 
 class BaseDevice:
-    def __new__(cls, sid: str, *args: Any, **kwargs: Any):
-        cls._traits: Set[str] = set()
-        cls._cmds: Set[str] = set()
-        cls._attr_list: List[Attribute] = []
-        cls._trait_sublases = Trait.__subclasses__()
-        cls._get_trait_list(cls.__bases__)
-        return object.__new__(cls)
+    _traits: Tuple[str, ...] = tuple()
+    _cmds: Tuple[str, ...] = tuple()
+    _attr_list: Tuple[Attribute, ...] = tuple()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """Resolve traits, commands and attributes once, when the device class is created."""
+        super().__init_subclass__(**kwargs)
+        _trait_list: Tuple[type, ...] = cls._get_trait_list()
+        cls._traits = tuple(_trait.__name__ for _trait in _trait_list)
+        cls._cmds = tuple(
+            dict.fromkeys(_cmd for _trait in _trait_list for _cmd in _trait._commands)
+        )
+        cls._attr_list = tuple(
+            _attr for _trait in _trait_list for _attr in _trait._attributes
+        )
 
     def __init__(self, sid: str) -> None:
         self.status: DeviceStatus = DeviceStatus()
         for _attr in self._attr_list:
-            self.status.register_attribute(deepcopy(_attr))
+            self.status.register_attribute(_attr)
         self.status.register_attribute(Attribute("sid", str, value=sid, readonly=True))
         self.status.register_attribute(Attribute("name", dict))
         self.status.register_attribute(Attribute("place", dict))
         self.status.register_attribute(Attribute("model", str))
 
     @classmethod
-    def _get_trait_list(cls, classes: Tuple[type, ...]) -> None:
-        for _base_class in classes:
-            if issubclass(_base_class, Trait):
-                cls._check_trait(_base_class)
-
-    @classmethod
-    def _check_trait(cls, _class: object):
-        if _class in cls._trait_sublases:
-            cls._traits.add(_class.__name__)
-            cls._cmds.update(_class._commands)
-            _attr: Attribute
-            for _attr in _class._attributes:
-                cls._attr_list.append(_attr)
-        else:
-            cls._get_trait_list(_class.__bases__)
+    def _get_trait_list(cls) -> Tuple[type, ...]:
+        return tuple(
+            _class
+            for _class in cls.__mro__
+            if Trait in _class.__bases__ and not issubclass(_class, BaseDevice)
+        )
 
     @property
     def commands(self) -> Tuple[str, ...]:
-        return tuple(self._cmds)
+        return self._cmds
 
     @property
     def traits(self) -> Tuple[str, ...]:
-        return tuple(self._traits)
+        return self._traits
 
     def execute(self, command: Tuple[str, ...]):
         cmd, *args = command
@@ -67,11 +66,17 @@ class BaseDevice:
         return cls.__bases__
 
     def device_status(self) -> Dict[str, Any]:
+        return self.status.cached("device_status", self._device_status)
+
+    def _device_status(self) -> ReadOnlyDict:
         ret = {"traits": self.traits, "commands": self.commands}
         ret.update(self.status())
-        return ret
+        return ReadOnlyDict(ret)
 
     def get_device_status(self) -> Dict[str, Any]:
+        return self.status.cached("get_device_status", self._get_device_status)
+
+    def _get_device_status(self) -> ReadOnlyDict:
         ret: Dict[str, Any] = {"traits": self.traits, "commands": self.commands}
         status = self.status()
         for item in status:
@@ -79,4 +84,9 @@ class BaseDevice:
                 ret[item] = status[item]
             else:
                 ret[item] = str(status[item])
-        return ret
+        return ReadOnlyDict(ret)
+
+    def get_device_status_json(self) -> str:
+        return self.status.cached(
+            "get_device_status_json", lambda: json.dumps(self.get_device_status())
+        )
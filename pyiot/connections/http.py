@@ -1,10 +1,102 @@
 from __future__ import annotations
-from typing import Any, Dict
-from urllib.parse import quote
-from urllib.request import urlopen, Request
-import urllib.error
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+import asyncio
+import http.client
+import io
+from functools import partial
 from base64 import b64encode
 import json
+import socket
+from threading import BoundedSemaphore, Lock
+
+# errors of reused keep-alive connection closed by server
+STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+ASYNC_STALE_ERRORS = STALE_ERRORS + (asyncio.IncompleteReadError,)
+# unread body of closed streamed response up to this size is skipped so the
+# connection can be reused, longer bodies close the connection
+DRAIN_LIMIT = 65536
+_NOT_DECODED = object()
+
+
+class HostPool:
+    """Persistent HTTP/1.1 connections to one host.
+
+    Idle connections are reused, at most max_connections are open at once,
+    next requests wait for a free connection up to their timeout.
+
+    Args:
+        scheme (str): http or https
+        host (str): host name or ip
+        port (:obj:`int`, optional): Defaults is None (scheme default).
+        max_connections (:obj:`int`, optional): Defaults is 4.
+    """
+
+    def __init__(
+        self,
+        scheme: str,
+        host: str,
+        port: Optional[int] = None,
+        max_connections: int = 4,
+    ) -> None:
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self._idle: List[http.client.HTTPConnection] = []
+        self._slots = BoundedSemaphore(max_connections)
+        self._lock = Lock()
+
+    def acquire(self, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return connection and True when it is reused idle connection, raise
+        socket.timeout when no connection is released within timeout"""
+        if not self._slots.acquire(timeout=timeout):
+            raise socket.timeout(f"{self.host} no free connection")
+        with self._lock:
+            if self._idle:
+                conn = self._idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        if self.scheme == "https":
+            return (
+                http.client.HTTPSConnection(self.host, self.port, timeout=timeout),
+                False,
+            )
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout), False
+
+    def release(self, conn: http.client.HTTPConnection, reuse: bool = True) -> None:
+        if reuse:
+            with self._lock:
+                self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools: Dict[Tuple[str, str, Optional[int]], HostPool] = {}
+_pools_lock = Lock()
+
+
+def get_pool(scheme: str, host: str, port: Optional[int] = None) -> HostPool:
+    """Return process-wide connection pool of host"""
+    with _pools_lock:
+        pool = _pools.get((scheme, host, port))
+        if pool is None:
+            pool = _pools[(scheme, host, port)] = HostPool(scheme, host, port)
+        return pool
 
 
 class HttpConnection:
@@ -32,6 +124,10 @@ class HttpConnection:
         #                          errno.ECONNABORTED, errno.EHOSTDOWN, errno.EHOSTUNREACH,
         #                          errno.ENETRESET, errno.ENETUNREACH, errno.ENETDOWN)
 
+        _url = urlsplit(self.url)
+        self._base_path: str = _url.path.rstrip("/")
+        self.pool = get_pool(_url.scheme, _url.hostname or "", _url.port)
+
         if self.user and self.password:
             self._headers[
                 "Authorization"
@@ -52,8 +148,10 @@ class HttpConnection:
     def add_header(self, key: str, value: str):
         self._headers[key] = value
 
-    def get(self, path: str = "", query: Dict[str, str] = {}) -> Response:
-        return self.request(method="GET", path=path, query=query)
+    def get(
+        self, path: str = "", query: Dict[str, str] = {}, stream: bool = False
+    ) -> Response:
+        return self.request(method="GET", path=path, query=query, stream=stream)
 
     def post(
         self,
@@ -62,9 +160,16 @@ class HttpConnection:
         raw: str = "",
         headers: Dict[str, str] = {},
         query: Dict[str, str] = {},
+        stream: bool = False,
     ) -> Response:
         return self.request(
-            path, method="POST", data=data, raw=raw, headers=headers, query=query
+            path,
+            method="POST",
+            data=data,
+            raw=raw,
+            headers=headers,
+            query=query,
+            stream=stream,
         )
 
     def put(
@@ -91,8 +196,50 @@ class HttpConnection:
         raw: str = "",
         headers: Dict[str, str] = {},
         query: Dict[str, str] = {},
+        stream: bool = False,
     ) -> Response:
-        headers.update(self.headers)
+        """Send request and return response
+
+        With stream body is not read, the connection stays with response until
+        the response is closed or its body is read.
+        """
+        url, body, headers = self._prepare(path, data, raw, headers, query)
+        while True:
+            try:
+                conn, reused = self.pool.acquire(self.timeout)
+            except socket.timeout as err:
+                return Response(TimeoutError(str(err)))
+            try:
+                conn.request(method, url, body=body, headers=headers)
+                resp = conn.getresponse()
+                if stream:
+                    return Response(resp, partial(self.pool.release, conn))
+                ret = Response(resp)
+            except STALE_ERRORS as err:
+                self.pool.release(conn, reuse=False)
+                if reused:
+                    continue
+                return Response(err)
+            except (OSError, http.client.HTTPException) as err:
+                self.pool.release(conn, reuse=False)
+                return Response(err)
+            except BaseException:
+                self.pool.release(conn, reuse=False)
+                raise
+            self.pool.release(conn, reuse=not resp.will_close)
+            return ret
+
+    def _prepare(
+        self,
+        path: str,
+        data: Dict[str, Any],
+        raw: str,
+        headers: Dict[str, str],
+        query: Dict[str, str],
+    ) -> Tuple[str, bytes, Dict[str, str]]:
+        """Return request url, body and headers"""
+        _headers = dict(headers)
+        _headers.update(self.headers)
         _query = "&".join([f"{q}={query[q]}" for q in query])
         if raw:
             _data: str = raw
@@ -107,49 +254,361 @@ class HttpConnection:
         if query:
             _query = f"?{_query}"
 
-        req = Request(
-            url=f"{self.url}/{quote(path)}{_query}",
-            method=method,
-            data=_data.encode("utf8"),
-            headers=headers,
+        return (
+            f"{self._base_path}/{quote(path)}{_query}",
+            _data.encode("utf8"),
+            _headers,
         )
+
+
+class AsyncHostPool:
+    """Persistent HTTP/1.1 streams to one host used from one event loop.
+
+    Same as HostPool for asyncio, idle streams of previous event loop are
+    dropped when pool is used from new loop.
+
+    Args:
+        scheme (str): http or https
+        host (str): host name or ip
+        port (:obj:`int`, optional): Defaults is None (scheme default).
+        max_connections (:obj:`int`, optional): Defaults is 4.
+    """
+
+    def __init__(
+        self,
+        scheme: str,
+        host: str,
+        port: Optional[int] = None,
+        max_connections: int = 4,
+    ) -> None:
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def acquire(
+        self, timeout: float
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        """Return streams and True when they are reused idle connection"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._slots is None:
+            self._loop = loop
+            self._idle = []
+            self._slots = asyncio.Semaphore(self.max_connections)
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                reader, writer = self._idle.pop()
+                if not reader.at_eof() and not writer.is_closing():
+                    return reader, writer, True
+                writer.close()
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    self.host,
+                    self.port or (443 if self.scheme == "https" else 80),
+                    ssl=True if self.scheme == "https" else None,
+                ),
+                timeout,
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        return reader, writer, False
+
+    def release(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        reuse: bool = True,
+    ) -> None:
+        if reuse:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        if self._slots is not None:
+            self._slots.release()
+
+    def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+
+class _AsyncResponse:
+    """Parsed HTTP/1.1 response with the interface of http.client response"""
+
+    def __init__(self, status: int, reason: str, headers: Any, body: bytes) -> None:
+        self.status = status
+        self.code = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.will_close = False
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self) -> bytes:
+        return self.body
+
+    @classmethod
+    async def read_from(
+        cls, reader: asyncio.StreamReader, method: str
+    ) -> _AsyncResponse:
+        line = await reader.readline()
+        if not line:
+            raise http.client.RemoteDisconnected("Remote end closed connection")
         try:
-            return Response(urlopen(req, timeout=self.timeout))
-        except urllib.error.HTTPError as err:
-            return Response(err)
-        except urllib.error.URLError as err:
-            # return TimeoutError(err)
-            return Response(err)
+            version, status, *reason = line.decode("iso-8859-1").split(None, 2)
+            code = int(status)
+        except ValueError:
+            raise http.client.BadStatusLine(repr(line))
+
+        lines: List[bytes] = []
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            lines.append(line)
+        headers = http.client.parse_headers(io.BytesIO(b"".join(lines) + b"\r\n"))
+
+        length = headers.get("Content-Length")
+        if method == "HEAD" or code in (204, 304) or 100 <= code < 200:
+            body = b""
+        elif "chunked" in headers.get("Transfer-Encoding", "").lower():
+            body = await cls._read_chunked(reader)
+        elif length is not None:
+            body = await reader.readexactly(int(length))
+        else:
+            body = await reader.read()
+            length = ""
+
+        resp = cls(code, reason[0].strip() if reason else "", headers, body)
+        connection = headers.get("Connection", "").lower()
+        resp.will_close = (
+            length == ""
+            or connection == "close"
+            or (version == "HTTP/1.0" and connection != "keep-alive")
+        )
+        return resp
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks: List[bytes] = []
+        while True:
+            line = await reader.readline()
+            try:
+                size = int(line.split(b";", 1)[0], 16)
+            except ValueError:
+                raise http.client.HTTPException(f"bad chunk size {line!r}")
+            if not size:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        while await reader.readline() not in (b"\r\n", b"\n", b""):
+            pass
+        return b"".join(chunks)
+
+
+class AsyncHttpConnection(HttpConnection):
+    """HttpConnection for asyncio.
+
+    get, post, put, delete, head and request are awaitable and return Response.
+    Keep-alive streams are reused like in HttpConnection, every connection
+    object has its own pool.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        port: int = 0,
+        timeout: int = 5,
+        user: str = "",
+        password: str = "",
+    ):
+        super().__init__(url, port, timeout, user, password)
+        self.pool = AsyncHostPool(self.pool.scheme, self.pool.host, self.pool.port)
+
+    async def request(
+        self,
+        path: str,
+        method: str = "GET",
+        data: Dict[str, Any] = {},
+        raw: str = "",
+        headers: Dict[str, str] = {},
+        query: Dict[str, str] = {},
+        stream: bool = False,
+    ) -> Response:
+        """Send request and return response, body is always read"""
+        url, body, headers = self._prepare(path, data, raw, headers, query)
+        host = self.pool.host
+        if self.pool.port:
+            host = f"{host}:{self.pool.port}"
+        lines = [
+            f"{method} {url} HTTP/1.1",
+            f"Host: {host}",
+            "Accept-Encoding: identity",
+        ]
+        if body or method in ("POST", "PUT"):
+            lines.append(f"Content-Length: {len(body)}")
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+        msg = ("\r\n".join(lines) + "\r\n\r\n").encode("iso-8859-1") + body
+
+        while True:
+            try:
+                reader, writer, reused = await self.pool.acquire(self.timeout)
+            except asyncio.TimeoutError:
+                return Response(TimeoutError(f"{self.url} connection timeout"))
+            except OSError as err:
+                return Response(err)
+            reuse = False
+            try:
+                resp = await asyncio.wait_for(
+                    self._exchange(reader, writer, method, msg), self.timeout
+                )
+                reuse = not resp.will_close
+                return Response(resp)
+            except ASYNC_STALE_ERRORS as err:
+                if reused:
+                    continue
+                return Response(err)
+            except asyncio.TimeoutError:
+                return Response(TimeoutError(f"{self.url}{url} timeout"))
+            except (OSError, http.client.HTTPException) as err:
+                return Response(err)
+            finally:
+                self.pool.release(reader, writer, reuse)
+
+    @staticmethod
+    async def _exchange(
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        method: str,
+        msg: bytes,
+    ) -> _AsyncResponse:
+        writer.write(msg)
+        await writer.drain()
+        return await _AsyncResponse.read_from(reader, method)
 
 
 class Response:
-    def __init__(self, resp: Any):
+    """HTTP response.
+
+    Body is read when it is first used and json is decoded once and cached.
+    Response of streamed request keeps its connection until the body is read
+    or the response is closed, use it as context manager when only code is
+    needed or body is read with iter_content.
+
+    Args:
+        resp: http.client response or error
+        release (:obj:`Callable`, optional): returns connection of streamed
+            response to pool, takes reuse flag. Defaults is None (body is read
+            at once).
+    """
+
+    def __init__(
+        self, resp: Any, release: Optional[Callable[[bool], None]] = None
+    ) -> None:
         self.resp = resp
-        self._headers = {}
-        self.body = ""
-        if hasattr(resp, "readable"):
-            self.body = resp.read()
-            self._headers = resp.headers
+        self._release = release
+        self._body: Optional[Any] = None
+        self._json: Any = _NOT_DECODED
+        self._streamed = False
+        if not hasattr(resp, "readable"):
+            self._body = ""
+        elif release is None:
+            self._body = resp.read()
+
+    def __enter__(self) -> Response:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        release, self._release = self._release, None
+        if release is not None:
+            release(False)
 
     @property
     def code(self) -> int:
-        return self.resp.code
+        if hasattr(self.resp, "code"):
+            return self.resp.code
+        return self.resp.status
 
     @property
     def status(self):
         return self.resp.status
 
     @property
-    def json(self) -> Dict[str, Any]:
-        try:
-            return json.loads(self.body)
-        except json.JSONDecodeError:
-            raise ValueError(self.body)
+    def body(self) -> Any:
+        if self._body is None:
+            if self._streamed:
+                raise ValueError("response body was consumed by iter_content")
+            try:
+                self._body = self.resp.read()
+            except (OSError, http.client.HTTPException):
+                self._discard()
+                raise
+            self.close()
+        return self._body
+
+    @property
+    def json(self) -> Any:
+        if self._json is _NOT_DECODED:
+            try:
+                self._json = json.loads(self.body)
+            except json.JSONDecodeError:
+                raise ValueError(self.body)
+        return self._json
 
     @property
     def headers(self):
         return self.resp.headers
 
+    def iter_content(self, chunk_size: int = 65536) -> Iterator[bytes]:
+        """Yield body in chunks without keeping it in memory"""
+        if self._body is not None:
+            if self._body:
+                yield self._body
+            return
+        self._streamed = True
+        try:
+            while True:
+                chunk = self.resp.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        except BaseException:
+            self._discard()
+            raise
+        self.close()
+
+    def close(self) -> None:
+        """Skip rest of body and return connection to pool"""
+        release, self._release = self._release, None
+        if release is None:
+            return
+        reuse = not self.resp.will_close
+        if reuse and self._body is None and not self.resp.isclosed():
+            length = self.resp.length
+            try:
+                if length is None or length > DRAIN_LIMIT:
+                    reuse = False
+                else:
+                    self.resp.read()
+            except (OSError, http.client.HTTPException):
+                reuse = False
+        release(reuse)
+
+    def _discard(self) -> None:
+        release, self._release = self._release, None
+        if release is not None:
+            release(False)
+
 
 class TimeoutError:
     def __init__(self, msg):
@@ -0,0 +1,156 @@
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future
+from threading import Lock, Thread
+from time import monotonic, sleep
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+
+class LimiterStats:
+    def __init__(self, samples: int = 1000) -> None:
+        self.sent: int = 0
+        self.dropped: int = 0
+        self.latency: Deque[float] = deque(maxlen=samples)
+
+    def latency_percentile(self, percent: float) -> float:
+        """Seconds from call to result, including time in queue"""
+        samples = sorted(self.latency)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "latency_p50": self.latency_percentile(50),
+            "latency_p99": self.latency_percentile(99),
+        }
+
+
+class _Command:
+    __slots__ = ("method", "params", "futures")
+
+    def __init__(self, method: str, params: List[Any], future: Future) -> None:
+        self.method = method
+        self.params = params
+        self.futures: List[Future] = [future]
+
+
+class CommandLimiter:
+    """Command queue of one device limited by token bucket.
+
+    Commands are sent one at a time, at most burst at once and rate per second
+    on average. Queued command of coalesce method is replaced by newer call of
+    the same method (last write wins), both callers get result of the newer one.
+    Queue is sent by calling thread, or by helper thread when the caller already
+    got its result or used submit.
+
+    Args:
+        send (Callable): sends command (method, params) and returns result
+        rate (float): commands per second
+        burst (:obj:`int`, optional): commands sent without waiting. Defaults is 1.
+        coalesce (:obj:`Iterable[str]`, optional): methods where only the newest
+            queued command is sent. Defaults is empty.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, List[Any]], Any],
+        rate: float,
+        burst: int = 1,
+        coalesce: Iterable[str] = (),
+    ) -> None:
+        self._send = send
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.coalesce = set(coalesce)
+        self.stats = LimiterStats()
+        self._tokens: float = float(self.burst)
+        self._stamp: float = monotonic()
+        self._queue: Deque[_Command] = deque()
+        self._queued: Dict[str, _Command] = {}
+        self._sending = False
+        self._lock = Lock()
+
+    def call(
+        self, method: str, params: List[Any] = [], timeout: Optional[float] = None
+    ) -> Any:
+        """Send command and wait for its result"""
+        start = monotonic()
+        future, send = self._queue_command(method, params)
+        if send:
+            self._drain(future)
+        try:
+            return future.result(timeout)
+        finally:
+            self.stats.latency.append(monotonic() - start)
+
+    def submit(self, method: str, params: List[Any] = []) -> Future:
+        """Queue command and return future of its result without waiting
+
+        Use it for coalesce methods, e.g. slider updates from one thread: every
+        call returns at once and values still waiting in queue are replaced.
+        """
+        start = monotonic()
+        future, send = self._queue_command(method, params)
+        future.add_done_callback(
+            lambda _: self.stats.latency.append(monotonic() - start)
+        )
+        if send:
+            Thread(target=self._drain, daemon=True).start()
+        return future
+
+    def _queue_command(self, method: str, params: List[Any]) -> Tuple[Future, bool]:
+        """Return future of command and True when caller has to send queue"""
+        future: Future = Future()
+        with self._lock:
+            command = self._queued.get(method)
+            if command is not None:
+                command.params = params
+                command.futures.append(future)
+                self.stats.dropped += 1
+            else:
+                command = _Command(method, params, future)
+                self._queue.append(command)
+                if method in self.coalesce:
+                    self._queued[method] = command
+            send, self._sending = not self._sending, True
+        return future, send
+
+    def _take_token(self) -> float:
+        """Return 0 when token was taken or seconds to wait for next one"""
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def _drain(self, until: Optional[Future] = None) -> None:
+        while True:
+            with self._lock:
+                if not self._queue or (until is not None and until.done()):
+                    if self._queue:
+                        Thread(target=self._drain, daemon=True).start()
+                    else:
+                        self._sending = False
+                    return
+                wait = self._take_token()
+                if not wait:
+                    command = self._queue.popleft()
+                    if self._queued.get(command.method) is command:
+                        del self._queued[command.method]
+            if wait:
+                sleep(wait)
+                continue
+            try:
+                result = self._send(command.method, command.params)
+            except Exception as err:
+                for future in command.futures:
+                    future.set_exception(err)
+            else:
+                for future in command.futures:
+                    future.set_result(result)
+            self.stats.sent += 1
@@ -12,14 +12,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .udp import UdpBroadcastConnection, UdpConnection
+from __future__ import annotations
+from concurrent.futures import Future
+from .limiter import CommandLimiter
+from .udp import UdpConnection
+from pyiot.exceptions import DeviceTimeout
 from Cryptodome.Cipher import AES
 from Cryptodome.Util.Padding import pad, unpad
 from hashlib import md5
+import selectors
+import socket
 import struct
 import json
-from datetime import datetime
-from typing import List, Any, Dict, Optional
+from threading import Lock, RLock
+from time import monotonic
+from typing import Iterable, List, Any, Dict, Optional, Tuple
 
 
 class MiioPacket:
@@ -133,50 +140,214 @@ class MiioPacket:
         )
 
 
+# Devices drop packets when flooded
+COMMAND_RATE = 5
+COMMAND_BURST = 3
+COALESCE_METHODS = (
+    "set_bright",
+    "set_cct",
+    "set_bricct",
+    "apply_fixed_scene",
+)
+
+
+HELLO = bytes.fromhex("21310020" + "ff" * 28)
+
+
+class Handshake:
+    """Device id and stamp of one device.
+
+    Stamp is device uptime in seconds, it is tracked locally from the last
+    packet received from device, so hello is needed only when stamp is unknown
+    or device stops answering.
+    """
+
+    def __init__(self) -> None:
+        self.device_id: int = 0
+        self.stamp: int = 0
+        self.synced: Optional[float] = None
+
+    @property
+    def valid(self) -> bool:
+        return self.synced is not None
+
+    def update(self, device_id: int, stamp: int) -> None:
+        self.device_id = device_id
+        self.stamp = stamp
+        self.synced = monotonic()
+
+    def invalidate(self) -> None:
+        self.synced = None
+
+    def stamp_now(self) -> int:
+        if self.synced is None:
+            return self.stamp
+        return self.stamp + int(monotonic() - self.synced)
+
+
+_handshakes: Dict[Tuple[str, int], Handshake] = {}
+_handshakes_lock = Lock()
+
+
+def get_handshake(ip: str, port: int) -> Handshake:
+    """Return process-wide handshake of device"""
+    with _handshakes_lock:
+        handshake = _handshakes.get((ip, port))
+        if handshake is None:
+            handshake = _handshakes[(ip, port)] = Handshake()
+        return handshake
+
+
+def handshake_all(
+    connections: Iterable[MiioConnection], timeout: float = 2
+) -> List[MiioConnection]:
+    """Send unicast hello to all devices with unknown stamp at once.
+
+    Replies are waited for together, so handshakes of many devices take one
+    round trip. Connections busy with a command are skipped, they handshake
+    on their own.
+
+    Args:
+        connections (Iterable[MiioConnection]): device connections
+        timeout (:obj:`float`, optional): seconds to wait for replies. Defaults is 2.
+
+    Returns:
+        List[MiioConnection]: connections without reply
+    """
+    waiting: Dict[socket.socket, MiioConnection] = {}
+    selector = selectors.DefaultSelector()
+    try:
+        for conn in connections:
+            if conn.handshake.valid or not conn.lock.acquire(blocking=False):
+                continue
+            try:
+                conn.conn.sock.sendto(HELLO, (conn.ip, conn.port))
+            except OSError as err:
+                print(f"{conn.ip} hello {err}")
+                conn.lock.release()
+                continue
+            waiting[conn.conn.sock] = conn
+            selector.register(conn.conn.sock, selectors.EVENT_READ)
+        deadline = monotonic() + timeout
+        while waiting and deadline > monotonic():
+            for key, _ in selector.select(deadline - monotonic()):
+                conn = waiting[key.fileobj]
+                try:
+                    data, addr = key.fileobj.recvfrom(1024)
+                except OSError:
+                    continue
+                if len(data) < 32 or addr[0] != conn.ip:
+                    continue
+                head = MiioPacket.parse_head(data)
+                conn.handshake.update(head["device_id"], head["stamp"])
+                selector.unregister(key.fileobj)
+                del waiting[key.fileobj]
+                conn.lock.release()
+    finally:
+        selector.close()
+        for conn in waiting.values():
+            conn.lock.release()
+    return list(waiting.values())
+
+
 class MiioConnection:
-    def __init__(self, token: str, ip: str, port: int = 54321) -> None:
-        self.broad_cast_conn = UdpBroadcastConnection()
+    """Encrypted miio commands to one device.
+
+    Hello is sent only when device stamp is unknown or device stops answering,
+    the stamp is tracked by process-wide Handshake of device.
+    """
+
+    def __init__(
+        self, token: str, ip: str, port: int = 54321, timeout: float = 2
+    ) -> None:
         self.conn = UdpConnection()
-        self._handshaked: Optional[datetime] = None
+        self.conn.sock.settimeout(timeout)
+        self.timeout = timeout
         self.ip = ip
         self.port = port
         self.packet = MiioPacket(token)
+        self.handshake = get_handshake(ip, port)
+        self.lock = RLock()
         # Remember id > 0
         self.id: int = 1
+        self.limiter = CommandLimiter(
+            self._send, COMMAND_RATE, COMMAND_BURST, COALESCE_METHODS
+        )
 
-    def check_handshake(self) -> None:
-        time_now = datetime.now()
-        hello: bytes = b"!1\x00 \xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff"
+    def check_handshake(self, force: bool = False) -> None:
+        """Send hello when device stamp is unknown
 
-        if self._handshaked is None or (time_now - self._handshaked).seconds > 10:
-            self.broad_cast_conn.send(hello, (self.ip, self.port))
-            data, addr = self.broad_cast_conn.recv()
-            self.packet.parse(data)
-            self._handshaked = time_now
+        Raises:
+            DeviceTimeout: when device does not answer
+        """
+        with self.lock:
+            if force:
+                self.handshake.invalidate()
+            if not self.handshake.valid and handshake_all([self], self.timeout):
+                raise DeviceTimeout(f"{self.ip}:{self.port} hello")
 
     def send(self, method: str, params: List[Any] = []) -> Dict[str, Any]:
+        """Send command and return reply
+
+        Raises:
+            DeviceTimeout: when device does not answer
+        """
+        return self.limiter.call(method, params)
+
+    def submit(self, method: str, params: List[Any] = []) -> Future:
+        """Queue command and return future of reply without waiting
+
+        Commands of COALESCE_METHODS still waiting in queue are replaced by
+        newer one. Errors are only raised by the future, check it when result
+        matters.
+        """
+        return self.limiter.submit(method, params)
+
+    def _send(self, method: str, params: List[Any]) -> Dict[str, Any]:
         _id: int = self.id
         if _id > 1000:
             _id = 1
-        self.id += 1
+        self.id = _id + 1
         _msg: str = json.dumps({"id": _id, "method": method, "params": params})
         _msg += "\r\n"
-        self.check_handshake()
-        self.conn.send(self.packet.generate(_msg.encode()), (self.ip, self.port))
-        self.conn.send("\r\n".encode(), (self.ip, self.port))
-        return self._get_result(_id)
+        with self.lock:
+            for attempt in range(2):
+                # device which does not answer may have restarted, its stamp is reset
+                self.check_handshake(force=attempt > 0)
+                self.packet.device_id = self.handshake.device_id
+                self.packet.stamp = self.handshake.stamp_now()
+                self.conn.send(
+                    self.packet.generate(_msg.encode()), (self.ip, self.port)
+                )
+                try:
+                    return self._get_result(_id)
+                except socket.timeout:
+                    pass
+        raise DeviceTimeout(f"{self.ip}:{self.port} {method}")
 
     def _get_result(self, _id: int) -> Dict[str, Any]:
-        ret = {}
-        data_bytes, addr = self.conn.recv()
-        if data_bytes:
+        """Wait for reply of _id, replies of earlier commands are skipped"""
+        deadline = monotonic() + self.timeout
+        while True:
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                raise socket.timeout()
+            self.conn.sock.settimeout(remaining)
+            data_bytes, addr = self.conn.sock.recvfrom(4096)
+            if len(data_bytes) < 32:
+                continue
             try:
                 data = self.packet.parse(data_bytes)
-                if data:
-                    ret: Dict[str, Any] = json.loads(data)
-                    if ret.get("id") != _id:
-                        ret.clear()
-
+            except ValueError as err:
+                print(err)
+                continue
+            self.handshake.update(self.packet.device_id, self.packet.stamp)
+            if not data:
+                continue
+            try:
+                ret: Dict[str, Any] = json.loads(data)
             except json.decoder.JSONDecodeError as err:
                 print(err)
-        return ret
+                continue
+            if ret.get("id") == _id:
+                return ret
@@ -1,7 +1,16 @@
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError
+import select
 import socket
-from typing import Tuple, Any, Dict
+from threading import Lock
+from typing import Tuple, Any, Deque, Dict, Optional
 import json
-from pyiot.exceptions import DeviceTimeout
+from pyiot.exceptions import DeviceIsOffline, DeviceTimeout
+from pyiot.watchers.reactor import Reactor, get_reactor
+
+# (reply cmd, sid) of awaited reply, empty sid matches reply from any sid
+ReplyKey = Tuple[str, str]
 
 
 class UdpConnection:
@@ -50,6 +59,120 @@ class UdpConnection:
         self.sock.close()
 
 
+class UdpRequestConnection:
+    """UDP json requests with many replies in flight on one socket.
+
+    Datagrams are read by shared reactor and matched to waiting requests by
+    (cmd, sid) of reply, the oldest request waiting for the key gets the reply.
+    Replies without waiting request (e.g. late after timeout) are dropped.
+
+    Args:
+        timeout (:obj:`float`, optional): seconds to wait for reply. Defaults is 5.
+        reactor (:obj:`Reactor`, optional): Defaults is shared reactor.
+    """
+
+    def __init__(self, timeout: float = 5, reactor: Optional[Reactor] = None) -> None:
+        self.timeout = timeout
+        self.reactor = reactor if reactor is not None else get_reactor()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.sock.bind(("0.0.0.0", 0))
+        self._pending: Dict[ReplyKey, Deque[Future]] = {}
+        self._lock = Lock()
+        self.reactor.add_datagram(self.sock, self._on_datagram)
+
+    def submit(
+        self, msg: Dict[str, Any], addr: Tuple[str, int], reply: ReplyKey
+    ) -> Future:
+        """Send msg and return future of its reply without waiting
+
+        Cancel the future to stop waiting for reply.
+        """
+        future: Future = Future()
+        with self._lock:
+            self._pending.setdefault(reply, deque()).append(future)
+        future.add_done_callback(lambda f: self._forget(reply, f))
+        try:
+            self.send(json.dumps(msg).encode(), addr)
+        except Exception:
+            future.cancel()
+            raise
+        return future
+
+    def request(
+        self,
+        msg: Dict[str, Any],
+        addr: Tuple[str, int],
+        reply: ReplyKey,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Send msg and wait for reply
+
+        Raises:
+            DeviceTimeout: when there is no reply in timeout
+        """
+        future = self.submit(msg, addr, reply)
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            future.cancel()
+            raise DeviceTimeout(f"{addr[0]}:{addr[1]} {msg.get('cmd')}")
+
+    def send(self, data: bytes, addr: Tuple[str, int]) -> None:
+        while True:
+            try:
+                self.sock.sendto(data, addr)
+                return
+            except BlockingIOError:
+                if not select.select([], [self.sock], [], self.timeout)[1]:
+                    raise DeviceTimeout(f"{addr[0]}:{addr[1]} send")
+            except OSError as err:
+                raise DeviceIsOffline(f"{addr[0]}:{addr[1]} {err}")
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return sum(len(futures) for futures in self._pending.values())
+
+    def _forget(self, reply: ReplyKey, future: Future) -> None:
+        with self._lock:
+            futures = self._pending.get(reply)
+            if futures is None:
+                return
+            try:
+                futures.remove(future)
+            except ValueError:
+                pass
+            if not futures:
+                del self._pending[reply]
+
+    def _on_datagram(self, data: bytes, addr: Tuple[str, int]) -> None:
+        try:
+            msg = json.loads(data.decode("utf-8"))
+            if isinstance(msg.get("data"), str):
+                msg["data"] = json.loads(msg.get("data"))
+        except (ValueError, AttributeError) as err:
+            print(err)
+            return
+        cmd, sid = msg.get("cmd", ""), msg.get("sid", "")
+        with self._lock:
+            futures = self._pending.get((cmd, sid)) or self._pending.get((cmd, ""))
+            future = futures.popleft() if futures else None
+        if future is not None:
+            try:
+                future.set_result(msg)
+            except InvalidStateError:
+                pass
+
+    def close(self) -> None:
+        self.reactor.remove(self.sock)
+        self.sock.close()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for futures in pending.values():
+            for future in futures:
+                if not future.done():
+                    future.set_exception(DeviceIsOffline("connection closed"))
+
+
 class UdpBroadcastConnection(UdpConnection):
     def __init__(self) -> None:
         super().__init__()
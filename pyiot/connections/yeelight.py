@@ -0,0 +1,288 @@
+from __future__ import annotations
+from concurrent.futures import Future, TimeoutError
+import json
+import select
+import socket
+from threading import Condition, Lock, Thread, Timer
+from time import monotonic, sleep
+from typing import Any, Callable, Dict, List, Optional
+from pyiot.connections import IdGen
+from pyiot.exceptions import DeviceIsOffline, DeviceTimeout
+from pyiot.watchers.reactor import Reactor, get_reactor
+
+NotificationHandler = Callable[[Dict[str, Any]], None]
+
+
+class YeelightConnection:
+    """One persistent connection to bulb used by commands and notifications.
+
+    Lines are read by shared reactor, replies are matched to commands by id,
+    lines without id (props notifications) are passed to notification handlers.
+    Many commands can wait for replies at the same time. Connection is opened on
+    first command, and reopened after reconnect_delay while there are
+    notification handlers.
+
+    Args:
+        ip (str): bulb ip
+        port (int): bulb port
+        timeout (:obj:`float`, optional): seconds to wait for reply. Defaults is 5.
+        reconnect_delay (:obj:`float`, optional): Defaults is 5.
+        reactor (:obj:`Reactor`, optional): Defaults is shared reactor.
+    """
+
+    def __init__(
+        self,
+        ip: str,
+        port: int,
+        timeout: float = 5,
+        reconnect_delay: float = 5,
+        reactor: Optional[Reactor] = None,
+    ) -> None:
+        self.ip = ip
+        self.port = port
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.reactor = reactor if reactor is not None else get_reactor()
+        self.sock: Optional[socket.socket] = None
+        self._ids = IdGen()
+        self._pending: Dict[int, Future] = {}
+        self._handlers: List[NotificationHandler] = []
+        self._lock = Lock()
+        self._send_lock = Lock()
+        self._closed = False
+
+    def add_notification_handler(self, handler: NotificationHandler) -> None:
+        self._closed = False
+        self._handlers.append(handler)
+        try:
+            self.connect()
+        except DeviceIsOffline as err:
+            print(err)
+            self._reconnect()
+
+    def remove_notification_handler(self, handler: NotificationHandler) -> None:
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    def connect(self) -> socket.socket:
+        with self._lock:
+            if self.sock is None:
+                try:
+                    sock = socket.create_connection(
+                        (self.ip, self.port), timeout=self.timeout
+                    )
+                except OSError as err:
+                    raise DeviceIsOffline(f"{self.ip}:{self.port} {err}")
+                self.reactor.add_stream(sock, self._on_line, self._on_close)
+                self.sock = sock
+            return self.sock
+
+    def request(
+        self, method: str, params: List[Any] = [], timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Send command and wait for reply
+
+        Raises:
+            DeviceIsOffline: when connection can not be opened or is closed
+            DeviceTimeout: when there is no reply in timeout
+        """
+        future: Future = Future()
+        with self._lock:
+            _id: int = self._ids.get_next_id()
+            self._pending[_id] = future
+        try:
+            msg = json.dumps({"id": _id, "method": method, "params": params})
+            self._send(self.connect(), f"{msg}\r\n".encode())
+            return future.result(self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            raise DeviceTimeout(f"{self.ip}:{self.port} {method}")
+        finally:
+            with self._lock:
+                if self._pending.get(_id) is future:
+                    del self._pending[_id]
+
+    def _send(self, sock: socket.socket, data: bytes) -> None:
+        view = memoryview(data)
+        with self._send_lock:
+            while view:
+                try:
+                    view = view[sock.send(view) :]
+                except BlockingIOError:
+                    if not select.select([], [sock], [], self.timeout)[1]:
+                        raise DeviceTimeout(f"{self.ip}:{self.port} send")
+                except OSError as err:
+                    self._on_close()
+                    raise DeviceIsOffline(f"{self.ip}:{self.port} {err}")
+
+    def _on_line(self, line: bytes) -> None:
+        try:
+            msg: Dict[str, Any] = json.loads(line)
+        except json.JSONDecodeError as err:
+            print(err)
+            return
+        if "id" in msg:
+            with self._lock:
+                future = self._pending.pop(msg["id"], None)
+            if future is not None and not future.done():
+                future.set_result(msg)
+        else:
+            for handler in list(self._handlers):
+                handler(msg)
+
+    def _on_close(self) -> None:
+        with self._lock:
+            sock, self.sock = self.sock, None
+            pending, self._pending = self._pending, {}
+        if sock is not None:
+            self.reactor.remove(sock)
+            sock.close()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(DeviceIsOffline(f"{self.ip}:{self.port} closed"))
+        if sock is not None:
+            self._reconnect()
+
+    def _reconnect(self) -> None:
+        if self._handlers and not self._closed:
+            timer = Timer(self.reconnect_delay, self._try_connect)
+            timer.daemon = True
+            timer.start()
+
+    def _try_connect(self) -> None:
+        if self._closed:
+            return
+        try:
+            self.connect()
+        except DeviceIsOffline as err:
+            print(err)
+            self._reconnect()
+
+    def close(self) -> None:
+        self._closed = True
+        self._on_close()
+
+
+def local_ip(remote_ip: str) -> str:
+    """Local address used to reach remote_ip"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect((remote_ip, 9))
+        return sock.getsockname()[0]
+
+
+class MusicServer:
+    """Local TCP server for yeelight music mode.
+
+    After set_music bulb connects to server and the connection takes over bulb
+    commands, there are no replies and no commands quota. Commands are sent to
+    all bulbs once every tick, only the newest params of each method are sent,
+    so updates between ticks replace each other.
+
+    Args:
+        host (:obj:`str`, optional): listen address. Defaults is "0.0.0.0".
+        port (:obj:`int`, optional): listen port, 0 for any free. Defaults is 0.
+        tick (:obj:`float`, optional): seconds between frames. Defaults is 0.05.
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 0, tick: float = 0.05):
+        self.tick = tick
+        self.server = socket.create_server((host, port))
+        self.port: int = self.server.getsockname()[1]
+        self._bulbs: Dict[str, socket.socket] = {}
+        self._waiting: Dict[str, Future] = {}
+        self._frames: Dict[str, Dict[str, List[Any]]] = {}
+        self._lock = Lock()
+        self._cond = Condition(self._lock)
+        self._running = True
+        Thread(target=self._accept, daemon=True).start()
+        Thread(target=self._send_frames, daemon=True).start()
+
+    def connect(self, ip: str, set_music: Callable[[str, int], Any]) -> None:
+        """Start music mode of bulb and wait for its connection
+
+        Args:
+            ip (str): bulb ip
+            set_music (Callable): sends set_music command with (host, port) to bulb
+
+        Raises:
+            DeviceTimeout: when bulb does not connect
+        """
+        future: Future = Future()
+        with self._lock:
+            self._waiting[ip] = future
+        try:
+            set_music(local_ip(ip), self.port)
+            future.result(5)
+        except TimeoutError:
+            raise DeviceTimeout(f"{ip} music mode connection")
+        finally:
+            with self._lock:
+                if self._waiting.get(ip) is future:
+                    del self._waiting[ip]
+
+    def disconnect(self, ip: str) -> None:
+        """Close bulb connection, bulb leaves music mode"""
+        with self._lock:
+            sock = self._bulbs.pop(ip, None)
+            self._frames.pop(ip, None)
+        if sock is not None:
+            sock.close()
+
+    def is_connected(self, ip: str) -> bool:
+        return ip in self._bulbs
+
+    def push(self, ip: str, method: str, params: List[Any] = []) -> None:
+        """Queue command for next frame, replaces queued params of method"""
+        with self._lock:
+            if ip not in self._bulbs:
+                raise DeviceIsOffline(f"{ip} not in music mode")
+            self._frames.setdefault(ip, {})[method] = params
+            self._cond.notify()
+
+    def close(self) -> None:
+        self._running = False
+        for ip in list(self._bulbs):
+            self.disconnect(ip)
+        self.server.shutdown(socket.SHUT_RDWR)
+        self.server.close()
+        with self._lock:
+            self._cond.notify()
+
+    def _accept(self) -> None:
+        while self._running:
+            try:
+                sock, addr = self.server.accept()
+            except OSError:
+                return
+            sock.settimeout(self.tick * 10)
+            with self._lock:
+                old = self._bulbs.pop(addr[0], None)
+                self._bulbs[addr[0]] = sock
+                future = self._waiting.get(addr[0])
+            if old is not None:
+                old.close()
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    def _send_frames(self) -> None:
+        next_tick = monotonic()
+        while self._running:
+            with self._lock:
+                while self._running and not self._frames:
+                    self._cond.wait()
+            delay = next_tick - monotonic()
+            if delay > 0:
+                sleep(delay)
+            next_tick = max(next_tick, monotonic() - self.tick) + self.tick
+            with self._lock:
+                frames, self._frames = self._frames, {}
+                socks = {ip: self._bulbs.get(ip) for ip in frames}
+            for ip, commands in frames.items():
+                data = "".join(
+                    json.dumps({"id": 1, "method": method, "params": params}) + "\r\n"
+                    for method, params in commands.items()
+                )
+                try:
+                    socks[ip].sendall(data.encode())
+                except (OSError, AttributeError) as err:
+                    print(f"{ip} music mode {err}")
+                    self.disconnect(ip)
@@ -0,0 +1,194 @@
+"""Columnar store of numeric device attributes.
+
+Needs numpy, which is an optional dependency of pyiot and is imported only
+when this module is used.
+"""
+
+from __future__ import annotations
+import numpy as np
+from threading import Lock
+from pyiot import BaseDevice
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+NUMERIC_TYPES = (int, float)
+
+
+class FleetStore:
+    """Mirror numeric attributes of many devices in numpy arrays.
+
+    Every column holds one attribute and every row one device sid, empty (never
+    set) or not numeric values are stored as NaN. Columns are created for attributes of type
+    int or float and for attributes named in ``columns`` (e.g. temperature which
+    is reported as string). Rows are updated from DeviceStatus on every change.
+
+    Args:
+        columns (:obj:`list`, optional): additional attribute names to mirror
+        capacity (:obj:`int`, optional): initial number of rows
+    """
+
+    def __init__(self, columns: Iterable[str] = (), capacity: int = 64) -> None:
+        self._extra_columns = frozenset(columns)
+        self._capacity = max(capacity, 1)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._rows: Dict[str, int] = {}
+        self._sids: List[str] = []
+        self._listeners: Dict[str, Tuple[BaseDevice, Callable[[str, Any], None]]] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._sids)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._rows
+
+    @property
+    def sid_list(self) -> List[str]:
+        return list(self._sids)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def add_device(self, device: BaseDevice) -> None:
+        sid: str = device.status.sid
+        if sid in self._rows:
+            raise ValueError(f"Device {sid} already in store")
+        with self._lock:
+            row = len(self._sids)
+            if row == self._capacity:
+                self._grow()
+            self._rows[sid] = row
+            self._sids.append(sid)
+            for attr in device.status.schema.attributes:
+                value = device.status.get(attr.name)
+                if value is None or not self._is_column(attr.name, attr.attr_type):
+                    continue
+                # type default of never changed attribute is empty, not 0
+                if value == attr.attr_type() and not device.status.is_changed(
+                    attr.name, 0
+                ):
+                    continue
+                self._column(attr.name)[row] = self._to_float(value)
+
+        def listener(name: str, value: Any) -> None:
+            self.set(sid, name, value)
+
+        device.status.add_listener(listener)
+        self._listeners[sid] = (device, listener)
+
+    def remove_device(self, sid: str) -> None:
+        device, listener = self._listeners.pop(sid)
+        device.status.remove_listener(listener)
+        with self._lock:
+            row = self._rows.pop(sid)
+            last = len(self._sids) - 1
+            if row != last:
+                last_sid = self._sids[last]
+                self._sids[row] = last_sid
+                self._rows[last_sid] = row
+                for column in self._columns.values():
+                    column[row] = column[last]
+            for column in self._columns.values():
+                column[last] = np.nan
+            self._sids.pop()
+
+    def set(self, sid: str, name: str, value: Any) -> None:
+        with self._lock:
+            row = self._rows.get(sid)
+            if row is None:
+                return
+            column = self._columns.get(name)
+            if column is None:
+                if name not in self._extra_columns and (
+                    isinstance(value, bool) or not isinstance(value, NUMERIC_TYPES)
+                ):
+                    return
+                column = self._column(name)
+            column[row] = self._to_float(value)
+
+    def column(self, name: str) -> np.ndarray:
+        """Return copy of attribute values, row order matches sid_list"""
+        with self._lock:
+            return self._copy(name)
+
+    def select(self, mask: np.ndarray) -> List[str]:
+        """Return sids of rows where mask is True
+
+        Example:
+            low = store.column("linkquality") < 30
+            low |= store.column("voltage") < store.column("low_voltage")
+            sids = store.select(low)
+
+        Rows are mapped to sids under lock, rows of devices removed after the mask
+        was computed are skipped.
+        """
+        with self._lock:
+            sids = self._sids
+            return [sids[row] for row in np.flatnonzero(mask) if row < len(sids)]
+
+    def aggregate(self, name: str, func: str = "mean") -> float:
+        """Aggregate column ignoring missing values: mean, min, max, sum or count"""
+        column = self.column(name)
+        if func == "count":
+            return int(np.count_nonzero(~np.isnan(column)))
+        funcs = {
+            "mean": np.nanmean,
+            "min": np.nanmin,
+            "max": np.nanmax,
+            "sum": np.nansum,
+        }
+        if func not in funcs:
+            raise ValueError(f"Unknown aggregate {func}")
+        if not np.any(~np.isnan(column)):
+            return float("nan")
+        return float(funcs[func](column))
+
+    def top_k(self, name: str, k: int, largest: bool = True) -> List[Tuple[str, float]]:
+        """Return k sids with largest (or smallest) values of attribute"""
+        with self._lock:
+            column = self._copy(name)
+            sids = list(self._sids)
+        rows = np.flatnonzero(~np.isnan(column))
+        if not len(rows) or k <= 0:
+            return []
+        values = column[rows] if not largest else -column[rows]
+        if k < len(rows):
+            part = np.argpartition(values, k - 1)[:k]
+        else:
+            part = np.arange(len(rows))
+        part = part[np.argsort(values[part], kind="stable")]
+        return [(sids[rows[i]], float(column[rows[i]])) for i in part]
+
+    def _is_column(self, name: str, attr_type: Any) -> bool:
+        return (
+            name in self._columns
+            or name in self._extra_columns
+            or (attr_type in NUMERIC_TYPES and attr_type is not bool)
+        )
+
+    def _copy(self, name: str) -> np.ndarray:
+        column = self._columns.get(name)
+        if column is None:
+            return np.full(len(self._sids), np.nan)
+        return column[: len(self._sids)].copy()
+
+    def _column(self, name: str) -> np.ndarray:
+        column = self._columns.get(name)
+        if column is None:
+            column = np.full(self._capacity, np.nan)
+            self._columns[name] = column
+        return column
+
+    def _grow(self) -> None:
+        self._capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.full(self._capacity, np.nan)
+            grown[: len(column)] = column
+            self._columns[name] = grown
+
+    @staticmethod
+    def _to_float(value: Any) -> float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
@@ -0,0 +1,134 @@
+from __future__ import annotations
+from threading import RLock
+from pyiot import BaseDevice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+INDEXES = ("model", "trait", "place", "name")
+
+
+class DeviceRegistry:
+    """Keep track of devices with indexes by sid, model, trait, place and name.
+
+    Place and name are dict attributes (language: value), device is indexed under
+    every value. Indexes follow changes of model, place and name attributes.
+    Changing place or name dict in place doesn't notify status listeners, assign
+    a new dict or call reindex afterwards.
+    """
+
+    def __init__(self) -> None:
+        self._devices: Dict[str, BaseDevice] = {}
+        self._indexes: Dict[str, Dict[str, Set[str]]] = {index: {} for index in INDEXES}
+        self._keys: Dict[str, Dict[str, Tuple[str, ...]]] = {}
+        self._listeners: Dict[str, Callable[[str, Any], None]] = {}
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._devices
+
+    def __iter__(self) -> Iterator[BaseDevice]:
+        return iter(list(self._devices.values()))
+
+    def add(self, device: BaseDevice) -> None:
+        sid: str = device.status.sid
+        with self._lock:
+            if sid in self._devices:
+                raise ValueError(f"Device {sid} already registered")
+            self._devices[sid] = device
+            self._keys[sid] = {}
+            self._index(sid, "trait", device.traits)
+            for attr in ("model", "place", "name"):
+                self._index(sid, attr, self._attr_keys(device.status.get(attr)))
+
+        def listener(name: str, value: Any) -> None:
+            if name in ("model", "place", "name"):
+                with self._lock:
+                    if sid in self._devices:
+                        self._index(sid, name, self._attr_keys(value))
+
+        device.status.add_listener(listener)
+        self._listeners[sid] = listener
+
+    def remove(self, sid: str) -> None:
+        with self._lock:
+            device = self._devices.pop(sid)
+            for index in INDEXES:
+                self._index(sid, index, tuple())
+            del self._keys[sid]
+        device.status.remove_listener(self._listeners.pop(sid))
+
+    def reindex(self, device: BaseDevice) -> None:
+        """Index model, place and name of registered device again"""
+        sid: str = device.status.sid
+        with self._lock:
+            if self._devices.get(sid) is not device:
+                raise ValueError(f"Device {sid} not registered")
+            for attr in ("model", "place", "name"):
+                self._index(sid, attr, self._attr_keys(device.status.get(attr)))
+
+    def get(self, sid: str) -> Optional[BaseDevice]:
+        return self._devices.get(sid)
+
+    def by_model(self, model: str) -> List[BaseDevice]:
+        return self.find(model=model)
+
+    def by_trait(self, trait: str) -> List[BaseDevice]:
+        return self.find(trait=trait)
+
+    def by_place(self, place: str) -> List[BaseDevice]:
+        return self.find(place=place)
+
+    def by_name(self, name: str) -> List[BaseDevice]:
+        return self.find(name=name)
+
+    def find(
+        self,
+        model: Optional[str] = None,
+        trait: Optional[str] = None,
+        place: Optional[str] = None,
+        name: Optional[str] = None,
+    ) -> List[BaseDevice]:
+        """Return devices matching all given criteria
+
+        Example:
+            registry.find(trait="OnOff", place="kitchen")
+        """
+        query = {"model": model, "trait": trait, "place": place, "name": name}
+        with self._lock:
+            sets = [
+                self._indexes[index].get(key, set())
+                for index, key in query.items()
+                if key is not None
+            ]
+            if not sets:
+                return list(self._devices.values())
+            sets.sort(key=len)
+            smallest, others = sets[0], sets[1:]
+            return [
+                self._devices[sid]
+                for sid in smallest
+                if all(sid in other for other in others)
+            ]
+
+    def _index(self, sid: str, index: str, keys: Tuple[str, ...]) -> None:
+        _index = self._indexes[index]
+        old: Tuple[str, ...] = self._keys[sid].get(index, tuple())
+        for key in old:
+            if key not in keys:
+                sids = _index[key]
+                sids.discard(sid)
+                if not sids:
+                    del _index[key]
+        for key in keys:
+            _index.setdefault(key, set()).add(sid)
+        self._keys[sid][index] = keys
+
+    @staticmethod
+    def _attr_keys(value: Any) -> Tuple[str, ...]:
+        if isinstance(value, dict):
+            return tuple(dict.fromkeys(str(v) for v in value.values() if v))
+        elif value:
+            return (str(value),)
+        return tuple()
@@ -1,7 +1,7 @@
 __all__ = ["PowerState", "Pulse", "Mini", "DiyPlug"]
 
 from pyiot.watchers.sonoff import EwelinkWatcher
-from pyiot.connections.http import HttpConnection
+from pyiot.connections.http import AsyncHttpConnection, HttpConnection, Response
 from pyiot.traits import OnOff
 from pyiot.watchers import Watcher
 from pyiot.discover.sonoff import DiscoverSonoff
@@ -58,6 +58,9 @@ class BaseSONOFFDIYDevice(BaseDevice, OnOff):
         self.conn = HttpConnection(
             url=f"http://{self.status.ip}", port=self.status.port
         )
+        self.aconn = AsyncHttpConnection(
+            url=f"http://{self.status.ip}", port=self.status.port
+        )
         self.watcher = Watcher(EwelinkWatcher())
         self.watcher.add_report_handler(self.report)
 
@@ -75,11 +78,15 @@ class BaseSONOFFDIYDevice(BaseDevice, OnOff):
 
     def on(self):
         """Set power state on"""
-        self.conn.post(path="zeroconf/switch", data=self._cmd(switch="on"))
+        self.conn.post(
+            path="zeroconf/switch", data=self._cmd(switch="on"), stream=True
+        ).close()
 
     def off(self):
         """Set power state on"""
-        self.conn.post(path="zeroconf/switch", data=self._cmd(switch="off"))
+        self.conn.post(
+            path="zeroconf/switch", data=self._cmd(switch="off"), stream=True
+        ).close()
 
     def is_on(self):
         return self.status.power == "on"
@@ -93,7 +100,11 @@ class BaseSONOFFDIYDevice(BaseDevice, OnOff):
         Args:
             state (PowerState)
         """
-        self.conn.post(path="zeroconf/startup", data=self._cmd(startup=state.value))
+        self.conn.post(
+            path="zeroconf/startup",
+            data=self._cmd(startup=state.value),
+            stream=True,
+        ).close()
 
     def set_pulse(self, pulse: str, pulse_width: int = 500):
         """Set pulse
@@ -108,16 +119,39 @@ class BaseSONOFFDIYDevice(BaseDevice, OnOff):
         self.conn.post(
             path="zeroconf/pulse",
             data=self._cmd(pulse=pulse.value, pulseWidth=pulse_width),
-        )
+            stream=True,
+        ).close()
 
     def set_wifi(self, ssid: str, password: str):
         self.conn.post(
-            path="zeroconf/wifi", data=self._cmd(ssid=ssid, password=password)
-        )
+            path="zeroconf/wifi",
+            data=self._cmd(ssid=ssid, password=password),
+            stream=True,
+        ).close()
 
     def get_info(self) -> Dict[str, Any]:
+        return self._parse_info(self.conn.post(path="zeroconf/info", data=self._cmd()))
+
+    async def async_get_info(self) -> Dict[str, Any]:
+        return self._parse_info(
+            await self.aconn.post(path="zeroconf/info", data=self._cmd())
+        )
+
+    def get_signal_strength(self) -> int:
+        """The WiFi signal strength currently received by the device, negative integer, dBm"""
+        return self._parse_signal_strength(
+            self.conn.post(path="zeroconf/signal_strength", data=self._cmd())
+        )
+
+    async def async_get_signal_strength(self) -> int:
+        """Awaitable get_signal_strength"""
+        return self._parse_signal_strength(
+            await self.aconn.post(path="zeroconf/signal_strength", data=self._cmd())
+        )
+
+    @staticmethod
+    def _parse_info(resp: Response) -> Dict[str, Any]:
         ret: Dict[str, Any] = {}
-        resp = self.conn.post(path="zeroconf/info", data=self._cmd())
         if resp.code == 200:
             _data = resp.json.get("data", {})
             if type(_data) == str:
@@ -126,9 +160,8 @@ class BaseSONOFFDIYDevice(BaseDevice, OnOff):
                 ret = _data.copy()
         return ret
 
-    def get_signal_strength(self) -> int:
-        """The WiFi signal strength currently received by the device, negative integer, dBm"""
-        resp = self.conn.post(path="zeroconf/signal_strength", data=self._cmd())
+    @staticmethod
+    def _parse_signal_strength(resp: Response) -> int:
         if resp.code == 200:
             return resp.json
         else:
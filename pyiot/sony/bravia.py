@@ -1,8 +1,14 @@
 from pyiot.watchers.sony import BraviaWatcher
 from pyiot.watchers import Watcher
 from pyiot.status import Attribute
-from pyiot.connections.http import HttpConnection, Response
+from pyiot.connections.http import (
+    AsyncHttpConnection,
+    HttpConnection,
+    Response,
+    TimeoutError as RequestTimeout,
+)
 from pyiot import BaseDevice
+from pyiot.exceptions import DeviceIsOffline, DeviceTimeout
 from pyiot.traits import (
     Arrows,
     ButtonExit,
@@ -13,12 +19,13 @@ from pyiot.traits import (
     OnOff,
     Volume,
 )
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import socket
 import struct
+from threading import Lock
 from time import sleep
-from typing import Dict, Any, List
-from threading import Event
-
+from typing import Any, Dict, Iterable, List, Optional, Sequence
 
 # Copyright 2019 AngrySoft Sebastian Zwierzchowski
 #
@@ -34,11 +41,28 @@ from threading import Event
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+# (service, method) or (service, method, params) of one JSON-RPC call
+BraviaCall = Sequence[Any]
+
+_batch_executor: Optional[ThreadPoolExecutor] = None
+_batch_lock = Lock()
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """Return process-wide threads sending batched calls of all tvs"""
+    global _batch_executor
+    with _batch_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(8, thread_name_prefix="bravia")
+        return _batch_executor
+
 
 class BraviaApi:
     def __init__(self, ip: str, mac: str = "", psk: str = "0000") -> None:
         self.conn = HttpConnection(f"http://{ip}/sony")
         self.conn.add_header("X-Auth-PSK", psk)
+        self.aconn = AsyncHttpConnection(f"http://{ip}/sony")
+        self.aconn.add_header("X-Auth-PSK", psk)
         self.mac = mac
         self.ircc_codes: Dict[str, Any] = {}
 
@@ -53,11 +77,7 @@ class BraviaApi:
             if ret.code == 200:
                 result = ret.json
                 if "result" in result:
-                    status = result["result"][0].get("status")
-                    if status == "standby":
-                        power = "standby"
-                    elif status == "active":
-                        power = "on"
+                    power = self.parse_power(result["result"][0])
         except socket.error:
             pass
         except Exception:
@@ -65,6 +85,16 @@ class BraviaApi:
 
         return power
 
+    @staticmethod
+    def parse_power(result: Any) -> str:
+        """Power status (on, standby or off) from result of getPowerStatus"""
+        status = result.get("status") if type(result) is dict else None
+        if status == "standby":
+            return "standby"
+        elif status == "active":
+            return "on"
+        return "off"
+
     def on(self):
         """Power on tv"""
         # TODO: check if this wakeup tv when is in standby mode
@@ -189,7 +219,12 @@ class BraviaApi:
         )
 
     def get_all_commands(self) -> Dict[str, Any]:
-        ret = self.conn.post(path="system", data=self._cmd("getRemoteControllerInfo"))
+        return self._parse_commands(
+            self.conn.post(path="system", data=self._cmd("getRemoteControllerInfo"))
+        )
+
+    @staticmethod
+    def _parse_commands(ret: Response) -> Dict[str, Any]:
         try:
             result = ret.json["result"][1]
             commands: Dict[str, Any] = dict()
@@ -225,9 +260,22 @@ class BraviaApi:
         Args:
             name (str): name of command to send
         """
+        if not self.ircc_codes:
+            self.ircc_codes = self.get_all_commands()
+        self.conn.post(path="IRCC", stream=True, **self._ircc(name)).close()
+
+    async def async_send_ircc(self, name: str):
+        """Awaitable send_ircc"""
+        if not self.ircc_codes:
+            self.ircc_codes = self._parse_commands(
+                await self.aconn.post(
+                    path="system", data=self._cmd("getRemoteControllerInfo")
+                )
+            )
+        await self.aconn.post(path="IRCC", **self._ircc(name))
+
+    def _ircc(self, name: str) -> Dict[str, Any]:
         try:
-            if not self.ircc_codes:
-                self.ircc_codes = self.get_all_commands()
             code = self.ircc_codes.get(name)
         except AttributeError:
             raise BraviaError(message=f"Ircc name not recognize {name}")
@@ -247,7 +295,7 @@ class BraviaApi:
             f"</s:Body>"
             f"</s:Envelope>"
         )
-        self.conn.post(path="IRCC", headers=headers, raw=data)
+        return {"headers": headers, "raw": data}
 
     @staticmethod
     def _cmd(
@@ -258,10 +306,78 @@ class BraviaApi:
     def _send(self, path: str, cmd: str, params: List[Any] = []) -> Dict[str, Any]:
         ret: Dict[str, Any] = {}
         resp = self.conn.post(path=path, data=self._cmd(cmd, params))
+        self._check_response(resp)
         if resp.code == 200:
             ret = self._parse_result(resp.json)
         return ret
 
+    async def _async_send(
+        self, path: str, cmd: str, params: List[Any] = []
+    ) -> Dict[str, Any]:
+        ret: Dict[str, Any] = {}
+        resp = await self.aconn.post(path=path, data=self._cmd(cmd, params))
+        self._check_response(resp)
+        if resp.code == 200:
+            ret = self._parse_result(resp.json)
+        return ret
+
+    def batch(
+        self, calls: Iterable[BraviaCall], return_exceptions: bool = False
+    ) -> List[Any]:
+        """Send JSON-RPC calls concurrently over pooled connections.
+
+        First call is sent by calling thread, others by shared batch threads,
+        so batch costs about one round trip.
+
+        Args:
+            calls (Iterable[BraviaCall]): (service, method[, params]) tuples
+            return_exceptions (:obj:`bool`, optional): put errors in results
+                instead of raising first one. Defaults is False.
+
+        Returns:
+            List[Any]: results parsed with _parse_result in order of calls
+        """
+        calls = list(calls)
+        if not calls:
+            return []
+        executor = get_batch_executor()
+        futures = [executor.submit(self._send, *call) for call in calls[1:]]
+        results: List[Any] = []
+        try:
+            results.append(self._send(*calls[0]))
+        except Exception as err:
+            results.append(err)
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as err:
+                results.append(err)
+        return self._batch_results(results, return_exceptions)
+
+    async def async_batch(
+        self, calls: Iterable[BraviaCall], return_exceptions: bool = False
+    ) -> List[Any]:
+        """Awaitable batch"""
+        results = await asyncio.gather(
+            *(self._async_send(*call) for call in calls), return_exceptions=True
+        )
+        return self._batch_results(results, return_exceptions)
+
+    @staticmethod
+    def _batch_results(results: List[Any], return_exceptions: bool) -> List[Any]:
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
+
+    def _check_response(self, resp: Response) -> None:
+        """Raise DeviceTimeout or DeviceIsOffline when request got no response"""
+        if isinstance(resp.resp, (RequestTimeout, socket.timeout)):
+            raise DeviceTimeout(f"{self.conn.url} timeout")
+        if isinstance(resp.resp, Exception):
+            raise DeviceIsOffline(f"{self.conn.url} {resp.resp}")
+
     def _parse_result(self, msg: Dict[str, Any]) -> Dict[str, Any]:
         ret: Dict[str, Any] = {}
         if type(msg) is dict:
@@ -294,22 +410,38 @@ class KDL48W585B(
         self.status.register_attribute(Attribute("psk", str, value=psk))
         self.status.register_attribute(Attribute("mac", str, value=mac))
         self.status.add_alias("dispNum", "channel")
-        self._event: Event = None
         self.dev_api = BraviaApi(ip, mac, psk)
         self._dev_init()
         self.watcher = Watcher(BraviaWatcher(30, self))
 
     def _dev_init(self):
-        if self.is_on():
-            self.status.update(self.dev_api.get_system_info())
+        try:
+            self._refresh(
+                ("system", "getSystemInformation"),
+                ("avContent", "getPlayingContentInfo"),
+            )
+        except (DeviceIsOffline, DeviceTimeout) as err:
+            print(err)
 
     def refresh_status(self):
-        if self.is_on():
-            data = self.dev_api.get_content_info()
-            if data:
+        self._refresh(("avContent", "getPlayingContentInfo"))
+
+    def _refresh(self, *calls: BraviaCall) -> None:
+        """Read power status and calls results in one batch, raise DeviceIsOffline
+        or DeviceTimeout when tv doesn't answer power status"""
+        power, *results = self.dev_api.batch(
+            [("system", "getPowerStatus"), *calls], return_exceptions=True
+        )
+        self.status.power = self.dev_api.parse_power(power)
+        if isinstance(power, (DeviceIsOffline, DeviceTimeout)):
+            raise power
+        if self.status.power != "on":
+            return
+        for data in results:
+            if isinstance(data, Exception):
+                print(data)
+            elif data:
                 self.status.update(data)
-        if isinstance(self._event, Event) and not self._event.is_set():
-            self._event.set()
 
     def on(self):
         self.dev_api.on()
@@ -1,4 +1,7 @@
-from typing import Any, Dict, Optional, Callable, List
+from __future__ import annotations
+from copy import copy, deepcopy
+import json
+from typing import Any, Dict, Optional, Callable, List, Tuple
 
 
 class Attribute:
@@ -30,85 +33,278 @@ class Attribute:
     def name(self) -> str:
         return self._name
 
+    @property
+    def attr_type(self) -> Any:
+        return self._type
+
+    @property
+    def signature(self) -> Tuple[Any, ...]:
+        """Everything that describes the attribute except its value"""
+        return (self._name, self._type, self._readonly, self._oneshot, self._setter)
+
     @property
     def value(self) -> Any:
         return self._value
 
     @value.setter
     def value(self, _value: Any):
-        if self.readonly:
-            if not self._value and self._oneshot:
-                self.__set_value(_value)
-            else:
-                raise AttributeError(f"{self._name} is readonly")
-        else:
-            self.__set_value(_value)
+        self._value = self.convert(self._value, _value)
+
+    def convert(self, current: Any, _value: Any) -> Any:
+        """Check if value can replace current value and return it in attribute type"""
+        if self.readonly and (current or not self._oneshot):
+            raise AttributeError(f"{self._name} is readonly")
+        if type(_value) == type(current):
+            return _value
+        return self._type(_value)
+
+
+class StatusSchema:
+    """Immutable list of attributes with index of names and aliases.
+
+    Schemas are shared between statuses, registering an attribute or an alias returns
+    a new schema cached on the parent, so devices of the same class which register
+    the same attributes in the same order end up with the same schema object.
+    """
+
+    __slots__ = ("_attributes", "_index", "_transitions")
+
+    def __init__(
+        self,
+        attributes: Tuple[Attribute, ...] = tuple(),
+        index: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self._attributes: Tuple[Attribute, ...] = attributes
+        self._index: Dict[str, int] = index or {}
+        self._transitions: Dict[Tuple[Any, ...], StatusSchema] = {}
+
+    @property
+    def attributes(self) -> Tuple[Attribute, ...]:
+        return self._attributes
+
+    def index(self, name: str) -> int:
+        return self._index[name]
+
+    def get_index(self, name: str, default: int = -1) -> int:
+        return self._index.get(name, default)
+
+    def names(self) -> List[str]:
+        return list(self._index)
+
+    def items(self):
+        return self._index.items()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def __len__(self) -> int:
+        return len(self._attributes)
+
+    def with_attribute(self, attr: Attribute) -> StatusSchema:
+        if attr.name in self._index:
+            raise AttributeError(f"Attribute with name {attr.name} already registred")
+        key = ("attr",) + attr.signature
+        schema = self._transitions.get(key)
+        if schema is None:
+            index = self._index.copy()
+            index[attr.name] = len(self._attributes)
+            schema = StatusSchema(self._attributes + (attr,), index)
+            self._transitions[key] = schema
+        return schema
+
+    def with_alias(self, alias_name: str, attribute_name: str) -> StatusSchema:
+        if alias_name in self._index:
+            raise ValueError("Alias or attribute allready exist")
+        elif attribute_name not in self._index:
+            raise ValueError(f"No registered attribute named {attribute_name}")
+        key = ("alias", alias_name, attribute_name)
+        schema = self._transitions.get(key)
+        if schema is None:
+            index = self._index.copy()
+            index[alias_name] = self._index[attribute_name]
+            schema = StatusSchema(self._attributes, index)
+            self._transitions[key] = schema
+        return schema
+
+    def without(self, attr_name: str) -> Tuple[StatusSchema, Tuple[int, ...]]:
+        """Return schema without attribute and its aliases, and the indexes of values to keep"""
+        removed = self._index[attr_name]
+        keep = tuple(i for i in range(len(self._attributes)) if i != removed)
+        index = {
+            name: (i if i < removed else i - 1)
+            for name, i in self._index.items()
+            if i != removed
+        }
+        return (
+            StatusSchema(tuple(self._attributes[i] for i in keep), index),
+            keep,
+        )
+
+
+_root_schema = StatusSchema()
 
-    def __set_value(self, _value: Any):
-        if type(_value) == type(self._value):
-            self._value = _value
-        else:
-            self._value = self._type(_value)
+
+class ReadOnlyDict(dict):
+    """Dict snapshot shared between readers, copy it to get mutable dict"""
+
+    def _readonly(self, *args: Any, **kwargs: Any) -> None:
+        raise TypeError("status snapshot is read-only")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __copy__(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[str, Any]:
+        return deepcopy(dict(self), memo)
 
 
 class DeviceStatus(object):
+    __slots__ = ("_schema", "_values", "_changed", "_version", "_cache", "_listeners")
+
     def __init__(self) -> None:
-        self.__dict__["_attributes"] = {}
-        self.__dict__["_empty"] = Attribute("_empty", str)
+        object.__setattr__(self, "_schema", _root_schema)
+        object.__setattr__(self, "_values", [])
+        object.__setattr__(self, "_changed", [])
+        object.__setattr__(self, "_version", 0)
+        object.__setattr__(self, "_cache", {})
+        object.__setattr__(self, "_listeners", tuple())
+
+    @property
+    def schema(self) -> StatusSchema:
+        return self._schema
+
+    @property
+    def version(self) -> int:
+        """Monotonic counter bumped on every attribute value change"""
+        return self._version
+
+    @property
+    def snapshot_key(self) -> Tuple[int, StatusSchema]:
+        """Changes whenever status snapshot would be different"""
+        return (self._version, self._schema)
+
+    def cached(self, name: str, build: Callable[[], Any]) -> Any:
+        """Return value cached under name, build it again only if status has changed"""
+        key = self.snapshot_key
+        entry = self._cache.get(name)
+        if entry is None or entry[0] != key:
+            entry = (key, build())
+            self._cache[name] = entry
+        return entry[1]
+
+    def add_listener(self, listener: Callable[[str, Any], None]) -> None:
+        """Call listener with attribute name and new value on every value change"""
+        object.__setattr__(self, "_listeners", self._listeners + (listener,))
+
+    def remove_listener(self, listener: Callable[[str, Any], None]) -> None:
+        object.__setattr__(
+            self, "_listeners", tuple(l for l in self._listeners if l != listener)
+        )
 
     def register_attribute(self, attr: Attribute) -> None:
-        if attr.name in self._attributes:
-            raise AttributeError(f"Attribute with name {attr.name} already registred")
-        self._attributes[attr.name] = attr
+        object.__setattr__(self, "_schema", self._schema.with_attribute(attr))
+        self._values.append(copy(attr.value))
+        self._changed.append(0)
 
     def unregister_attribute(self, attr_name: str) -> None:
-        if attr_name in self._attributes:
-            attr: Attribute = self._attributes[attr_name]
-            for _attr in self._attributes:
-                if attr is self._attributes[_attr]:
-                    del self._attributes[_attr]
+        if attr_name in self._schema:
+            schema, keep = self._schema.without(attr_name)
+            object.__setattr__(self, "_schema", schema)
+            object.__setattr__(self, "_values", [self._values[i] for i in keep])
+            object.__setattr__(self, "_changed", [self._changed[i] for i in keep])
 
     def add_alias(self, alias_name: str, attribute_name: str) -> None:
-        if alias_name in self._attributes:
-            raise ValueError("Alias or attribute allready exist")
-        elif attribute_name in self._attributes:
-            self._attributes[alias_name] = self._attributes[attribute_name]
-        else:
-            raise ValueError(f"No registered attribute named {attribute_name}")
+        object.__setattr__(
+            self, "_schema", self._schema.with_alias(alias_name, attribute_name)
+        )
 
-    def update(self, value: Dict[str, Any]) -> None:
+    def update(self, value: Dict[str, Any]) -> Dict[str, Any]:
+        """Set attributes from dict and return the ones which value has changed"""
+        ret: Dict[str, Any] = {}
         _data = value.get("data", value)
         for _name in _data:
             try:
-                self.set(_name, _data[_name])
+                if self.set(_name, _data[_name]):
+                    ret[_name] = self.get(_name)
             except AttributeError:
                 pass
+        return ret
 
     def get(self, name: str) -> Any:
-        return self._attributes.get(name, self._empty).value
+        idx = self._schema.get_index(name)
+        if idx < 0:
+            return ""
+        return self._values[idx]
+
+    def set(self, name: str, value: Any) -> bool:
+        if value:
+            idx = self._schema.get_index(name)
+            if idx >= 0:
+                return self._set_value(idx, value)
+        return False
+
+    def _set_value(self, idx: int, value: Any) -> bool:
+        current = self._values[idx]
+        value = self._schema.attributes[idx].convert(current, value)
+        self._values[idx] = value
+        if value == current:
+            return False
+        object.__setattr__(self, "_version", self._version + 1)
+        self._changed[idx] = self._version
+        for listener in self._listeners:
+            listener(self._schema.attributes[idx].name, value)
+        return True
 
-    def set(self, name: str, value: Any) -> None:
-        if name in self._attributes and value:
-            self._attributes[name].value = value
+    def is_changed(self, name: str, version: int) -> bool:
+        idx = self._schema.get_index(name)
+        return idx >= 0 and self._changed[idx] > version
+
+    def changes_since(self, version: int) -> Dict[str, Any]:
+        """Return attributes changed after given status version, without aliases"""
+        ret: Dict[str, Any] = {}
+        if version >= self._version:
+            return ret
+        attributes = self._schema.attributes
+        for idx, changed in enumerate(self._changed):
+            if changed > version:
+                ret[attributes[idx].name] = self._values[idx]
+        return ret
 
     def get_attr_names(self) -> List[str]:
-        return list(self._attributes.keys())
+        return self._schema.names()
 
     def __getattr__(self, name: str) -> Any:
-        if name in self._attributes:
-            return self._attributes.get(name, self._empty).value
+        idx = object.__getattribute__(self, "_schema").get_index(name)
+        if idx >= 0:
+            return self._values[idx]
         else:
             return super().__getattribute__(name)
 
     def __setattr__(self, name: str, value: Any) -> None:
-        if name in self._attributes:
-            self._attributes[name].value = value
+        idx = self._schema.get_index(name)
+        if idx >= 0:
+            self._set_value(idx, value)
         else:
             print(name, value)
             # setattr(self, name, value)
 
-    def __call__(self) -> Dict[str, Any]:
-        ret: Dict[str, Any] = {}
-        for attr in self._attributes:
-            ret[attr] = self._attributes[attr].value
-        return ret
+    def _snapshot(self) -> ReadOnlyDict:
+        _values = self._values
+        return ReadOnlyDict({name: _values[idx] for name, idx in self._schema.items()})
+
+    def __call__(self) -> ReadOnlyDict:
+        return self.cached("snapshot", self._snapshot)
+
+    def to_json(self) -> str:
+        return self.cached("json", lambda: json.dumps(self(), default=str))
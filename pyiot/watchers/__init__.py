@@ -1,9 +1,32 @@
-from threading import Thread
+from threading import Condition, Lock, Thread
 from abc import ABC, abstractmethod
-from typing import Any, Callable, Dict, Optional, Set
+import asyncio
+from collections import deque
+from enum import Enum
+from time import monotonic
+from traceback import print_exc
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+from pyiot.exceptions import DeviceIsOffline, DeviceTimeout
+
+OFFLINE_ERRORS = (DeviceTimeout, DeviceIsOffline, OSError)
 
 
 class WatcherBaseDriver(ABC):
+    # handler is called from shared Reactor thread and must never block
+    reactor_driven: bool = False
+
     @abstractmethod
     def watch(self, handler: Callable[[Optional[Dict[str, Any]]], None]) -> None:
         pass
@@ -13,17 +36,584 @@ class WatcherBaseDriver(ABC):
         pass
 
 
+class OverflowPolicy(Enum):
+    """What to do with new event when queue of device is full
+
+    DROP_OLDEST: drop the oldest queued event
+    BLOCK: wait in driver thread until there is a place in queue, not allowed for
+        reactor driven drivers as it would stall all sockets of the reactor
+    COALESCE: merge event data into the newest queued event, drop the oldest
+        queued event when they can't be merged
+    """
+
+    DROP_OLDEST = "drop_oldest"
+    BLOCK = "block"
+    COALESCE = "coalesce"
+
+
+class WatcherStats:
+    def __init__(self, samples: int = 1000) -> None:
+        self.received: int = 0
+        self.handled: int = 0
+        self.dropped: int = 0
+        self.coalesced: int = 0
+        self.queued: int = 0
+        self.latency: Deque[float] = deque(maxlen=samples)
+
+    def latency_percentile(self, percent: float) -> float:
+        """Seconds from receiving event to end of handlers call"""
+        samples = sorted(self.latency)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "handled": self.handled,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "queued": self.queued,
+            "latency_p50": self.latency_percentile(50),
+            "latency_p99": self.latency_percentile(99),
+        }
+
+
+class Subscription:
+    """Report handler called only for events matching all given criteria"""
+
+    __slots__ = ("handler", "sid", "model", "cmd", "attribute")
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Any],
+        sid: Optional[str] = None,
+        model: Optional[str] = None,
+        cmd: Optional[str] = None,
+        attribute: Optional[str] = None,
+    ) -> None:
+        self.handler = handler
+        self.sid = sid
+        self.model = model
+        self.cmd = cmd
+        self.attribute = attribute
+
+    def key(self) -> Tuple[str, Optional[str]]:
+        """The most selective criterion, used as index key"""
+        for field in SUBSCRIPTION_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                return field, value
+        return "", None
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        if self.sid is not None and event.get("sid") != self.sid:
+            return False
+        if self.model is not None and event.get("model") != self.model:
+            return False
+        if self.cmd is not None and event.get("cmd") != self.cmd:
+            return False
+        if self.attribute is not None:
+            data = event.get("data")
+            return isinstance(data, dict) and self.attribute in data
+        return True
+
+
+SUBSCRIPTION_FIELDS = ("sid", "attribute", "model", "cmd")
+
+
+class HandlerIndex:
+    """Subscriptions indexed by sid, attribute, model and cmd.
+
+    Every subscription is kept in one bucket under its most selective criterion,
+    so dispatch looks up only buckets of the event and checks the rest of
+    criteria for found subscriptions. Buckets are replaced on change, events
+    can be dispatched from other threads without locking.
+    """
+
+    def __init__(self) -> None:
+        self._all: Tuple[Subscription, ...] = tuple()
+        self._index: Dict[str, Dict[Any, Tuple[Subscription, ...]]] = {
+            field: {} for field in SUBSCRIPTION_FIELDS
+        }
+        self._lock = Lock()
+
+    def add(self, subscription: Subscription) -> None:
+        field, value = subscription.key()
+        with self._lock:
+            if not field:
+                self._all += (subscription,)
+            else:
+                bucket = self._index[field]
+                bucket[value] = bucket.get(value, tuple()) + (subscription,)
+
+    def remove(self, subscription: Subscription) -> None:
+        field, value = subscription.key()
+        with self._lock:
+            if not field:
+                self._all = tuple(sub for sub in self._all if sub is not subscription)
+                return
+            bucket = self._index[field]
+            subs = tuple(
+                sub for sub in bucket.get(value, tuple()) if sub is not subscription
+            )
+            if subs:
+                bucket[value] = subs
+            else:
+                bucket.pop(value, None)
+
+    def match(self, event: Dict[str, Any]) -> List[Subscription]:
+        matched = list(self._all)
+        index = self._index
+        for field, key in (
+            ("sid", event.get("sid")),
+            ("model", event.get("model")),
+            ("cmd", event.get("cmd")),
+        ):
+            subs = index[field].get(key) if index[field] else None
+            if subs:
+                matched.extend(sub for sub in subs if sub.matches(event))
+        data = event.get("data")
+        if index["attribute"] and isinstance(data, dict):
+            for attribute in data:
+                subs = index["attribute"].get(attribute)
+                if subs:
+                    matched.extend(sub for sub in subs if sub.matches(event))
+        return matched
+
+    def __len__(self) -> int:
+        return len(self._all) + sum(
+            len(subs) for bucket in self._index.values() for subs in bucket.values()
+        )
+
+
+# enough for 5k events/s with 2 ms handlers, see benchmarks/bench_watcher_dispatch.py
+DEFAULT_WORKERS = 16
+
+
+class WorkerPool:
+    """Worker threads handling queued events of watchers.
+
+    Watchers schedule sids with queued events, a sid is handled by one worker at a
+    time so events of one device keep their order. Workers are started when sids
+    are waiting and exit after idle_timeout. Watchers of the pool share its
+    lock for their queues: workers wait on cond for scheduled sids, watchers
+    with OverflowPolicy.BLOCK wait on space for a free queue slot.
+
+    Args:
+        workers (:obj:`int`, optional): max number of worker threads.
+            Defaults is DEFAULT_WORKERS.
+        idle_timeout (:obj:`float`, optional): seconds before idle worker exits.
+            Defaults is 60.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, idle_timeout: float = 60):
+        self.lock = Lock()
+        self.cond = Condition(self.lock)
+        self.space = Condition(self.lock)
+        self.max_workers = max(workers, 1)
+        self.idle_timeout = idle_timeout
+        self.workers: int = 0
+        self._idle: int = 0
+        self._ready: Deque[Tuple["Watcher", str]] = deque()
+
+    def schedule(self, watcher: "Watcher", sid: str) -> None:
+        """Hand queued events of sid to a worker, call with lock held"""
+        self._ready.append((watcher, sid))
+        if self._idle < len(self._ready) and self.workers < self.max_workers:
+            self.workers += 1
+            Thread(target=self._worker, daemon=True).start()
+        self.cond.notify()
+
+    def _worker(self) -> None:
+        while True:
+            with self.cond:
+                self._idle += 1
+                while not self._ready:
+                    if not self.cond.wait(self.idle_timeout) and not self._ready:
+                        self._idle -= 1
+                        self.workers -= 1
+                        return
+                self._idle -= 1
+                watcher, sid = self._ready.popleft()
+                msg, received = watcher._next_event(sid)
+                self.space.notify_all()
+            try:
+                watcher._handle_events(msg)
+            except Exception:
+                print_exc()
+            finally:
+                with self.lock:
+                    watcher._event_done(sid, received)
+
+
+_default_pool: Optional[WorkerPool] = None
+_default_pool_lock = Lock()
+
+
+def get_worker_pool() -> WorkerPool:
+    """Return process-wide worker pool shared by watchers"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = WorkerPool()
+        return _default_pool
+
+
 class Watcher:
-    def __init__(self, driver: WatcherBaseDriver):
-        self._report_handlers: Set[Callable[[Dict[str, Any]], None]] = set()
+    """Deliver events from driver to report handlers.
+
+    Events are queued per device sid and handled by WorkerPool threads, events
+    of one device are always handled in order by one worker at a time. Watchers
+    share the process-wide pool unless workers is given. Queue of sid is removed
+    when its last event is handled.
+
+    With coalesce_window set, events of one sid received inside the window are
+    merged into one event with the last value of each attribute. Events carrying
+    one of never_merge attributes (e.g. button clicks) are never merged, pending
+    event of the sid is delivered before them.
+
+    Args:
+        driver (WatcherBaseDriver): events source
+        workers (:obj:`int`, optional): max number of worker threads of own pool.
+            Defaults is None (shared pool of DEFAULT_WORKERS threads).
+        queue_depth (:obj:`int`, optional): max queued events per sid. Defaults is 100.
+        overflow (:obj:`OverflowPolicy`, optional): what to do when queue is full.
+            Defaults is OverflowPolicy.DROP_OLDEST.
+        idle_timeout (:obj:`float`, optional): seconds before idle worker of own
+            pool exits. Defaults is 60.
+        coalesce_window (:obj:`float`, optional): seconds to merge events of one sid,
+            0 disables merging. Defaults is 0.
+        never_merge (:obj:`Iterable[str]`, optional): event data attributes which
+            are never merged. Defaults is empty.
+    """
+
+    def __init__(
+        self,
+        driver: WatcherBaseDriver,
+        workers: Optional[int] = None,
+        queue_depth: int = 100,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        idle_timeout: float = 60,
+        coalesce_window: float = 0,
+        never_merge: Iterable[str] = (),
+    ):
+        self._report_handlers: Dict[Callable, Subscription] = {}
+        self.handlers = HandlerIndex()
+        self.queue_depth = max(queue_depth, 1)
+        self.overflow = overflow
+        self.coalesce_window = coalesce_window
+        self.never_merge: Set[str] = set(never_merge)
+        if overflow is OverflowPolicy.BLOCK and driver.reactor_driven:
+            raise ValueError("OverflowPolicy.BLOCK would stall shared reactor thread")
+        self.stats = WatcherStats()
+        self._queues: Dict[str, Deque[Tuple[Dict[str, Any], float]]] = {}
+        self._pending: Dict[str, Tuple[Dict[str, Any], float, float]] = {}
+        self._flushing: bool = False
+        self._busy: Set[str] = set()
+        if workers is None:
+            self.pool = get_worker_pool()
+        else:
+            self.pool = WorkerPool(workers, idle_timeout)
+        self._lock = self.pool.lock
+        # only flusher waits on it, for earlier deadline or new pending event
+        self._timer = Condition(self._lock)
         Thread(target=driver.watch, args=(self._handler,), daemon=True).start()
 
     def _handler(self, msg: Dict[str, Any]) -> None:
-        Thread(target=self._handle_events, args=(msg,)).start()
+        with self._lock:
+            self.stats.received += 1
+            if self.coalesce_window > 0:
+                self._debounce(msg)
+            else:
+                self._enqueue(msg, monotonic())
+
+    def _enqueue(self, msg: Dict[str, Any], received: float) -> None:
+        sid: str = msg.get("sid", "")
+        queue = self._queues.get(sid)
+        if queue is None:
+            queue = self._queues[sid] = deque()
+        if len(queue) >= self.queue_depth:
+            if self.overflow is OverflowPolicy.COALESCE and self._mergeable(
+                queue[-1][0], msg
+            ):
+                self._coalesce(queue[-1][0], msg)
+                self.stats.coalesced += 1
+                return
+            if self.overflow is OverflowPolicy.BLOCK:
+                while len(queue) >= self.queue_depth:
+                    self.pool.space.wait()
+                # emptied queue may be removed by worker meanwhile
+                self._queues[sid] = queue
+            else:
+                # COALESCE falls back to drop oldest when events can't be merged
+                queue.popleft()
+                self.stats.dropped += 1
+                self.stats.queued -= 1
+        queue.append((msg, received))
+        self.stats.queued += 1
+        if sid not in self._busy:
+            self._busy.add(sid)
+            self.pool.schedule(self, sid)
+
+    def _debounce(self, msg: Dict[str, Any]) -> None:
+        sid: str = msg.get("sid", "")
+        now = monotonic()
+        pending = self._pending.pop(sid, None)
+        if pending is not None:
+            if self._mergeable(pending[0], msg):
+                self._coalesce(pending[0], msg)
+                self.stats.coalesced += 1
+                self._pending[sid] = pending
+                return
+            self._enqueue(pending[0], pending[1])
+        if self._flagged(msg):
+            self._enqueue(msg, now)
+            return
+        self._pending[sid] = (msg, now, now + self.coalesce_window)
+        if not self._flushing:
+            self._flushing = True
+            Thread(target=self._flusher, daemon=True).start()
+        self._timer.notify()
+
+    def _flusher(self) -> None:
+        with self._lock:
+            while self._pending:
+                sid = min(self._pending, key=lambda _sid: self._pending[_sid][2])
+                msg, received, deadline = self._pending[sid]
+                timeout = deadline - monotonic()
+                if timeout > 0:
+                    self._timer.wait(timeout)
+                    continue
+                del self._pending[sid]
+                self._enqueue(msg, received)
+            self._flushing = False
+
+    def _flagged(self, msg: Dict[str, Any]) -> bool:
+        data = msg.get("data")
+        if not isinstance(data, dict):
+            return True
+        return not self.never_merge.isdisjoint(data)
+
+    def _mergeable(self, queued: Dict[str, Any], msg: Dict[str, Any]) -> bool:
+        return (
+            queued.get("cmd") == msg.get("cmd")
+            and not self._flagged(queued)
+            and not self._flagged(msg)
+        )
+
+    @staticmethod
+    def _coalesce(queued: Dict[str, Any], msg: Dict[str, Any]) -> None:
+        queued["data"].update(msg["data"])
+        for key, value in msg.items():
+            if key != "data":
+                queued[key] = value
+
+    def _next_event(self, sid: str) -> Tuple[Dict[str, Any], float]:
+        msg, received = self._queues[sid].popleft()
+        self.stats.queued -= 1
+        return msg, received
+
+    def _event_done(self, sid: str, received: float) -> None:
+        self.stats.handled += 1
+        self.stats.latency.append(monotonic() - received)
+        if self._queues[sid]:
+            self.pool.schedule(self, sid)
+        else:
+            del self._queues[sid]
+            self._busy.discard(sid)
 
     def add_report_handler(self, handler: Callable[[Dict[str, Any]], None]) -> None:
-        self._report_handlers.add(handler)
+        if handler not in self._report_handlers:
+            self._report_handlers[handler] = self.subscribe(handler)
+
+    def remove_report_handler(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        subscription = self._report_handlers.pop(handler, None)
+        if subscription is not None:
+            self.unsubscribe(subscription)
+
+    def subscribe(
+        self,
+        handler: Callable[[Dict[str, Any]], None],
+        sid: Optional[str] = None,
+        model: Optional[str] = None,
+        cmd: Optional[str] = None,
+        attribute: Optional[str] = None,
+    ) -> Subscription:
+        """Call handler only for events matching all given criteria
+
+        Args:
+            handler (Callable): report handler
+            sid (:obj:`str`, optional): device sid. Defaults is None (any).
+            model (:obj:`str`, optional): device model. Defaults is None (any).
+            cmd (:obj:`str`, optional): event cmd e.g. report. Defaults is None (any).
+            attribute (:obj:`str`, optional): attribute in event data.
+                Defaults is None (any).
+
+        Returns:
+            Subscription: pass to unsubscribe to remove handler
+        """
+        subscription = Subscription(handler, sid, model, cmd, attribute)
+        self.handlers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.handlers.remove(subscription)
 
     def _handle_events(self, event: Dict[str, Any]) -> None:
-        for handler in self._report_handlers:
-            handler(event)
+        for subscription in self.handlers.match(event):
+            subscription.handler(event)
+
+
+class AsyncWatcherBaseDriver(ABC):
+    """Driver running on asyncio event loop, handler must be called from the loop"""
+
+    @abstractmethod
+    async def watch(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        pass
+
+    @abstractmethod
+    def stop(self) -> None:
+        pass
+
+
+AsyncReportHandler = Union[
+    Callable[[Dict[str, Any]], None], Callable[[Dict[str, Any]], Awaitable[None]]
+]
+
+
+class AsyncWatcher:
+    """Deliver events from async driver to report handlers on one event loop.
+
+    Handlers can be coroutine functions or plain functions, they are called in order
+    of events. Call start from running event loop.
+
+    Args:
+        driver (AsyncWatcherBaseDriver): events source
+        queue_depth (:obj:`int`, optional): max queued events, the oldest event is
+            dropped when queue is full. Defaults is 1000.
+    """
+
+    def __init__(self, driver: AsyncWatcherBaseDriver, queue_depth: int = 1000):
+        self._driver = driver
+        self._report_handlers: Dict[AsyncReportHandler, Subscription] = {}
+        self.handlers = HandlerIndex()
+        self._queue: Deque[Dict[str, Any]] = deque(maxlen=max(queue_depth, 1))
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: Tuple[asyncio.Task, ...] = tuple()
+        self.dropped: int = 0
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = (
+            loop.create_task(self._driver.watch(self._handler)),
+            loop.create_task(self._dispatch()),
+        )
+
+    async def stop(self) -> None:
+        self._driver.stop()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = tuple()
+
+    def add_report_handler(self, handler: AsyncReportHandler) -> None:
+        if handler not in self._report_handlers:
+            self._report_handlers[handler] = self.subscribe(handler)
+
+    def subscribe(
+        self,
+        handler: AsyncReportHandler,
+        sid: Optional[str] = None,
+        model: Optional[str] = None,
+        cmd: Optional[str] = None,
+        attribute: Optional[str] = None,
+    ) -> Subscription:
+        """Call handler only for events matching all given criteria, see Watcher"""
+        subscription = Subscription(handler, sid, model, cmd, attribute)
+        self.handlers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.handlers.remove(subscription)
+
+    def _handler(self, msg: Dict[str, Any]) -> None:
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append(msg)
+        self._wakeup.set()
+
+    async def _dispatch(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._queue:
+                await self._handle_events(self._queue.popleft())
+
+    async def _handle_events(self, event: Dict[str, Any]) -> None:
+        for subscription in self.handlers.match(event):
+            try:
+                ret = subscription.handler(event)
+                if asyncio.iscoroutine(ret):
+                    await ret
+            except Exception:
+                print_exc()
+
+
+class AsyncPollingWatcher(AsyncWatcherBaseDriver):
+    """Poll device every sleep_time seconds and report changed attributes.
+
+    Blocking refresh runs in default executor, status changes made between polls
+    (e.g. after command) are reported without waiting for next poll. Offline
+    device is printed and polled again after sleep_time.
+    """
+
+    def __init__(self, sleep_time: float, device: Any) -> None:
+        self.sleep_time = sleep_time
+        self.device = device
+        self._loop = True
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @abstractmethod
+    def refresh(self) -> None:
+        pass
+
+    async def watch(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+        def listener(name: str, value: Any) -> None:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+        self.device.status.add_listener(listener)
+        version: int = self.device.status.version
+        try:
+            while self._loop:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.sleep_time)
+                except asyncio.TimeoutError:
+                    try:
+                        await loop.run_in_executor(None, self.refresh)
+                    except OFFLINE_ERRORS as err:
+                        print(err)
+                self._wakeup.clear()
+                current: int = self.device.status.version
+                changes = self.device.status.changes_since(version)
+                version = current
+                if changes:
+                    handler(
+                        {
+                            "cmd": "report",
+                            "sid": self.device.status.sid,
+                            "model": self.device.status.model,
+                            "data": changes,
+                        }
+                    )
+        finally:
+            self.device.status.remove_listener(listener)
+
+    def stop(self) -> None:
+        self._loop = False
+        if self._wakeup is not None:
+            self._wakeup.set()
@@ -1,34 +1,219 @@
-from . import WatcherBaseDriver
+from __future__ import annotations
+from . import AsyncWatcherBaseDriver, WatcherBaseDriver
+from .reactor import Reactor, get_reactor
+import asyncio
 import socket
 import json
-from typing import Callable, Optional, Dict, Any
+from threading import Lock
+from typing import Callable, Optional, Dict, Any, Tuple
+
+MULTICAST_IP = "224.0.0.50"
+MULTICAST_PORT = 9898
+
+
+def multicast_socket(
+    ip: str = MULTICAST_IP, port: int = MULTICAST_PORT
+) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(
+        socket.IPPROTO_IP,
+        socket.IP_ADD_MEMBERSHIP,
+        socket.inet_aton(ip) + socket.inet_aton("0.0.0.0"),
+    )
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((ip, port))
+    return sock
+
+
+def parse_report(data: bytes, addr: Tuple[str, int]) -> Dict[str, Any]:
+    msg: Dict[str, Any] = json.loads(data)
+    if isinstance(msg.get("data", {}), str):
+        msg["data"] = json.loads(msg["data"])
+        msg["from"] = addr
+    return msg
 
 
 class GatewayWatcher(WatcherBaseDriver):
     def __init__(self):
-        self.muliticast = "224.0.0.50"
+        self.muliticast = MULTICAST_IP
         self.senderip = "0.0.0.0"
-        self.port = 9898
+        self.port = MULTICAST_PORT
         self._loop = True
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        self.sock.setsockopt(
-            socket.IPPROTO_IP,
-            socket.IP_ADD_MEMBERSHIP,
-            socket.inet_aton(self.muliticast) + socket.inet_aton(self.senderip),
-        )
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-        self.sock.bind((self.muliticast, self.port))
+        self.sock = multicast_socket(self.muliticast, self.port)
 
     def watch(self, handler: Callable[[Optional[Dict[str, Any]]], None]) -> None:
         while self._loop:
             data, addr = self.sock.recvfrom(1024)
-            msg: Dict[str, Any] = json.loads(data)
-            if isinstance(msg.get("data", {}), str):
-                msg["data"] = json.loads(msg["data"])
-                msg["from"] = addr
-            handler(msg)
+            handler(parse_report(data, addr))
 
     def stop(self):
         self._loop = False
         self.sock.close()
+
+
+class _GatewayProtocol(asyncio.DatagramProtocol):
+    def __init__(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        self.handler = handler
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        try:
+            self.handler(parse_report(data, addr))
+        except json.JSONDecodeError as err:
+            print(err)
+
+
+class AsyncGatewayWatcher(AsyncWatcherBaseDriver):
+    """Aqara gateway multicast reports received with asyncio datagram transport"""
+
+    def __init__(self) -> None:
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._stopped: Optional[asyncio.Future] = None
+
+    async def watch(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        loop = asyncio.get_running_loop()
+        self._stopped = loop.create_future()
+        sock = multicast_socket()
+        sock.setblocking(False)
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _GatewayProtocol(handler), sock=sock
+        )
+        try:
+            await self._stopped
+        finally:
+            self._transport.close()
+
+    def stop(self) -> None:
+        if self._stopped is not None and not self._stopped.done():
+            self._stopped.set_result(None)
+
+
+class ReactorGatewayWatcher(WatcherBaseDriver):
+    """Aqara gateway multicast reports read by shared selector reactor, no own thread"""
+
+    reactor_driven = True
+
+    def __init__(self, reactor: Optional[Reactor] = None):
+        self.reactor = reactor if reactor is not None else get_reactor()
+        self.sock = multicast_socket()
+
+    def watch(self, handler: Callable[[Optional[Dict[str, Any]]], None]) -> None:
+        def on_datagram(data: bytes, addr: Tuple[str, int]) -> None:
+            try:
+                handler(parse_report(data, addr))
+            except json.JSONDecodeError as err:
+                print(err)
+
+        self.reactor.add_datagram(self.sock, on_datagram)
+
+    def stop(self):
+        self.reactor.remove(self.sock)
+        self.sock.close()
+
+
+class MulticastListener:
+    """One multicast socket shared by all gateways in process.
+
+    Every datagram is parsed once and passed only to watcher of gateway owning
+    report sid (gateway sid or registered sub-device sid). Reports of not
+    registered sub-devices go to gateway with the sender ip.
+    """
+
+    def __init__(self, reactor: Optional[Reactor] = None) -> None:
+        self.reactor = reactor if reactor is not None else get_reactor()
+        self.sock: Optional[socket.socket] = None
+        self._sids: Dict[str, SharedGatewayWatcher] = {}
+        self._ips: Dict[str, SharedGatewayWatcher] = {}
+        self._lock = Lock()
+
+    def add_gateway(self, watcher: SharedGatewayWatcher) -> None:
+        with self._lock:
+            if watcher.sid:
+                self._sids[watcher.sid] = watcher
+            if watcher.ip:
+                self._ips[watcher.ip] = watcher
+            if self.sock is None:
+                self.sock = multicast_socket()
+                self.reactor.add_datagram(self.sock, self._on_datagram)
+
+    def remove_gateway(self, watcher: SharedGatewayWatcher) -> None:
+        with self._lock:
+            self._sids = {
+                sid: _watcher
+                for sid, _watcher in self._sids.items()
+                if _watcher is not watcher
+            }
+            if self._ips.get(watcher.ip) is watcher:
+                del self._ips[watcher.ip]
+            if not self._sids and not self._ips and self.sock is not None:
+                self.reactor.remove(self.sock)
+                self.sock.close()
+                self.sock = None
+
+    def add_device(self, sid: str, watcher: SharedGatewayWatcher) -> None:
+        with self._lock:
+            self._sids[sid] = watcher
+
+    def remove_device(self, sid: str) -> None:
+        with self._lock:
+            self._sids.pop(sid, None)
+
+    def __len__(self) -> int:
+        return len(set(self._sids.values()) | set(self._ips.values()))
+
+    def _on_datagram(self, data: bytes, addr: Tuple[str, int]) -> None:
+        try:
+            msg = parse_report(data, addr)
+        except json.JSONDecodeError as err:
+            print(err)
+            return
+        watcher = self._sids.get(msg.get("sid", "")) or self._ips.get(addr[0])
+        if watcher is not None and watcher.handler is not None:
+            watcher.handler(msg)
+
+
+_default_listener: Optional[MulticastListener] = None
+_default_lock = Lock()
+
+
+def get_multicast_listener() -> MulticastListener:
+    """Return process-wide multicast listener shared by all gateways"""
+    global _default_listener
+    with _default_lock:
+        if _default_listener is None:
+            _default_listener = MulticastListener()
+        return _default_listener
+
+
+class SharedGatewayWatcher(WatcherBaseDriver):
+    """Reports of one gateway and its sub-devices from shared MulticastListener
+
+    Args:
+        sid (str): gateway sid
+        ip (:obj:`str`, optional): gateway ip. Defaults is "".
+        listener (:obj:`MulticastListener`, optional): Defaults is shared listener.
+    """
+
+    reactor_driven = True
+
+    def __init__(
+        self, sid: str, ip: str = "", listener: Optional[MulticastListener] = None
+    ):
+        self.sid = sid
+        self.ip = ip
+        self.handler: Optional[Callable[[Dict[str, Any]], None]] = None
+        self.listener = listener if listener is not None else get_multicast_listener()
+        self.listener.add_gateway(self)
+
+    def watch(self, handler: Callable[[Optional[Dict[str, Any]]], None]) -> None:
+        self.handler = handler
+
+    def add_device(self, sid: str) -> None:
+        self.listener.add_device(sid, self)
+
+    def remove_device(self, sid: str) -> None:
+        self.listener.remove_device(sid)
+
+    def stop(self):
+        self.handler = None
+        self.listener.remove_gateway(self)
@@ -1,41 +1,58 @@
+import asyncio
 from time import sleep
 from datetime import datetime
-from . import WatcherBaseDriver
+from . import AsyncWatcherBaseDriver, WatcherBaseDriver
 from pyiot import BaseDevice
 from pyiot.software import Time
 from typing import Callable, Optional, Dict, Any
 
 
-class ClockWatcher(WatcherBaseDriver):
+class ClockReport:
+    """Set clock device time and return report of it"""
+
     def __init__(self, device: Optional[BaseDevice] = None) -> None:
         self.sleep_time = 60
         self._loop = True
         self.device = device
 
+    def _tick(self) -> Dict[str, Any]:
+        _time: Time = Time()
+        _time.set_now()
+
+        self.device.status.time = _time
+        if _time == Time(1):
+            self.device.get_sun_info()
+
+        return {
+            "cmd": "report",
+            "sid": self.device.status.sid,
+            "data": {
+                "time": str(self.device.status.time),
+                "sunrise": _time == self.device.status.sunrise,
+                "sunset": _time == self.device.status.sunset,
+            },
+        }
+
+    def stop(self) -> None:
+        self._loop = False
+
+
+class ClockWatcher(ClockReport, WatcherBaseDriver):
     def watch(self, handler: Callable[[Optional[Dict[str, Any]]], None]) -> None:
         while datetime.now().second:
             sleep(0.5)
 
         while self._loop:
-            _time: Time = Time()
-            _time.set_now()
-
-            self.device.status.time = _time
-            if _time == Time(1):
-                self.device.get_sun_info()
-
-            handler(
-                {
-                    "cmd": "report",
-                    "sid": self.device.status.sid,
-                    "data": {
-                        "time": str(self.device.status.time),
-                        "sunrise": _time == self.device.status.sunrise,
-                        "sunset": _time == self.device.status.sunset,
-                    },
-                }
-            )
+            handler(self._tick())
             sleep(60)
 
-    def stop(self) -> None:
-        self._loop = False
+
+class AsyncClockWatcher(ClockReport, AsyncWatcherBaseDriver):
+    async def watch(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(
+            60 - datetime.now().second - datetime.now().microsecond / 1e6
+        )
+        while self._loop:
+            handler(await loop.run_in_executor(None, self._tick))
+            await asyncio.sleep(60 - datetime.now().second)
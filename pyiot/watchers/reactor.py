@@ -0,0 +1,196 @@
+from __future__ import annotations
+import selectors
+import socket
+from threading import Lock, Thread
+from traceback import print_exc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DatagramCallback = Callable[[bytes, Tuple[str, int]], None]
+LineCallback = Callable[[bytes], None]
+CloseCallback = Callable[[], None]
+
+
+class _Stream:
+    def __init__(self, on_line: LineCallback, on_close: Optional[CloseCallback]):
+        self.on_line = on_line
+        self.on_close = on_close
+        self.pending = bytearray()
+
+
+class _Loop:
+    """One selector served by one thread, closed sockets are passed to on_closed"""
+
+    def __init__(
+        self, bufsize: int, max_line: int, on_closed: Callable[[socket.socket], None]
+    ) -> None:
+        self.on_closed = on_closed
+        self.max_line = max_line
+        self.selector = selectors.DefaultSelector()
+        self.buffer = bytearray(bufsize)
+        self.view = memoryview(self.buffer)
+        self.count = 0
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._running = True
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def register(self, sock: socket.socket, data: Any) -> None:
+        sock.setblocking(False)
+        self.selector.register(sock, selectors.EVENT_READ, data)
+        self.count += 1
+        self.wakeup()
+
+    def unregister(self, sock: socket.socket) -> None:
+        try:
+            self.selector.unregister(sock)
+            self.count -= 1
+        except (KeyError, ValueError):
+            pass
+        self.wakeup()
+
+    def wakeup(self) -> None:
+        try:
+            self._wakeup_w.send(b"\0")
+        except OSError:
+            pass
+
+    def stop(self) -> None:
+        self._running = False
+        self.wakeup()
+
+    def run(self) -> None:
+        while self._running:
+            for key, _ in self.selector.select():
+                if key.data is None:
+                    try:
+                        self._wakeup_r.recv(1024)
+                    except BlockingIOError:
+                        pass
+                    continue
+                try:
+                    if isinstance(key.data, _Stream):
+                        self._read_stream(key.fileobj, key.data)
+                    else:
+                        self._read_datagram(key.fileobj, key.data)
+                except Exception:
+                    print_exc()
+        self.selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+
+    def _read_datagram(self, sock: socket.socket, callback: DatagramCallback) -> None:
+        while True:
+            try:
+                size, addr = sock.recvfrom_into(self.buffer)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                self.on_closed(sock)
+                return
+            callback(bytes(self.view[:size]), addr)
+
+    def _read_stream(self, sock: socket.socket, stream: _Stream) -> None:
+        try:
+            size = sock.recv_into(self.buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            size = 0
+        if not size:
+            self._close_stream(sock, stream)
+            return
+        pending = stream.pending
+        pending += self.view[:size]
+        start = 0
+        end = pending.find(b"\n")
+        while end >= 0:
+            line = bytes(pending[start:end]).strip()
+            if line:
+                stream.on_line(line)
+            start = end + 1
+            end = pending.find(b"\n", start)
+        del pending[:start]
+        if len(pending) > self.max_line:
+            print(f"line longer than {self.max_line} bytes, closing {sock}")
+            self._close_stream(sock, stream)
+
+    def _close_stream(self, sock: socket.socket, stream: _Stream) -> None:
+        stream.pending.clear()
+        self.on_closed(sock)
+        if stream.on_close is not None:
+            stream.on_close()
+
+
+class Reactor:
+    """Read many watcher sockets with selectors in one (or few) threads.
+
+    Datagram sockets are read into a shared buffer and passed to callback with
+    sender address, stream sockets are split into lines (line-delimited JSON)
+    and passed to callback line by line. Sockets are spread over ``threads``
+    selector loops. Socket closed by peer or failing with OSError is removed
+    from reactor before on_close is called, stream whose peer sends more than
+    ``max_line`` bytes without newline is closed the same way.
+
+    Callbacks run in reactor thread shared by all sockets of the loop, they must
+    not block (see OverflowPolicy.BLOCK).
+
+    Args:
+        threads (:obj:`int`, optional): number of selector threads. Defaults is 1.
+        bufsize (:obj:`int`, optional): read buffer size. Defaults is 65536.
+        max_line (:obj:`int`, optional): longest line kept of stream.
+            Defaults is 1048576.
+    """
+
+    def __init__(
+        self, threads: int = 1, bufsize: int = 65536, max_line: int = 1 << 20
+    ) -> None:
+        self._loops: List[_Loop] = [
+            _Loop(bufsize, max_line, self.remove) for _ in range(max(threads, 1))
+        ]
+        self._owners: Dict[socket.socket, _Loop] = {}
+        self._lock = Lock()
+
+    def add_datagram(self, sock: socket.socket, callback: DatagramCallback) -> None:
+        self._register(sock, callback)
+
+    def add_stream(
+        self,
+        sock: socket.socket,
+        on_line: LineCallback,
+        on_close: Optional[CloseCallback] = None,
+    ) -> None:
+        self._register(sock, _Stream(on_line, on_close))
+
+    def remove(self, sock: socket.socket) -> None:
+        with self._lock:
+            loop = self._owners.pop(sock, None)
+        if loop is not None:
+            loop.unregister(sock)
+
+    def stop(self) -> None:
+        for loop in self._loops:
+            loop.stop()
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+    def _register(self, sock: socket.socket, data: Any) -> None:
+        with self._lock:
+            loop = min(self._loops, key=lambda _loop: _loop.count)
+            self._owners[sock] = loop
+        loop.register(sock, data)
+
+
+_default_reactor: Optional[Reactor] = None
+_default_lock = Lock()
+
+
+def get_reactor() -> Reactor:
+    """Return process-wide reactor shared by all watchers"""
+    global _default_reactor
+    with _default_lock:
+        if _default_reactor is None:
+            _default_reactor = Reactor()
+        return _default_reactor
@@ -0,0 +1,229 @@
+from __future__ import annotations
+from . import OFFLINE_ERRORS, WatcherBaseDriver
+from abc import abstractmethod
+import heapq
+from itertools import count
+from random import uniform
+from threading import Condition, Lock, Thread, get_ident
+from time import monotonic
+from traceback import print_exc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class PollJob:
+    """Polling state of one device.
+
+    Args:
+        refresh (Callable): blocking call reading device status
+        report (Callable): called after every run
+        interval (:obj:`float`, optional): seconds between polls. Defaults is 30.
+        fast_interval (:obj:`float`, optional): seconds between polls after command
+            or change. Defaults is 2.
+        fast_polls (:obj:`int`, optional): number of fast polls. Defaults is 3.
+        max_backoff (:obj:`float`, optional): max seconds between polls of offline
+            device. Defaults is 600.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[], None],
+        report: Callable[[], None],
+        interval: float = 30,
+        fast_interval: float = 2,
+        fast_polls: int = 3,
+        max_backoff: float = 600,
+    ) -> None:
+        self.refresh = refresh
+        self.report = report
+        self.interval = interval
+        self.fast_interval = fast_interval
+        self.fast_polls = fast_polls
+        self.max_backoff = max_backoff
+        self.failures: int = 0
+        self.fast_left: int = 0
+        self.poked: bool = False
+        self.running: bool = False
+        self.thread: int = 0
+        self.active: bool = True
+        self.due: float = 0.0
+
+    def next_delay(self) -> float:
+        if self.failures:
+            return min(self.interval * 2**self.failures, self.max_backoff)
+        if self.fast_left:
+            self.fast_left -= 1
+            return self.fast_interval
+        return self.interval
+
+
+class PollingScheduler:
+    """Poll many devices with a timer heap and a small pool of worker threads.
+
+    Every device is polled every interval seconds, faster after command or
+    change and with exponential backoff while device does not answer. Delays
+    get random jitter so polls of many devices do not align.
+
+    Args:
+        workers (:obj:`int`, optional): number of worker threads. Defaults is 2.
+        jitter (:obj:`float`, optional): max relative delay change. Defaults is 0.1.
+    """
+
+    def __init__(self, workers: int = 2, jitter: float = 0.1) -> None:
+        self.jitter = jitter
+        self._heap: List[Tuple[float, int, PollJob]] = []
+        self._seq = count()
+        self._cond = Condition()
+        for _ in range(max(workers, 1)):
+            Thread(target=self._worker, daemon=True).start()
+
+    def add(self, job: PollJob, delay: Optional[float] = None) -> None:
+        with self._cond:
+            job.active = True
+            self._schedule(job, self._jitter(job.interval) if delay is None else delay)
+
+    def remove(self, job: PollJob) -> None:
+        with self._cond:
+            job.active = False
+
+    def poke(self, job: PollJob) -> None:
+        """Report device changes now and poll it faster for a while"""
+        with self._cond:
+            if job.running and job.thread == get_ident():
+                return
+            job.fast_left = job.fast_polls
+            job.poked = True
+            if job.active and not job.running:
+                self._schedule(job, 0)
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len({id(job) for _, _, job in self._heap if job.active})
+
+    def _jitter(self, delay: float) -> float:
+        return delay * (1 + uniform(-self.jitter, self.jitter))
+
+    def _schedule(self, job: PollJob, delay: float) -> None:
+        due = monotonic() + delay
+        if job.due > monotonic() and job.due <= due and not job.running:
+            return
+        job.due = due
+        heapq.heappush(self._heap, (due, next(self._seq), job))
+        self._cond.notify()
+
+    def _next_job(self) -> Tuple[PollJob, bool]:
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, job = self._heap[0]
+                if not job.active or job.running or due != job.due:
+                    heapq.heappop(self._heap)
+                    continue
+                timeout = due - monotonic()
+                if timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+                heapq.heappop(self._heap)
+                job.running = True
+                job.thread = get_ident()
+                poked, job.poked = job.poked, False
+                return job, poked
+
+    def _worker(self) -> None:
+        while True:
+            job, poked = self._next_job()
+            try:
+                if not poked:
+                    job.refresh()
+                job.failures = 0
+            except OFFLINE_ERRORS:
+                job.failures += 1
+            except Exception:
+                job.failures += 1
+                print_exc()
+            try:
+                job.report()
+            except Exception:
+                print_exc()
+            with self._cond:
+                job.running = False
+                if job.active:
+                    if job.poked:
+                        job.poked = False
+                        delay = job.fast_interval
+                    else:
+                        delay = job.next_delay()
+                    self._schedule(job, self._jitter(delay))
+
+
+_default_scheduler: Optional[PollingScheduler] = None
+_default_lock = Lock()
+
+
+def get_scheduler() -> PollingScheduler:
+    """Return process-wide scheduler shared by all polling watchers"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = PollingScheduler()
+        return _default_scheduler
+
+
+class PollingWatcher(WatcherBaseDriver):
+    """Poll device with shared PollingScheduler and report changed attributes.
+
+    Status changes made between polls (e.g. after command) are reported without
+    waiting for next poll and the device is polled faster for a while.
+
+    Args:
+        sleep_time (float): seconds between polls
+        device (BaseDevice): polled device
+        scheduler (:obj:`PollingScheduler`, optional): Defaults is shared scheduler.
+    """
+
+    def __init__(
+        self,
+        sleep_time: float,
+        device: Any = None,
+        scheduler: Optional[PollingScheduler] = None,
+    ) -> None:
+        self.sleep_time = sleep_time
+        self.device = device
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+        self.job = PollJob(self.refresh, self._report, interval=sleep_time)
+        self._handler: Optional[Callable[[Dict[str, Any]], None]] = None
+        self._version: int = 0
+        self._lock = Lock()
+
+    @abstractmethod
+    def refresh(self) -> None:
+        pass
+
+    def watch(self, handler: Callable[[Optional[Dict[str, Any]]], None]) -> None:
+        self._handler = handler
+        self._version = self.device.status.version
+        self.device.status.add_listener(self._on_change)
+        self.scheduler.add(self.job)
+
+    def _on_change(self, name: str, value: Any) -> None:
+        self.scheduler.poke(self.job)
+
+    def _report(self) -> None:
+        with self._lock:
+            current: int = self.device.status.version
+            changes = self.device.status.changes_since(self._version)
+            self._version = current
+        if changes:
+            self._handler(
+                {
+                    "cmd": "report",
+                    "sid": self.device.status.sid,
+                    "model": self.device.status.model,
+                    "data": changes,
+                }
+            )
+
+    def stop(self) -> None:
+        self.scheduler.remove(self.job)
+        self.device.status.remove_listener(self._on_change)
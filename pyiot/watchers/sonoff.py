@@ -1,7 +1,25 @@
 from zeroconf import ServiceBrowser, Zeroconf, ServiceStateChange
+from zeroconf.asyncio import AsyncServiceBrowser, AsyncZeroconf
+import asyncio
 import json
 from threading import Event
-from pyiot.watchers import WatcherBaseDriver
+from pyiot.watchers import AsyncWatcherBaseDriver, WatcherBaseDriver
+from typing import Any, Callable, Dict, Optional, Set
+
+
+def parse_properties(prop: Dict[bytes, Any]) -> Dict[str, Any]:
+    ret = {}
+    if b"data1" in prop:
+        _data = json.loads(prop[b"data1"])
+        if "switch" in _data:
+            _data["power"] = _data.pop("switch")
+        ret = {
+            "cmd": "report",
+            "sid": prop[b"id"].decode(),
+            "model": prop[b"type"].decode(),
+            "data": _data,
+        }
+    return ret
 
 
 class EwelinkWatcher(WatcherBaseDriver):
@@ -30,18 +48,51 @@ class EwelinkWatcher(WatcherBaseDriver):
             self._handler(self._parse(info.properties))
 
     def _parse(self, prop):
-        ret = {}
-        if b"data1" in prop:
-            _data = json.loads(prop[b"data1"])
-            if "switch" in _data:
-                _data["power"] = _data.pop("switch")
-            ret = {
-                "cmd": "report",
-                "sid": prop[b"id"].decode(),
-                "model": prop[b"type"].decode(),
-                "data": _data,
-            }
-        return ret
+        return parse_properties(prop)
 
     def stop(self):
         self.ev.set()
+
+
+class AsyncEwelinkWatcher(AsyncWatcherBaseDriver):
+    """Ewelink mdns updates received with asyncio zeroconf"""
+
+    def __init__(self):
+        self._stopped: Optional[asyncio.Future] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def watch(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        loop = asyncio.get_running_loop()
+        self._stopped = loop.create_future()
+        aiozc = AsyncZeroconf()
+
+        async def update(service_type: str, name: str) -> None:
+            info = await aiozc.async_get_service_info(service_type, name)
+            if info is not None:
+                report = parse_properties(info.properties)
+                if report:
+                    handler(report)
+
+        def on_change(
+            zeroconf: Zeroconf,
+            service_type: str,
+            name: str,
+            state_change: ServiceStateChange,
+        ) -> None:
+            if state_change is ServiceStateChange.Updated:
+                task = loop.create_task(update(service_type, name))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+        browser = AsyncServiceBrowser(
+            aiozc.zeroconf, "_ewelink._tcp.local.", handlers=[on_change]
+        )
+        try:
+            await self._stopped
+        finally:
+            await browser.async_cancel()
+            await aiozc.async_close()
+
+    def stop(self):
+        if self._stopped is not None and not self._stopped.done():
+            self._stopped.set_result(None)
@@ -1,11 +1,41 @@
-from . import WatcherBaseDriver
+from . import AsyncWatcherBaseDriver, WatcherBaseDriver
+from .reactor import Reactor, get_reactor
 
 # from pyiot.xiaomi.yeelight import YeelightDev
+import asyncio
 import socket
 import json
+from threading import Timer
+from typing import Any, Callable, Dict, Optional
 
 
-class YeelightWatcher(WatcherBaseDriver):
+class YeelightReport:
+    """Convert bulb notification line into report"""
+
+    dev: Any
+
+    def _parse(self, line: str) -> Optional[Dict[str, Any]]:
+        return self._report(json.loads(line))
+
+    def _report(self, jdata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if "params" in jdata:
+            if "ct" in jdata["params"]:
+                jdata["params"]["ct_pc"] = self._ct2pc(int(jdata["params"]["ct"]))
+            return {
+                "cmd": "report",
+                "sid": self.dev.status.sid,
+                "model": self.dev.status.model,
+                "data": jdata["params"].copy(),
+            }
+        return None
+
+    def _ct2pc(self, value: int) -> int:
+        return int(
+            100 - (self.dev.max_ct - value) / (self.dev.max_ct - self.dev.min_ct) * 100
+        )
+
+
+class YeelightWatcher(YeelightReport, WatcherBaseDriver):
     def __init__(self, dev):
         self.connection = socket.create_connection((dev.status.ip, dev.status.port))
         self.reader = self.connection.makefile()
@@ -14,32 +44,144 @@ class YeelightWatcher(WatcherBaseDriver):
 
     def watch(self, handler):
         while self._loop:
-            _data = dict()
             try:
-                jdata = json.loads(self.reader.readline())
+                report = self._parse(self.reader.readline())
             except json.JSONDecodeError as err:
                 print(err)
                 continue
 
-            if "params" in jdata:
-                if "ct" in jdata["params"]:
-                    jdata["params"]["ct_pc"] = self._ct2pc(int(jdata["params"]["ct"]))
-                handler(
-                    {
-                        "cmd": "report",
-                        "sid": self.dev.status.sid,
-                        "model": self.dev.status.model,
-                        "data": jdata["params"].copy(),
-                    }
-                )
-                # handler(jdata['params'].copy())
-
-    def _ct2pc(self, value: int) -> int:
-        return int(
-            100 - (self.dev.max_ct - value) / (self.dev.max_ct - self.dev.min_ct) * 100
-        )
+            if report:
+                handler(report)
 
     def stop(self):
         self._loop = False
         self.reader.close()
         self.connection.close()
+
+
+class AsyncYeelightWatcher(YeelightReport, AsyncWatcherBaseDriver):
+    """Bulb notifications read from asyncio stream, reconnects when connection drops"""
+
+    def __init__(self, dev, reconnect_delay: float = 5):
+        self.dev = dev
+        self._loop = True
+        self.reconnect_delay = reconnect_delay
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def watch(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        while self._loop:
+            try:
+                reader, self._writer = await asyncio.open_connection(
+                    self.dev.status.ip, self.dev.status.port
+                )
+                while self._loop:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    try:
+                        report = self._parse(line.decode())
+                    except json.JSONDecodeError as err:
+                        print(err)
+                        continue
+                    if report:
+                        handler(report)
+            except OSError as err:
+                print(err)
+            finally:
+                self._close()
+            if self._loop:
+                await asyncio.sleep(self.reconnect_delay)
+
+    def _close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def stop(self):
+        self._loop = False
+        self._close()
+
+
+class ReactorYeelightWatcher(YeelightReport, WatcherBaseDriver):
+    """Bulb notifications read by shared selector reactor, no own thread"""
+
+    reactor_driven = True
+
+    def __init__(
+        self, dev, reactor: Optional[Reactor] = None, reconnect_delay: float = 5
+    ):
+        self.dev = dev
+        self.reactor = reactor if reactor is not None else get_reactor()
+        self.reconnect_delay = reconnect_delay
+        self._loop = True
+        self._handler: Optional[Callable[[Dict[str, Any]], None]] = None
+        self.connection: Optional[socket.socket] = None
+
+    def watch(self, handler):
+        self._handler = handler
+        self._connect()
+
+    def _connect(self) -> None:
+        if not self._loop:
+            return
+        try:
+            self.connection = socket.create_connection(
+                (self.dev.status.ip, self.dev.status.port), timeout=5
+            )
+        except OSError as err:
+            print(err)
+            self._reconnect()
+            return
+        self.reactor.add_stream(self.connection, self._on_line, self._on_close)
+
+    def _reconnect(self) -> None:
+        if self._loop:
+            timer = Timer(self.reconnect_delay, self._connect)
+            timer.daemon = True
+            timer.start()
+
+    def _on_line(self, line: bytes) -> None:
+        try:
+            report = self._parse(line.decode())
+        except json.JSONDecodeError as err:
+            print(err)
+            return
+        if report:
+            self._handler(report)
+
+    def _on_close(self) -> None:
+        self._close()
+        self._reconnect()
+
+    def _close(self) -> None:
+        if self.connection is not None:
+            self.reactor.remove(self.connection)
+            self.connection.close()
+            self.connection = None
+
+    def stop(self):
+        self._loop = False
+        self._close()
+
+
+class YeelightConnectionWatcher(YeelightReport, WatcherBaseDriver):
+    """Bulb notifications from YeelightConnection shared with commands"""
+
+    reactor_driven = True
+
+    def __init__(self, dev, connection):
+        self.dev = dev
+        self.connection = connection
+        self._handler: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    def watch(self, handler):
+        self._handler = handler
+        self.connection.add_notification_handler(self._on_notification)
+
+    def _on_notification(self, msg: Dict[str, Any]) -> None:
+        report = self._report(msg)
+        if report:
+            self._handler(report)
+
+    def stop(self):
+        self.connection.remove_notification_handler(self._on_notification)
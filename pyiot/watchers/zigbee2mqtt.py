@@ -1,10 +1,14 @@
-from . import WatcherBaseDriver
+from . import AsyncWatcherBaseDriver, WatcherBaseDriver
+import asyncio
+from threading import get_ident
 from typing import Callable, Optional, Dict, Any
 from os.path import basename
 import json
 
 
-class Zigbee2mqttWatcher(WatcherBaseDriver):
+class Zigbee2mqttReport:
+    """Convert gateway mqtt message into report and update sub-device status"""
+
     def __init__(self, client, gateway):
         self._gateway = gateway
         self._client = client
@@ -14,6 +18,9 @@ class Zigbee2mqttWatcher(WatcherBaseDriver):
         self._loop = True
 
     def _on_message(self, client, userdata, message):
+        self._handler(self._parse(message))
+
+    def _parse(self, message) -> Dict[str, Any]:
         msg = {}
         msg["cmd"] = "report"
         msg["sid"] = basename(message.topic)
@@ -25,12 +32,117 @@ class Zigbee2mqttWatcher(WatcherBaseDriver):
             dev.status.update(msg["data"])
         else:
             msg["data"] = json.loads(message.payload)
-        self._handler(msg)
+        return msg
+
+    def stop(self):
+        self._loop = False
+
 
+class Zigbee2mqttWatcher(Zigbee2mqttReport, WatcherBaseDriver):
     def watch(self, handler: Callable[[Optional[Dict[str, Any]]], None]) -> None:
         while self._loop:
             self._handler = handler
             self._client.loop_forever()
 
+
+class AsyncZigbee2mqttWatcher(Zigbee2mqttReport, AsyncWatcherBaseDriver):
+    """Run paho client network loop on asyncio event loop.
+
+    Client socket is watched with loop add_reader/add_writer instead of blocking
+    loop_forever thread, so the gateway client must not be looped elsewhere.
+    After broker disconnect the client is reconnected in executor with doubled
+    delay up to max_reconnect_delay and the new socket is watched.
+
+    Args:
+        client (mqtt.Client): connected gateway client
+        gateway (Zigbee2mqttGateway): gateway of sub-devices
+        reconnect_delay (:obj:`float`, optional): seconds before first reconnect.
+            Defaults is 1.
+        max_reconnect_delay (:obj:`float`, optional): Defaults is 60.
+    """
+
+    def __init__(
+        self,
+        client,
+        gateway,
+        reconnect_delay: float = 1,
+        max_reconnect_delay: float = 60,
+    ):
+        super().__init__(client, gateway)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._stopped: Optional[asyncio.Future] = None
+        self._reconnecting: Optional[asyncio.Task] = None
+
+    async def watch(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        loop = asyncio.get_running_loop()
+        loop_thread = get_ident()
+        self._handler = handler
+        self._stopped = loop.create_future()
+
+        def in_loop(func: Callable[..., Any], *args: Any) -> None:
+            # reconnect runs in executor thread and opens socket from there
+            if get_ident() == loop_thread:
+                func(*args)
+            else:
+                loop.call_soon_threadsafe(func, *args)
+
+        def on_socket_open(client, userdata, sock):
+            in_loop(loop.add_reader, sock, client.loop_read)
+
+        def on_socket_close(client, userdata, sock):
+            in_loop(loop.remove_reader, sock)
+
+        def on_socket_register_write(client, userdata, sock):
+            in_loop(loop.add_writer, sock, client.loop_write)
+
+        def on_socket_unregister_write(client, userdata, sock):
+            in_loop(loop.remove_writer, sock)
+
+        def on_disconnect(client, userdata, rc, *args):
+            self._gateway._connected = False
+            if rc != 0:
+                in_loop(self._schedule_reconnect)
+
+        self._client.on_socket_open = on_socket_open
+        self._client.on_socket_close = on_socket_close
+        self._client.on_socket_register_write = on_socket_register_write
+        self._client.on_socket_unregister_write = on_socket_unregister_write
+        self._client.on_disconnect = on_disconnect
+        sock = self._client.socket()
+        if sock is not None:
+            on_socket_open(self._client, None, sock)
+            if self._client.want_write():
+                on_socket_register_write(self._client, None, sock)
+        try:
+            while not self._stopped.done():
+                self._client.loop_misc()
+                await asyncio.wait([self._stopped], timeout=1)
+        finally:
+            if self._reconnecting is not None:
+                self._reconnecting.cancel()
+
+    def _schedule_reconnect(self) -> None:
+        if self._reconnecting is None or self._reconnecting.done():
+            self._reconnecting = asyncio.get_running_loop().create_task(
+                self._reconnect()
+            )
+
+    async def _reconnect(self) -> None:
+        loop = asyncio.get_running_loop()
+        delay = self.reconnect_delay
+        while not self._stopped.done():
+            await asyncio.wait([self._stopped], timeout=delay)
+            if self._stopped.done():
+                return
+            try:
+                await loop.run_in_executor(None, self._client.reconnect)
+                return
+            except OSError as err:
+                print(err)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
     def stop(self):
-        self._loop = False
+        super().stop()
+        if self._stopped is not None and not self._stopped.done():
+            self._stopped.set_result(None)
@@ -14,14 +14,18 @@
 
 __all__ = ["Candle"]
 
-from typing import List, Dict, Any
+from threading import Lock
+from time import monotonic
+from typing import List, Dict, Any, Tuple
 from pyiot.traits import Dimmer, OnOff, ColorTemperature, Scene, Toggle
 from pyiot import BaseDevice
 from pyiot.watchers.philips_light import PhilipsLightWatcher
 from pyiot.watchers import Watcher
 from pyiot.discover.miio import DiscoverMiio
 from pyiot.connections.miio import MiioConnection
-from threading import Event
+
+# seconds for which read properties are shared by all readers
+PROP_TTL = 1.0
 
 
 class Candle(BaseDevice, OnOff, Dimmer, ColorTemperature, Scene, Toggle):
@@ -43,11 +47,14 @@ class Candle(BaseDevice, OnOff, Dimmer, ColorTemperature, Scene, Toggle):
             self.ip = dev.get("ip", "")
             self.port = dev.get("port", 0)
         self.conn = MiioConnection(token=token, ip=self.ip, port=self.port)
+        self._props: Dict[str, Tuple[Any, float]] = {}
+        self._props_lock = Lock()
+        # firmware may limit number of properties in one get_prop
+        self._max_props: int = 16
         self.status.add_alias("cct", "ct_pc")
         self.status.add_alias("snm", "scene")
         self._init_device()
 
-        self._event: Event = None
         self.watcher = Watcher(PhilipsLightWatcher(30, self))
 
     def _init_device(self):
@@ -56,6 +63,8 @@ class Candle(BaseDevice, OnOff, Dimmer, ColorTemperature, Scene, Toggle):
     def get_prop(self, props: List[str]) -> Dict[str, Any]:
         """
         This method is used to retrieve current property of smart LED.
+        All properties are read with one request and shared by readers for
+        PROP_TTL seconds.
 
         Args:
             *props (str): Variable length argument name of property to retrive
@@ -67,14 +76,37 @@ class Candle(BaseDevice, OnOff, Dimmer, ColorTemperature, Scene, Toggle):
                 * `dv` -
         """
         ret: Dict[str, Any] = {}
-        for prop in props:
-            ret_props = self.conn.send("get_prop", [prop])
-            try:
-                ret[prop] = ret_props["result"][0]
-            except KeyError:
-                pass
-            except IndexError:
-                pass
+        with self._props_lock:
+            now = monotonic()
+            missing: List[str] = []
+            for prop in dict.fromkeys(props):
+                cached = self._props.get(prop)
+                if cached is not None and now - cached[1] < PROP_TTL:
+                    ret[prop] = cached[0]
+                else:
+                    missing.append(prop)
+            for i in range(0, len(missing), self._max_props):
+                fetched = self._fetch_props(missing[i : i + self._max_props])
+                now = monotonic()
+                for prop, value in fetched.items():
+                    self._props[prop] = (value, now)
+                ret.update(fetched)
+        return ret
+
+    def _fetch_props(self, props: List[str]) -> Dict[str, Any]:
+        """Read props with one get_prop, split list when device rejects it"""
+        ret_props = self.conn.send("get_prop", props)
+        result = ret_props.get("result")
+        if isinstance(result, list) and len(result) == len(props):
+            return dict(zip(props, result))
+        if len(props) == 1:
+            return {}
+        half = len(props) // 2
+        ret = self._fetch_props(props[:half])
+        ret.update(self._fetch_props(props[half:]))
+        if len(ret) == len(props):
+            # every property is readable, so the list was too long
+            self._max_props = min(self._max_props, len(props) - 1)
         return ret
 
     def info(self):
@@ -86,18 +118,21 @@ class Candle(BaseDevice, OnOff, Dimmer, ColorTemperature, Scene, Toggle):
         data = self.get_prop(attrs)
         if data:
             self.status.update(data)
-        if isinstance(self._event, Event) and not self._event.is_set():
-            self._event.set()
+
+    def _command(self, method: str, params: List[Any], attrs: List[str]) -> None:
+        """Send command and read attrs changed by it"""
+        self.conn.send(method, params)
+        with self._props_lock:
+            self._props.clear()
+        self.refresh_status(attrs)
 
     def on(self):
         """This method is used to switch on the smart LED"""
-        self.conn.send("set_power", ["on"])
-        self.refresh_status(["power"])
+        self._command("set_power", ["on"], ["power"])
 
     def off(self):
         """This method is used to switch off the smart LED"""
-        self.conn.send("set_power", ["off"])
-        self.refresh_status(["power"])
+        self._command("set_power", ["off"], ["power"])
 
     def toggle(self) -> None:
         if self.is_on():
@@ -119,8 +154,7 @@ class Candle(BaseDevice, OnOff, Dimmer, ColorTemperature, Scene, Toggle):
                 The brightness is a percentage instead of a absolute value.
                 100 means maximum brightness while 1 means the minimum brightness.
         """
-        self.conn.send("set_bright", [value])
-        self.refresh_status(["bright", "power"])
+        self._command("set_bright", [value], ["bright", "power"])
 
     def set_ct_pc(self, pc: int) -> None:
         """This method is used to change the color temperature of a smart LED.
@@ -132,14 +166,11 @@ class Candle(BaseDevice, OnOff, Dimmer, ColorTemperature, Scene, Toggle):
         if pc == 0:
             pc = 1
 
-        self.conn.send("set_cct", [int(pc)])
-        self.refresh_status(["cct"])
+        self._command("set_cct", [int(pc)], ["cct"])
 
     def set_bricct(self, brightness: int, cct: int):
-        self.conn.send("set_bricct", [brightness, cct])
-        self.refresh_status(["cct", "bright", "power"])
+        self._command("set_bricct", [brightness, cct], ["cct", "bright", "power"])
 
     def set_scene(self, scene: Any, args: List[Any] = []) -> None:
         """Set scene number."""
-        self.conn.send("apply_fixed_scene", [scene.value])
-        self.refresh_status(["snm", "power"])
+        self._command("apply_fixed_scene", [scene.value], ["snm", "power"])
@@ -13,20 +13,34 @@
 # limitations under the License.
 
 from __future__ import annotations
+from concurrent.futures import Future
 
 __all__ = ["YeelightApi", "Mono", "Color", "Bslamp1", "DeskLamp"]
 from pyiot.connections import IdGen
+from pyiot.connections.limiter import CommandLimiter
 from pyiot.exceptions import DeviceIsOffline, DeviceTimeout
-from pyiot.connections.tcp import TcpConnection
+from pyiot.connections.yeelight import MusicServer, YeelightConnection
 from pyiot.status import Attribute
 from pyiot.traits import ColorTemperature, Dimmer, OnOff, Toggle, Rgb, Hsv
 from pyiot.discover.yeelight import DiscoverYeelight
 from pyiot.watchers import Watcher
-from pyiot.watchers.yeelight import YeelightWatcher
+from pyiot.watchers.yeelight import YeelightConnectionWatcher
 from pyiot import BaseDevice
-import json
-from time import sleep
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+
+
+# Bulbs allow about 60 commands per minute
+COMMAND_RATE = 55 / 60
+COMMAND_BURST = 5
+COALESCE_METHODS = (
+    "set_bright",
+    "set_ct_abx",
+    "set_rgb",
+    "set_hsv",
+    "set_scene",
+)
+# Music connection has no replies, these are sent over command connection
+QUERY_METHODS = ("get_prop", "cron_get")
 
 
 class YeelightApi:
@@ -35,7 +49,11 @@ class YeelightApi:
         self.answer_id = IdGen()
         self.efx: str = "smooth"
         self.duration: int = 500
-        self.conn = TcpConnection(ip, port)
+        self.conn = YeelightConnection(ip, port)
+        self.limiter = CommandLimiter(
+            self.conn.request, COMMAND_RATE, COMMAND_BURST, COALESCE_METHODS
+        )
+        self.music: Optional[MusicServer] = None
 
     def get_prop(self, props: List[str]) -> Dict[str, Any]:
         """
@@ -79,7 +97,7 @@ class YeelightApi:
                 ret.update(dict(zip(_props_set, ret_props)))
         return ret
 
-    def set_ct_abx(self, ct: int):
+    def set_ct_abx(self, ct: int) -> Future:
         """This method is used to change the color temperature of a smart LED.
 
         Args:
@@ -93,9 +111,12 @@ class YeelightApi:
 
             duration (:obj:`int`, optional): Specifies the total time of the gradual changing.
                 The unit is milliseconds. The minimum support duration is 30 milliseconds.
-                Default is `500`"""
+                Default is `500`
 
-        self.send("set_ct_abx", [ct, self.efx, self.duration])
+        Returns:
+            Future: reply of queued command, see YeelightApi.submit"""
+
+        return self.submit("set_ct_abx", [ct, self.efx, self.duration])
 
     def set_power(self, state: str, mode: int = 0) -> None:
         """This method is used to switch on or off the smart LED (software managed on/off).
@@ -155,7 +176,7 @@ class YeelightApi:
 
         self.send("stop_cf")
 
-    def set_scene(self, scene_class: Any, args: List[Any] = []):
+    def set_scene(self, scene_class: Any, args: List[Any] = []) -> Future:
         """This method is used to set the smart LED directly to specified state.
         If the smart LED is off, then it will turn on the smart LED firstly and then apply the specified command.
 
@@ -168,12 +189,15 @@ class YeelightApi:
                 * ``auto_delay_off`` means turn on the smart LED to specified brightness and
                     start a sleep timer to turn off the light after the specified minutes.
 
-            *args (int): args depends of scene_class"""
+            *args (int): args depends of scene_class
+
+        Returns:
+            Future: reply of queued command, see YeelightApi.submit"""
 
         params: List[Any] = list()
         params.append(scene_class)
         params.extend(args)
-        self.send("set_scene", params)
+        return self.submit("set_scene", params)
 
     def cron_add(self, cron_type: int, value: int):
         """This method is used to start a timer job on the smart LED.
@@ -270,6 +294,21 @@ class YeelightApi:
 
         self.send("set_music", [action, host, port])
 
+    def start_music(self, server: MusicServer) -> None:
+        """Start music mode with local music server, next commands are pushed by
+        server without replies and quota until stop_music.
+
+        Args:
+            server (MusicServer): music server shared by bulbs
+        """
+        server.connect(self.conn.ip, lambda host, port: self.set_music(1, host, port))
+        self.music = server
+
+    def stop_music(self) -> None:
+        if self.music is not None:
+            self.music.disconnect(self.conn.ip)
+            self.music = None
+
     def adjust(self, mode: str, percentage: int):
 
         self.send(mode, [percentage, self.duration])
@@ -285,31 +324,47 @@ class YeelightApi:
         self.send("set_name", [name])
 
     def send(self, method: str, params: List[Any] = []) -> int:
+        """Send command and wait for reply, it is stored in answers under
+        returned id. Errors are printed. In music mode only QUERY_METHODS wait,
+        other commands are pushed without reply."""
         _id: int = self.answer_id.get_next_id()
+        if self._music_mode(method):
+            self.music.push(self.conn.ip, method, params)
+            return _id
         try:
-            _msg = json.dumps({"id": _id, "method": method, "params": params})
-            self.conn.send(_msg.encode())
-            sleep(0.1)
-            self.conn.send("\r\n".encode())
-            self._get_result()
-        except DeviceIsOffline:
-            pass
-        except DeviceTimeout:
-            pass
-        finally:
-            self.conn.close()
+            self.answers[_id] = self.limiter.call(method, params)
+        except DeviceIsOffline as err:
+            print(err)
+        except DeviceTimeout as err:
+            print(err)
         return _id
 
-    def _get_result(self):
-        data_bytes = self.conn.recv(1024, retry=1)
-        ret = ""
-        if data_bytes:
-            try:
-                ret = json.loads(data_bytes.decode())
-                if "id" in ret:
-                    self.answers[ret.get("id")] = ret
-            except json.decoder.JSONDecodeError:
-                pass
+    def submit(self, method: str, params: List[Any] = []) -> Future:
+        """Queue command without waiting for reply.
+
+        Commands of COALESCE_METHODS still waiting in queue are replaced by
+        newer one. Returned future gives reply or raises DeviceIsOffline or
+        DeviceTimeout, errors are not printed so check it when result matters.
+        In music mode command is pushed and future is already done."""
+        future: Future = Future()
+        if self._music_mode(method):
+            self.music.push(self.conn.ip, method, params)
+            future.set_result({})
+            return future
+        _id: int = self.answer_id.get_next_id()
+        future = self.limiter.submit(method, params)
+        future.add_done_callback(lambda f: self._store_answer(_id, f))
+        return future
+
+    def _music_mode(self, method: str) -> bool:
+        """Return True when command has to be pushed over music connection"""
+        if method in QUERY_METHODS or self.music is None:
+            return False
+        return self.music.is_connected(self.conn.ip)
+
+    def _store_answer(self, _id: int, future: Future) -> None:
+        if future.exception() is None:
+            self.answers[_id] = future.result()
 
     @staticmethod
     def check_range(
@@ -336,7 +391,7 @@ class Mono(BaseDevice, OnOff, Toggle, Dimmer):
         self._init_device()
         self.api = YeelightApi(self.status.ip, self.status.port)
 
-        self.watcher = Watcher(YeelightWatcher(self))
+        self.watcher = Watcher(YeelightConnectionWatcher(self, self.api.conn))
         self.watcher.add_report_handler(self.status.update)
 
     def _init_device(self):
@@ -366,17 +421,20 @@ class Mono(BaseDevice, OnOff, Toggle, Dimmer):
         """This method is used to toggle the smart LED."""
         self.api.send("toggle")
 
-    def set_bright(self, value: int):
+    def set_bright(self, value: int) -> Future:
         """This method is used to change the brightness of a smart LED.
 
         Args:
             value (int): The target brightness. The type is integer and ranges from 1 to 100.
                 The brightness is a percentage instead of a absolute value.
                 100 means maximum brightness while 1 means the minimum brightness.
+
+        Returns:
+            Future: reply of queued command, see YeelightApi.submit
         """
         if value <= 0:
             value = 1
-        self.api.send("set_bright", [value, self.api.efx, self.api.duration])
+        return self.api.submit("set_bright", [value, self.api.efx, self.api.duration])
 
 
 class DeskLamp(Mono, ColorTemperature):
@@ -386,19 +444,22 @@ class DeskLamp(Mono, ColorTemperature):
         self.min_ct = 2700
         self.max_ct = 6500
 
-    def set_ct_pc(self, pc: int):
+    def set_ct_pc(self, pc: int) -> Future:
         """This method is used to change the color temperature of a smart LED with percent scale.
 
         Args:
             pc (int): Percentage target color temperature.
                 The type is integer and range is 0 ~ 100 (%).
+
+        Returns:
+            Future: reply of queued command, see YeelightApi.submit
         """
 
         value = int(self.min_ct + ((self.max_ct - self.min_ct) * pc / 100))
         self.api.check_range(
             value, self.min_ct, self.max_ct, msg=f"ct value range 0 - 100"
         )
-        self.api.set_ct_abx(value)
+        return self.api.set_ct_abx(value)
 
 
 class Color(DeskLamp, Rgb, Hsv):
@@ -407,35 +468,44 @@ class Color(DeskLamp, Rgb, Hsv):
         self.min_ct = 1700
         self.max_ct = 6500
 
-    def set_rgb(self, red: int = 0, green: int = 0, blue: int = 0) -> None:
+    def set_rgb(self, red: int = 0, green: int = 0, blue: int = 0) -> Future:
         """This method is used to change the color of a smart LED.
 
         Args:
             red (int): Red color value from 0 to 255.
             green (int): Green color value from 0 to 255.
-            blue (int): Blue color value from 0 to 255."""
+            blue (int): Blue color value from 0 to 255.
+
+        Returns:
+            Future: reply of queued command, see YeelightApi.submit"""
         rgb = (int(red) << 16) + (int(green) << 8) + int(blue)
-        self.api.send("set_rgb", [rgb, self.api.efx, self.api.duration])
+        return self.api.submit("set_rgb", [rgb, self.api.efx, self.api.duration])
 
-    def set_color(self, rgb: int) -> None:
+    def set_color(self, rgb: int) -> Future:
         """This method is used to change the color of a smart LED.
 
         Args:
-            rgb (int): Color value in RGB."""
+            rgb (int): Color value in RGB.
 
-        self.api.send("set_rgb", [rgb, self.api.efx, self.api.duration])
+        Returns:
+            Future: reply of queued command, see YeelightApi.submit"""
 
-    def set_hsv(self, hue: int, sat: int) -> None:
+        return self.api.submit("set_rgb", [rgb, self.api.efx, self.api.duration])
+
+    def set_hsv(self, hue: int, sat: int) -> Future:
         """This method is used to change the color of a smart LED.
 
         Args:
             hue (int): The target hue value, whose type is integer.
                 It should be expressed in decimal integer ranges from 0 to 359.
-            sat (int): The target saturation value whose type is integer. It's range is 0 to 100."""
+            sat (int): The target saturation value whose type is integer. It's range is 0 to 100.
+
+        Returns:
+            Future: reply of queued command, see YeelightApi.submit"""
 
         self.api.check_range(hue, end=359, msg="hue 0-359")
         self.api.check_range(sat, msg="sat 0-100")
-        self.api.send("set_hsv", [hue, sat, self.api.efx, self.api.duration])
+        return self.api.submit("set_hsv", [hue, sat, self.api.efx, self.api.duration])
 
 
 class Bslamp1(Color):
@@ -2,8 +2,8 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from pyiot import BaseDevice
 from pyiot.status import Attribute
-from pyiot.watchers import Watcher
-from typing import Any, Dict, List
+from pyiot.watchers import AsyncWatcher, Watcher
+from typing import Any, Dict, Iterable, List, Union
 
 
 class ZigbeeGateway(ABC):
@@ -65,12 +65,21 @@ class ZigbeeGateway(ABC):
         """
         pass
 
+    def register_sub_devices(self, devices: Iterable[ZigbeeDevice]) -> None:
+        """Register many sub-devices for status update
+
+        Args:
+            devices (Iterable[ZigbeeDevice]): Device instances
+        """
+        for device in devices:
+            self.register_sub_device(device)
+
     @abstractmethod
     def unregister_sub_device(self, device_id: str):
         pass
 
     @abstractmethod
-    def get_watcher(self) -> Watcher:
+    def get_watcher(self) -> Union[Watcher, AsyncWatcher]:
         pass
 
 
@@ -86,4 +95,4 @@ class ZigbeeDevice(BaseDevice):
         self.status.register_attribute(
             Attribute("low_voltage", int, readonly=True, value=2800)
         )
-        self.watcher: Watcher = self.gateway.get_watcher()
+        self.watcher: Union[Watcher, AsyncWatcher] = self.gateway.get_watcher()
@@ -1,20 +1,48 @@
 from __future__ import annotations
 import binascii
+from concurrent.futures import FIRST_COMPLETED, Future, TimeoutError, wait
+from contextlib import contextmanager
 from pyiot.zigbee.converter import Converter
 from Cryptodome.Cipher import AES
 from pyiot.zigbee import ZigbeeGateway, ZigbeeDevice
-from pyiot.connections.udp import UdpConnection
-from pyiot.watchers.aqara import GatewayWatcher
-from pyiot.watchers import Watcher
-from typing import Any, Dict, List
+from pyiot.connections.udp import UdpRequestConnection
+from pyiot.exceptions import DeviceTimeout
+from pyiot.watchers.aqara import AsyncGatewayWatcher, SharedGatewayWatcher
+from pyiot.watchers import AsyncWatcher, Watcher
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
 
 
 class AqaraGateway(ZigbeeGateway):
+    """Xiaomi Aqara gateway
+
+    Args:
+        ip (:obj:`str`, optional): gateway ip, "auto" to discover. Defaults is "auto".
+        port (:obj:`int`, optional): gateway port. Defaults is 9898.
+        sid (:obj:`str`, optional): gateway sid. Defaults is "".
+        gwpasswd (:obj:`str`, optional): password for writes. Defaults is "".
+        watcher_factory (:obj:`Callable`, optional): creates gateway watcher, e.g.
+            AqaraGateway.async_watcher. Defaults is AqaraGateway.sync_watcher.
+    """
+
+    # reads sent at once by read_devices, and how many times lost ones are resent
+    READ_WINDOW = 8
+    READ_RETRIES = 2
+    READ_TIMEOUT = 1.0
+
     def __init__(
-        self, ip: str = "auto", port: int = 9898, sid: str = "", gwpasswd: str = ""
+        self,
+        ip: str = "auto",
+        port: int = 9898,
+        sid: str = "",
+        gwpasswd: str = "",
+        watcher_factory: Optional[
+            Callable[[AqaraGateway], Union[Watcher, AsyncWatcher]]
+        ] = None,
     ):
         self._converter = Converter()
-        self.conn = UdpConnection()
+        self.conn = UdpRequestConnection()
         self.aes_key_iv = bytes(
             [
                 0x17,
@@ -45,9 +73,30 @@ class AqaraGateway(ZigbeeGateway):
             self.sid = sid
         self.gwpasswd = gwpasswd
         self._token: str = ""
+        self._key: str = ""
+        self._token_future: Optional[Future] = None
+        self._token_lock = Lock()
         self._subdevices: Dict[str, ZigbeeDevice] = dict()
-        self.watcher: Watcher = Watcher(GatewayWatcher())
+        self._deferred: Optional[List[ZigbeeDevice]] = None
+        self._gateway_watcher: Optional[SharedGatewayWatcher] = None
+        factory = watcher_factory if watcher_factory is not None else self.sync_watcher
+        self.watcher: Union[Watcher, AsyncWatcher] = factory(self)
         self.watcher.add_report_handler(self._handle_events)
+        if self.gwpasswd:
+            self.fetch_token()
+
+    @staticmethod
+    def sync_watcher(gateway: AqaraGateway) -> Watcher:
+        """Watcher with own worker threads fed by shared multicast listener"""
+        gateway._gateway_watcher = SharedGatewayWatcher(
+            gateway.sid, gateway.unicast_addr[0]
+        )
+        return Watcher(gateway._gateway_watcher, never_merge=("status",))
+
+    @staticmethod
+    def async_watcher(gateway: AqaraGateway) -> AsyncWatcher:
+        """Watcher on asyncio event loop, call gateway.watcher.start() from the loop"""
+        return AsyncWatcher(AsyncGatewayWatcher())
 
     @property
     def token(self) -> str:
@@ -55,25 +104,54 @@ class AqaraGateway(ZigbeeGateway):
 
     @token.setter
     def token(self, value: str):
-        self._token = value
+        if value != self._token:
+            self._token = value
+            self._key = ""
+
+    def fetch_token(self) -> Future:
+        """Ask gateway for token without waiting, reply updates token"""
+        with self._token_lock:
+            future = self._token_future
+            if future is None or future.done():
+                future = self._token_future = self.conn.submit(
+                    {"cmd": "get_id_list"},
+                    self.unicast_addr,
+                    ("get_id_list_ack", self.sid),
+                )
+                future.add_done_callback(self._on_token)
+            return future
+
+    def _on_token(self, future: Future) -> None:
+        if not future.cancelled() and future.exception() is None:
+            token = future.result().get("token", "")
+            if token:
+                self.token = token
 
     def refresh_token(self) -> None:
-        self.conn.send_json({"cmd": "get_id_list"}, self.unicast_addr)
-        ret = self.conn.recv_json()
-        self._token = ret.get("token", "")
+        future = self.fetch_token()
+        try:
+            future.result(self.conn.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise DeviceTimeout(f"{self.unicast_addr[0]} get_id_list")
 
-    def get_key(self):
-        """Get current gateway key"""
+    def get_key(self) -> str:
+        """Get current gateway key, derived once per token"""
+        key = self._key
+        if key:
+            return key
         if not self.token:
             self.refresh_token()
-        cipher = AES.new(self.gwpasswd.encode("utf8"), AES.MODE_CBC, iv=self.aes_key_iv)
-        encrypted = cipher.encrypt(self.token.encode("utf8"))
-        return binascii.hexlify(encrypted).decode()
+        token = self.token
+        cipher = AES.new(self.gwpasswd.encode(), AES.MODE_CBC, iv=self.aes_key_iv)
+        key = binascii.hexlify(cipher.encrypt(token.encode("utf8"))).decode()
+        if token == self.token:
+            self._key = key
+        return key
 
     def whois(self) -> Dict[str, Any]:
         """Discover the gateway device send multicast msg (IP: 224.0.0.50 peer_port: 4321 protocal: UDP)"""
-        self.conn.send_json({"cmd": "whois"}, self.multicast_addr)
-        return self.conn.recv_json()
+        return self.conn.request({"cmd": "whois"}, self.multicast_addr, ("iam", ""))
 
     def _handle_events(self, event: Dict[str, Any]):
         _sid: str = event.get("sid", "")
@@ -89,10 +167,21 @@ class AqaraGateway(ZigbeeGateway):
     def set_device(self, device_id: str, payload: Dict[str, Any]) -> None:
         _payload = payload.copy()
         _payload["key"] = self.get_key()
-        self.conn.send_json(
-            {"cmd": "write", "sid": device_id, "data": _payload}, self.unicast_addr
+        ret = self.conn.request(
+            {"cmd": "write", "sid": device_id, "data": _payload},
+            self.unicast_addr,
+            ("write_ack", device_id),
         )
-        self.conn.recv_json()
+        data = ret.get("data")
+        if isinstance(data, dict) and "key" in str(data.get("error", "")).lower():
+            # token changed before heartbeat reached us, write again with new key
+            self.token = ""
+            _payload["key"] = self.get_key()
+            self.conn.request(
+                {"cmd": "write", "sid": device_id, "data": _payload},
+                self.unicast_addr,
+                ("write_ack", device_id),
+            )
 
     def send_command(self, device_id: str, argument_name: str, value: str):
         dev = self._subdevices.get(device_id)
@@ -103,20 +192,84 @@ class AqaraGateway(ZigbeeGateway):
             )
 
     def get_device(self, device_id: str) -> Dict[str, Any]:
-        self.conn.send_json({"cmd": "read", "sid": device_id}, self.unicast_addr)
-        ret = self.conn.recv_json()
-        if ret.get("sid", "") == device_id:
-            return ret
-        else:
-            return {}
+        return self.conn.request(
+            {"cmd": "read", "sid": device_id},
+            self.unicast_addr,
+            ("read_ack", device_id),
+        )
 
     def get_device_list(self) -> List[Dict[str, Any]]:
-        self.conn.send_json({"cmd": "get_id_list"}, self.unicast_addr)
-        sid_list = self.conn.recv_json()
-        ret = []
-        for sid in sid_list.get("data", []):
-            ret.append(self.get_device(sid))
-        return ret
+        sid_list = self.conn.request(
+            {"cmd": "get_id_list"}, self.unicast_addr, ("get_id_list_ack", self.sid)
+        )
+        sids: List[str] = sid_list.get("data", [])
+        replies = self.read_devices(sids)
+        return [replies[sid] for sid in sids if sid in replies]
+
+    def read_devices(
+        self,
+        sids: Iterable[str],
+        on_reply: Optional[Callable[[Dict[str, Any]], None]] = None,
+        window: int = READ_WINDOW,
+        retries: int = READ_RETRIES,
+        timeout: float = READ_TIMEOUT,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Read many sub-devices with pipelined requests.
+
+        At most window reads are in flight, next read is sent as soon as a reply
+        arrives. Reads without reply in timeout are resent up to retries times.
+
+        Args:
+            sids (Iterable[str]): sub-devices to read
+            on_reply (:obj:`Callable`, optional): called with every reply as it
+                arrives. Defaults is None.
+            window (:obj:`int`, optional): Defaults is READ_WINDOW.
+            retries (:obj:`int`, optional): Defaults is READ_RETRIES.
+            timeout (:obj:`float`, optional): seconds to wait for one reply.
+                Defaults is READ_TIMEOUT.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: replies by sid, lost sids are missing
+        """
+        replies: Dict[str, Dict[str, Any]] = {}
+        missing = list(dict.fromkeys(sids))
+        for _ in range(retries + 1):
+            queue = list(reversed(missing))
+            in_flight: Dict[Future, str] = {}
+            deadlines: Dict[Future, float] = {}
+            while queue or in_flight:
+                while queue and len(in_flight) < max(window, 1):
+                    sid = queue.pop()
+                    future = self.conn.submit(
+                        {"cmd": "read", "sid": sid},
+                        self.unicast_addr,
+                        ("read_ack", sid),
+                    )
+                    in_flight[future] = sid
+                    deadlines[future] = monotonic() + timeout
+                done, _ = wait(
+                    in_flight,
+                    max(min(deadlines.values()) - monotonic(), 0),
+                    return_when=FIRST_COMPLETED,
+                )
+                now = monotonic()
+                for future in list(in_flight):
+                    if future not in done and deadlines[future] > now:
+                        continue
+                    sid = in_flight.pop(future)
+                    del deadlines[future]
+                    if future not in done:
+                        future.cancel()
+                    elif future.exception() is None:
+                        replies[sid] = future.result()
+                        if on_reply is not None:
+                            on_reply(replies[sid])
+            missing = [sid for sid in missing if sid not in replies]
+            if not missing:
+                break
+        if missing:
+            print(f"no reply from {self.sid} sub-devices {missing}")
+        return replies
 
     def set_accept_join(self, status: bool) -> None:
         permission = {True: "yes", False: "no"}.get(status)
@@ -126,23 +279,59 @@ class AqaraGateway(ZigbeeGateway):
         self.set_device(self.sid, {"remove_device": device_id})
 
     def register_sub_device(self, device: ZigbeeDevice):
+        if self._deferred is not None:
+            self._add_sub_device(device)
+            self._deferred.append(device)
+        else:
+            self.register_sub_devices([device])
+
+    def register_sub_devices(self, devices: Iterable[ZigbeeDevice]) -> None:
+        """Register sub-devices and read their status with pipelined reads"""
+        sids: List[str] = []
+        for device in devices:
+            self._add_sub_device(device)
+            sids.append(device.status.sid)
+        self.read_devices(sids, on_reply=self._update_sub_device)
+
+    @contextmanager
+    def deferred_registration(self) -> Iterator[None]:
+        """Sub-devices created in the block are read together at its end
+
+        Example:
+            with gateway.deferred_registration():
+                devices = [Plug(sid, gateway) for sid in sids]
+        """
+        self._deferred = []
+        try:
+            yield
+        finally:
+            deferred, self._deferred = self._deferred, None
+            self.read_devices(
+                [device.status.sid for device in deferred],
+                on_reply=self._update_sub_device,
+            )
+
+    def _add_sub_device(self, device: ZigbeeDevice) -> None:
         self._subdevices[device.status.sid] = device
+        if self._gateway_watcher is not None:
+            self._gateway_watcher.add_device(device.status.sid)
         self._converter.add_device(
             device.status.model, payloads.get(device.status.model, {})
         )
-        self.conn.send_json(
-            {"cmd": "read", "sid": device.status.sid}, self.unicast_addr
-        )
-        ret = self.conn.recv_json()
-        if ret.get("sid", "") == device.status.sid:
+
+    def _update_sub_device(self, reply: Dict[str, Any]) -> None:
+        device = self._subdevices.get(reply.get("sid", ""))
+        if device is not None:
             device.status.update(
-                self._converter.to_status(ret.get("model", ""), ret.get("data", {}))
+                self._converter.to_status(reply.get("model", ""), reply.get("data", {}))
             )
 
     def unregister_sub_device(self, device_id: str):
         del self._subdevices[device_id]
+        if self._gateway_watcher is not None:
+            self._gateway_watcher.remove_device(device_id)
 
-    def get_watcher(self) -> Watcher:
+    def get_watcher(self) -> Union[Watcher, AsyncWatcher]:
         return self.watcher
 
 
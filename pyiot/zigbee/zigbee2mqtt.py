@@ -1,14 +1,26 @@
 from pyiot.zigbee.converter import Converter
 from . import ZigbeeGateway, ZigbeeDevice
 from pyiot.zigbee.converter import Converter
-from pyiot.watchers import Watcher
-from pyiot.watchers.zigbee2mqtt import Zigbee2mqttWatcher
+from pyiot.watchers import AsyncWatcher, Watcher
+from pyiot.watchers.zigbee2mqtt import AsyncZigbee2mqttWatcher, Zigbee2mqttWatcher
 import json
 import paho.mqtt.client as mqtt
-from typing import Any, Callable, Dict, List, Set
+from typing import Any, Callable, Dict, List, Optional, Set, Union
 
 
 class Zigbee2mqttGateway(ZigbeeGateway):
+    """Zigbee2mqtt bridge reached through mqtt broker
+
+    Args:
+        host (:obj:`str`, optional): broker host. Defaults is "localhost".
+        port (:obj:`int`, optional): broker port. Defaults is 1883.
+        user (:obj:`str`, optional): broker user. Defaults is "".
+        password (:obj:`str`, optional): broker password. Defaults is "".
+        watcher_factory (:obj:`Callable`, optional): creates gateway watcher, e.g.
+            Zigbee2mqttGateway.async_watcher. Defaults is
+            Zigbee2mqttGateway.sync_watcher.
+    """
+
     def __init__(
         self,
         host: str = "localhost",
@@ -17,6 +29,9 @@ class Zigbee2mqttGateway(ZigbeeGateway):
         password: str = "",
         ssl: bool = False,
         sid: str = "",
+        watcher_factory: Optional[
+            Callable[["Zigbee2mqttGateway"], Union[Watcher, AsyncWatcher]]
+        ] = None,
     ) -> None:
         self._topics: Set[str] = set()
         self._client: mqtt.Client = mqtt.Client()
@@ -27,7 +42,21 @@ class Zigbee2mqttGateway(ZigbeeGateway):
         self._client.connect(host=host, port=port, keepalive=60)
         self._subdevices: Dict[str, ZigbeeDevice] = dict()
         self._converter = Converter()
-        self.watcher: Watcher = Watcher(Zigbee2mqttWatcher(self._client, self))
+        factory = watcher_factory if watcher_factory is not None else self.sync_watcher
+        self.watcher: Union[Watcher, AsyncWatcher] = factory(self)
+
+    @staticmethod
+    def sync_watcher(gateway: "Zigbee2mqttGateway") -> Watcher:
+        """Watcher running paho client loop in own thread"""
+        return Watcher(
+            Zigbee2mqttWatcher(gateway._client, gateway),
+            never_merge=("click", "action"),
+        )
+
+    @staticmethod
+    def async_watcher(gateway: "Zigbee2mqttGateway") -> AsyncWatcher:
+        """Watcher running paho client on asyncio loop, call start from the loop"""
+        return AsyncWatcher(AsyncZigbee2mqttWatcher(gateway._client, gateway))
 
     def _on_connect(
         self, client: mqtt.Client, userdata: Any, flags: Any, rc: Any
@@ -93,7 +122,7 @@ class Zigbee2mqttGateway(ZigbeeGateway):
     def remove_device(self, device_id: str) -> None:
         self._client.publish("zigbee2mqtt/bridge/config/remove", device_id)
 
-    def get_watcher(self) -> Watcher:
+    def get_watcher(self) -> Union[Watcher, AsyncWatcher]:
         return self.watcher
 
 
@@ -12,4 +12,5 @@ setup(
     author_email="sebastian.zwierzchowski@gmail.com",
     description="",
     requires=["zeroconf", "pycryptodomex"],
+    extras_require={"fleet": ["numpy"]},
 )
@@ -45,8 +45,28 @@ clock_test() {
     python -m unittest -v tests/test_clock.py
 }
 
+fleet_test() {
+    echo ">>> Run Fleet Test"
+    python -m unittest -v tests/test_fleet.py
+}
+
+registry_test() {
+    echo ">>> Run Registry Test"
+    python -m unittest -v tests/test_registry.py
+}
+
+watcher_test() {
+    echo ">>> Run Watcher Test"
+    python -m unittest -v tests/test_watcher.py
+}
+
+connections_test() {
+    echo ">>> Run Connections Test"
+    python -m unittest -v tests/test_connections.py
+}
+
 print_tests() {
-    tests=("sonoff" "yeelight" "aqara" "z2m" "aqara_gateway" "bravia" "base" "philips" "all")
+    tests=("sonoff" "yeelight" "aqara" "z2m" "aqara_gateway" "bravia" "base" "philips" "fleet" "registry" "watcher" "connections" "all")
     for test in ${tests[@]}
     do
         echo ">>> $test"
@@ -72,6 +92,10 @@ while [ "$1" != "" ]; do
         "base")base_test;;
         "philips")philips_test;;
         "clock")clock_test;;
+        "fleet")fleet_test;;
+        "registry")registry_test;;
+        "watcher")watcher_test;;
+        "connections")connections_test;;
         "sonoff_zigbee")sonoff_zigbee;;
         "all")
         sonoff_test &&
@@ -27,3 +27,87 @@ class TestBase(unittest.TestCase):
 
         with self.assertRaises(AttributeError):
             self.status.test_oneshot = "bar"
+
+
+class TestSchema(unittest.TestCase):
+    def _status(self, sid: str) -> DeviceStatus:
+        status = DeviceStatus()
+        status.register_attribute(Attribute("sid", str, value=sid, readonly=True))
+        status.register_attribute(Attribute("power", str))
+        status.add_alias("state", "power")
+        return status
+
+    def test_shared_schema(self):
+        one = self._status("one")
+        two = self._status("two")
+        self.assertIs(one.schema, two.schema)
+        self.assertEqual(one.sid, "one")
+        self.assertEqual(two.sid, "two")
+
+    def test_alias(self):
+        status = self._status("alias")
+        status.update({"state": "on"})
+        self.assertEqual(status.power, "on")
+        self.assertEqual(status.schema.index("state"), status.schema.index("power"))
+        self.assertEqual(status(), {"sid": "alias", "power": "on", "state": "on"})
+
+    def test_unregister(self):
+        status = self._status("unregister")
+        status.unregister_attribute("power")
+        self.assertEqual(status.get_attr_names(), ["sid"])
+        self.assertEqual(status.get("state"), "")
+
+
+class TestChanges(unittest.TestCase):
+    def setUp(self):
+        self.status = DeviceStatus()
+        self.status.register_attribute(Attribute("power", str))
+        self.status.register_attribute(Attribute("bright", int))
+        self.status.add_alias("state", "power")
+
+    def test_update_delta(self):
+        self.assertEqual(
+            self.status.update({"state": "on", "bright": 10}),
+            {"state": "on", "bright": 10},
+        )
+        self.assertEqual(
+            self.status.update({"power": "on", "bright": 20}), {"bright": 20}
+        )
+        self.assertEqual(self.status.update({"power": "on"}), {})
+
+    def test_changes_since(self):
+        version = self.status.version
+        self.status.power = "on"
+        self.assertTrue(self.status.is_changed("state", version))
+        self.assertFalse(self.status.is_changed("bright", version))
+        middle = self.status.version
+        self.status.set("bright", "30")
+        self.assertEqual(
+            self.status.changes_since(version), {"power": "on", "bright": 30}
+        )
+        self.assertEqual(self.status.changes_since(middle), {"bright": 30})
+        self.assertEqual(self.status.changes_since(self.status.version), {})
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.status = DeviceStatus()
+        self.status.register_attribute(Attribute("power", str))
+
+    def test_cached_until_change(self):
+        first = self.status()
+        self.assertIs(first, self.status())
+        self.assertIs(self.status.to_json(), self.status.to_json())
+        self.status.power = "on"
+        second = self.status()
+        self.assertIsNot(first, second)
+        self.assertEqual(second, {"power": "on"})
+        self.assertEqual(self.status.to_json(), '{"power": "on"}')
+
+    def test_read_only(self):
+        snapshot = self.status()
+        with self.assertRaises(TypeError):
+            snapshot["power"] = "off"
+        mutable = snapshot.copy()
+        mutable["power"] = "off"
+        self.assertEqual(self.status.power, "")
@@ -0,0 +1,849 @@
+import asyncio
+import http.client
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import pad, unpad
+import json
+import socket
+import struct
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Lock, Thread
+from time import monotonic, sleep
+from typing import Any, Dict, List, Optional
+from pyiot.connections.http import (
+    AsyncHostPool,
+    AsyncHttpConnection,
+    HostPool,
+    HttpConnection,
+)
+from pyiot.connections.limiter import CommandLimiter
+from pyiot.connections.miio import MiioConnection, MiioPacket, handshake_all
+from pyiot.connections.udp import UdpRequestConnection
+from pyiot.connections.yeelight import MusicServer, YeelightConnection
+from pyiot.exceptions import DeviceIsOffline, DeviceTimeout
+from pyiot.sony.bravia import BraviaApi, BraviaError
+from pyiot.xiaomi.aqara import Plug
+from pyiot.xiaomi.philips_light import Candle
+from pyiot.zigbee.aqaragateway import AqaraGateway
+from pyiot.watchers import AsyncWatcher
+from pyiot.watchers.reactor import Reactor
+from pyiot.xiaomi.yeelight import YeelightApi
+
+
+class FakeBulb:
+    """Answer yeelight commands: "slow" after 0.1 s, "silent" never, "set_power"
+    with props notification before reply"""
+
+    def __init__(self) -> None:
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port: int = self.server.getsockname()[1]
+        self.connections: List[socket.socket] = []
+        self.music: List[Dict[str, Any]] = []
+        self.accepted = Event()
+        self._lock = Lock()
+        Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections.append(conn)
+            self.accepted.set()
+            Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _send(self, conn: socket.socket, msg: Dict[str, Any]) -> None:
+        with self._lock:
+            conn.sendall(json.dumps(msg).encode() + b"\r\n")
+
+    def _serve(self, conn: socket.socket) -> None:
+        for line in conn.makefile("rb"):
+            msg = json.loads(line)
+            reply = {"id": msg["id"], "result": [msg["method"]] + msg["params"]}
+            if msg["method"] == "slow":
+                Thread(target=self._later, args=(conn, reply)).start()
+            elif msg["method"] == "set_power":
+                self._send(conn, {"method": "props", "params": {"power": "on"}})
+                self._send(conn, reply)
+            elif msg["method"] == "set_music":
+                Thread(target=self._music, args=msg["params"][1:], daemon=True).start()
+                self._send(conn, reply)
+            elif msg["method"] != "silent":
+                self._send(conn, reply)
+
+    def _music(self, host: str, port: int) -> None:
+        with socket.create_connection((host, port)) as conn:
+            for line in conn.makefile("rb"):
+                self.music.append(json.loads(line))
+
+    def _later(self, conn: socket.socket, reply: Dict[str, Any]) -> None:
+        sleep(0.1)
+        self._send(conn, reply)
+
+    def drop(self) -> None:
+        for conn in self.connections:
+            conn.shutdown(socket.SHUT_RDWR)
+            conn.close()
+        self.connections.clear()
+        self.accepted.clear()
+
+    def close(self) -> None:
+        self.drop()
+        if self.server.fileno() >= 0:
+            self.server.shutdown(socket.SHUT_RDWR)
+            self.server.close()
+
+
+class TestYeelightConnection(unittest.TestCase):
+    def setUp(self) -> None:
+        self.bulb = FakeBulb()
+        self.reactor = Reactor()
+        self.conn = YeelightConnection(
+            "127.0.0.1",
+            self.bulb.port,
+            timeout=1,
+            reconnect_delay=0.05,
+            reactor=self.reactor,
+        )
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        self.bulb.close()
+        self.reactor.stop()
+
+    def test_request(self):
+        start = monotonic()
+        for i in range(20):
+            ret = self.conn.request("get_prop", ["power", i])
+            self.assertEqual(ret["result"], ["get_prop", "power", i])
+        self.assertLess(monotonic() - start, 1)
+        self.assertEqual(len(self.bulb.connections), 1)
+
+    def test_in_flight(self):
+        with ThreadPoolExecutor(8) as pool:
+            slow = pool.submit(self.conn.request, "slow", [1])
+            fast = [pool.submit(self.conn.request, "fast", [i]) for i in range(7)]
+            for i, future in enumerate(fast):
+                self.assertEqual(future.result()["result"], ["fast", i])
+            self.assertFalse(slow.done())
+            self.assertEqual(slow.result()["result"], ["slow", 1])
+
+    def test_notification(self):
+        notifications: List[Dict[str, Any]] = []
+        self.conn.add_notification_handler(notifications.append)
+        ret = self.conn.request("set_power", ["on"])
+        self.assertEqual(ret["result"], ["set_power", "on"])
+        self.assertEqual(
+            notifications, [{"method": "props", "params": {"power": "on"}}]
+        )
+
+    def test_timeout(self):
+        with self.assertRaises(DeviceTimeout):
+            self.conn.request("silent", timeout=0.05)
+        self.assertEqual(self.conn.request("ping")["result"], ["ping"])
+
+    def test_reconnect(self):
+        self.conn.add_notification_handler(print)
+        self.assertTrue(self.bulb.accepted.wait(1))
+        with ThreadPoolExecutor(1) as pool:
+            pending = pool.submit(self.conn.request, "silent")
+            sleep(0.05)
+            self.bulb.drop()
+            with self.assertRaises(DeviceIsOffline):
+                pending.result()
+        self.assertTrue(self.bulb.accepted.wait(1))
+        self.assertEqual(self.conn.request("ping")["result"], ["ping"])
+
+    def test_offline(self):
+        self.bulb.close()
+        with self.assertRaises(DeviceIsOffline):
+            self.conn.request("ping")
+
+
+class FakeGateway:
+    """Answer aqara gateway reads, later for lower sid number, "lost" never,
+    "flaky" sids from second read, writes with key of token's gateway password"""
+
+    token = "0123456789abcdef"
+    passwd = "fedcba9876543210"
+
+    def __init__(self) -> None:
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.addr = self.sock.getsockname()
+        self.reads: List[str] = []
+        self.writes: List[Dict[str, Any]] = []
+        self.sids = [f"sid{i}" for i in range(5)]
+        Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except OSError:
+                return
+            msg = json.loads(data)
+            if msg["cmd"] == "whois":
+                self._reply({"cmd": "iam", "sid": "gw", "ip": "127.0.0.1"}, addr, 0)
+            elif msg["cmd"] == "get_id_list":
+                reply = {"cmd": "get_id_list_ack", "sid": "gw", "token": self.token}
+                reply["data"] = json.dumps(self.sids)
+                self._reply(reply, addr, 0)
+            elif msg["cmd"] == "read":
+                self.reads.append(msg["sid"])
+                if msg["sid"].startswith("flaky") and self.reads.count(msg["sid"]) < 2:
+                    continue
+                if msg["sid"] != "lost":
+                    data = json.dumps({"status": "on"})
+                    reply = {"cmd": "read_ack", "sid": msg["sid"], "data": data}
+                    reply["model"] = "plug"
+                    delay = 0.1 - int(msg["sid"][-1]) * 0.02
+                    Thread(target=self._reply, args=(reply, addr, delay)).start()
+            elif msg["cmd"] == "write":
+                self.writes.append(msg["data"])
+                data = {"status": "ok"}
+                if msg["data"]["key"] != self.key():
+                    data = {"error": "Invalid key"}
+                reply = {
+                    "cmd": "write_ack",
+                    "sid": msg["sid"],
+                    "data": json.dumps(data),
+                }
+                self._reply(reply, addr, 0)
+
+    def key(self) -> str:
+        iv = bytes.fromhex("17996d093d28ddb3ba695a2e6f58562e")
+        cipher = AES.new(self.passwd.encode(), AES.MODE_CBC, iv=iv)
+        return cipher.encrypt(self.token.encode()).hex()
+
+    def _reply(self, msg: Dict[str, Any], addr: Any, delay: float) -> None:
+        sleep(delay)
+        self.sock.sendto(json.dumps(msg).encode(), addr)
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class TestUdpRequestConnection(unittest.TestCase):
+    def setUp(self) -> None:
+        self.gateway = FakeGateway()
+        self.reactor = Reactor()
+        self.conn = UdpRequestConnection(timeout=1, reactor=self.reactor)
+
+    def tearDown(self) -> None:
+        self.conn.close()
+        self.gateway.close()
+        self.reactor.stop()
+
+    def read(self, sid: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self.conn.request(
+            {"cmd": "read", "sid": sid}, self.gateway.addr, ("read_ack", sid), timeout
+        )
+
+    def test_in_flight(self):
+        sids = [f"sid{i}" for i in range(5)]
+        start = monotonic()
+        with ThreadPoolExecutor(5) as pool:
+            replies = list(pool.map(self.read, sids))
+        self.assertLess(monotonic() - start, 0.3)
+        self.assertEqual([reply["sid"] for reply in replies], sids)
+        self.assertEqual(replies[0]["data"], {"status": "on"})
+        self.assertEqual(self.conn.in_flight(), 0)
+
+    def test_any_sid(self):
+        reply = self.conn.request({"cmd": "whois"}, self.gateway.addr, ("iam", ""))
+        self.assertEqual(reply["sid"], "gw")
+
+    def test_timeout(self):
+        with self.assertRaises(DeviceTimeout):
+            self.read("lost", timeout=0.05)
+        self.assertEqual(self.conn.in_flight(), 0)
+        self.assertEqual(self.read("sid1")["sid"], "sid1")
+
+
+class TestAqaraGatewayReads(unittest.TestCase):
+    def setUp(self) -> None:
+        self.fake = FakeGateway()
+        self.gateway = AqaraGateway("127.0.0.1", self.fake.addr[1], sid="gw")
+
+    def tearDown(self) -> None:
+        self.gateway.conn.close()
+        self.gateway._gateway_watcher.stop()
+        self.fake.close()
+
+    def test_device_list(self):
+        start = monotonic()
+        devices = self.gateway.get_device_list()
+        self.assertLess(monotonic() - start, 0.3)
+        self.assertEqual([dev["sid"] for dev in devices], self.fake.sids)
+
+    def test_retry_missing(self):
+        sids = ["sid1", "flaky1", "lost", "flaky2"]
+        replies = self.gateway.read_devices(sids, window=2, timeout=0.2)
+        self.assertEqual(sorted(replies), ["flaky1", "flaky2", "sid1"])
+        self.assertEqual(self.fake.reads.count("sid1"), 1)
+        self.assertEqual(self.fake.reads.count("flaky1"), 2)
+        self.assertEqual(self.fake.reads.count("lost"), 3)
+
+    def test_key_cached(self):
+        self.gateway.gwpasswd = FakeGateway.passwd
+        self.gateway.token = FakeGateway.token
+        key = self.gateway.get_key()
+        self.assertEqual(key, self.fake.key())
+        self.gateway.token = FakeGateway.token
+        self.assertIs(self.gateway.get_key(), key)
+        self.gateway.token = "1" * 16
+        self.assertNotEqual(self.gateway.get_key(), key)
+
+    def test_token_fetched_at_start(self):
+        gateway = AqaraGateway(
+            "127.0.0.1", self.fake.addr[1], sid="gw", gwpasswd=FakeGateway.passwd
+        )
+        gateway.fetch_token().result(1)
+        self.assertEqual(gateway.token, FakeGateway.token)
+        gateway.set_device("sid1", {"status": "on"})
+        self.assertEqual(self.fake.writes[-1]["key"], self.fake.key())
+        gateway.conn.close()
+        gateway._gateway_watcher.stop()
+
+    def test_stale_token(self):
+        self.gateway.gwpasswd = FakeGateway.passwd
+        self.gateway.token = "1" * 16
+        self.gateway.set_device("sid1", {"status": "on"})
+        self.assertEqual(
+            [write["key"] == self.fake.key() for write in self.fake.writes],
+            [False, True],
+        )
+
+    def test_deferred_registration(self):
+        with self.gateway.deferred_registration():
+            plugs = [Plug(sid, self.gateway) for sid in self.fake.sids]
+            self.assertEqual(self.fake.reads, [])
+        self.assertEqual([plug.status.power for plug in plugs], ["on"] * 5)
+
+    def test_async_watcher(self):
+        gateway = AqaraGateway(
+            "127.0.0.1",
+            self.fake.addr[1],
+            sid="gw",
+            watcher_factory=AqaraGateway.async_watcher,
+        )
+        self.assertIsInstance(gateway.watcher, AsyncWatcher)
+        self.assertIsNone(gateway._gateway_watcher)
+        plug = Plug("sid1", gateway)
+        self.assertIs(plug.watcher, gateway.watcher)
+        event = {"cmd": "report", "sid": "sid1", "data": {"status": "off"}}
+        asyncio.run(gateway.watcher._handle_events(event))
+        self.assertEqual(plug.status.power, "off")
+        gateway.conn.close()
+
+
+class FakeMiioDevice:
+    """Answer miio hello after delay, get_prop with props values and other
+    commands with their params, commands are ignored after restart until next
+    hello"""
+
+    token = "00112233445566778899aabbccddeeff"
+
+    def __init__(self, hello_delay: float = 0) -> None:
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port: int = self.sock.getsockname()[1]
+        self.hello_delay = hello_delay
+        self.hellos = 0
+        self.stamps: List[int] = []
+        self.started = monotonic() - 1000
+        self.restarted = False
+        self.props = {"power": "on", "bright": 50, "cct": 30, "snm": 0, "dv": 0}
+        self.max_props = 0
+        self.commands: List[List[Any]] = []
+        Thread(target=self._serve, daemon=True).start()
+
+    def restart(self) -> None:
+        self.started = monotonic()
+        self.restarted = True
+
+    def _stamp(self) -> int:
+        return int(monotonic() - self.started)
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except OSError:
+                return
+            packet = MiioPacket(self.token)
+            packet.device_id = 1234
+            if data[4:] == b"\xff" * 28:
+                self.hellos += 1
+                self.restarted = False
+                sleep(self.hello_delay)
+                packet.stamp = self._stamp()
+                self.sock.sendto(packet.generate(b"")[:32], addr)
+                continue
+            packet.stamp = struct.unpack("!I", data[12:16])[0]
+            self.stamps.append(packet.stamp)
+            if self.restarted:
+                continue
+            cipher = AES.new(packet.key, AES.MODE_CBC, iv=packet.iv)
+            msg = json.loads(unpad(cipher.decrypt(data[32:]), 64))
+            # MiioPacket.parse accepts padding to 32 bytes blocks
+            self.commands.append([msg["method"]] + msg["params"])
+            reply = {"id": msg["id"], "result": msg["params"]}
+            if msg["method"] == "get_prop":
+                reply["result"] = [self.props.get(p, "") for p in msg["params"]]
+                if self.max_props and len(msg["params"]) > self.max_props:
+                    reply = {"id": msg["id"], "error": {"code": -5001}}
+            reply = json.dumps(reply).encode()
+            cipher = AES.new(packet.key, AES.MODE_CBC, iv=packet.iv)
+            packet.stamp = self._stamp()
+            head = packet.generate(b"")[:32]
+            self.sock.sendto(head + cipher.encrypt(pad(reply, 32)), addr)
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class TestMiioConnection(unittest.TestCase):
+    def setUp(self) -> None:
+        self.device = FakeMiioDevice()
+        self.conn = MiioConnection(
+            FakeMiioDevice.token, "127.0.0.1", self.device.port, timeout=0.2
+        )
+
+    def tearDown(self) -> None:
+        self.device.close()
+
+    def test_one_hello(self):
+        for i in range(5):
+            self.assertEqual(self.conn.send("echo", [i])["result"], [i])
+        self.assertEqual(self.device.hellos, 1)
+        self.assertTrue(all(stamp >= 1000 for stamp in self.device.stamps))
+
+    def test_restart(self):
+        self.conn.send("get_prop", ["power"])
+        self.device.restart()
+        self.assertEqual(self.conn.send("get_prop", ["power"])["result"], ["on"])
+        self.assertEqual(self.device.hellos, 2)
+        self.assertLess(self.device.stamps[-1], 10)
+
+    def test_offline(self):
+        self.device.close()
+        with self.assertRaises(DeviceTimeout):
+            self.conn.send("get_prop", ["power"])
+
+    def test_offline_command(self):
+        self.device.close()
+        with self.assertRaises(DeviceTimeout):
+            self.conn.send("set_power", ["on"])
+        with self.assertRaises(DeviceTimeout):
+            self.conn.submit("set_bright", [10]).result(2)
+
+    def test_overlapping_handshakes(self):
+        devices = [FakeMiioDevice(hello_delay=0.1) for _ in range(5)]
+        conns = [
+            MiioConnection(FakeMiioDevice.token, "127.0.0.1", device.port)
+            for device in devices
+        ]
+        start = monotonic()
+        self.assertEqual(handshake_all(conns), [])
+        self.assertLess(monotonic() - start, 0.3)
+        self.assertTrue(all(conn.handshake.valid for conn in conns))
+        for device in devices:
+            device.close()
+
+
+class TestCandleProps(unittest.TestCase):
+    def setUp(self) -> None:
+        self.device = FakeMiioDevice()
+
+    def tearDown(self) -> None:
+        self.device.close()
+
+    def candle(self) -> Candle:
+        return Candle("candle", FakeMiioDevice.token, "127.0.0.1", self.device.port)
+
+    def test_one_request(self):
+        candle = self.candle()
+        self.assertEqual(candle.status.power, "on")
+        self.assertEqual(candle.status.bright, 50)
+        self.assertEqual(
+            self.device.commands, [["get_prop", "power", "bright", "cct", "snm", "dv"]]
+        )
+
+    def test_split(self):
+        self.device.max_props = 2
+        candle = self.candle()
+        self.assertEqual(candle.status.cct, 30)
+        self.device.commands.clear()
+        candle.refresh_status(["power"])
+        candle.set_bright(20)
+        self.assertEqual(
+            self.device.commands,
+            [["set_bright", 20], ["get_prop", "bright", "power"]],
+        )
+
+    def test_ttl(self):
+        candle = self.candle()
+        with ThreadPoolExecutor(4) as pool:
+            for props in pool.map(candle.get_prop, [["power", "bright"]] * 4):
+                self.assertEqual(props, {"power": "on", "bright": 50})
+        self.assertEqual(len(self.device.commands), 1)
+
+
+class TestMusicServer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.bulb = FakeBulb()
+        self.server = MusicServer("127.0.0.1", tick=0.05)
+        self.api = YeelightApi("127.0.0.1", self.bulb.port)
+
+    def tearDown(self) -> None:
+        self.server.close()
+        self.api.conn.close()
+        self.bulb.close()
+
+    def test_push_frames(self):
+        self.api.start_music(self.server)
+        self.assertTrue(self.server.is_connected("127.0.0.1"))
+        for bright in range(1, 101):
+            self.api.send("set_bright", [bright, "sudden", 0])
+        self.api.send("set_rgb", [255, "sudden", 0])
+        sleep(0.2)
+        sent = [(cmd["method"], cmd["params"][0]) for cmd in self.bulb.music]
+        self.assertLess(len(sent), 10)
+        self.assertEqual(sent[-2:], [("set_bright", 100), ("set_rgb", 255)])
+
+    def test_submit_error(self):
+        self.assertEqual(
+            self.api.submit("set_bright", [1]).result(2)["result"], ["set_bright", 1]
+        )
+        self.api.conn.close()
+        self.bulb.close()
+        with self.assertRaises((DeviceIsOffline, DeviceTimeout)):
+            self.api.submit("set_bright", [2]).result(2)
+
+    def test_query_in_music_mode(self):
+        self.api.start_music(self.server)
+        self.assertEqual(self.api.get_prop(["power"]), {"power": "get_prop"})
+        self.api.send("set_bright", [10, "sudden", 0])
+        sleep(0.2)
+        self.assertEqual([cmd["method"] for cmd in self.bulb.music], ["set_bright"])
+
+    def test_stop_music(self):
+        self.api.start_music(self.server)
+        self.api.stop_music()
+        self.assertFalse(self.server.is_connected("127.0.0.1"))
+        self.api.send("ping")
+        self.assertEqual(self.bulb.music, [])
+        self.assertEqual(
+            self.api.answers[self.api.answer_id.current_id]["result"], ["ping"]
+        )
+
+
+class TestCommandLimiter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.sent: List[Any] = []
+        self.release = Event()
+        self.release.set()
+
+    def send(self, method: str, params: List[Any]) -> Dict[str, Any]:
+        self.release.wait(2)
+        self.sent.append((method, params[0] if params else None))
+        return {"result": [method] + params}
+
+    def test_rate(self):
+        limiter = CommandLimiter(self.send, rate=50, burst=2)
+        start = monotonic()
+        for i in range(7):
+            self.assertEqual(limiter.call("get_prop", [i]), {"result": ["get_prop", i]})
+        self.assertGreater(monotonic() - start, 0.09)
+        self.assertEqual(limiter.stats.sent, 7)
+        self.assertGreater(limiter.stats.latency_percentile(99), 0.015)
+
+    def test_last_write_wins(self):
+        limiter = CommandLimiter(self.send, rate=1000, coalesce=("set_bright",))
+        self.release.clear()
+        with ThreadPoolExecutor(16) as pool:
+            first = pool.submit(limiter.call, "set_power", ["on"])
+            sleep(0.05)
+            results = [pool.submit(limiter.call, "set_bright", [i]) for i in range(10)]
+            sleep(0.05)
+            toggles = [pool.submit(limiter.call, "toggle") for _ in range(2)]
+            sleep(0.05)
+            self.release.set()
+            self.assertEqual(first.result()["result"], ["set_power", "on"])
+            for future in results:
+                self.assertEqual(future.result()["result"], ["set_bright", 9])
+            for future in toggles:
+                future.result()
+        self.assertEqual(
+            self.sent,
+            [
+                ("set_power", "on"),
+                ("set_bright", 9),
+                ("toggle", None),
+                ("toggle", None),
+            ],
+        )
+        self.assertEqual(limiter.stats.dropped, 9)
+
+    def test_submit_sequential(self):
+        limiter = CommandLimiter(self.send, rate=10, burst=2, coalesce=("set_bright",))
+        start = monotonic()
+        futures = [limiter.submit("set_bright", [i]) for i in range(8)]
+        self.assertLess(monotonic() - start, 0.05)
+        for future in futures[2:]:
+            self.assertEqual(future.result(1), {"result": ["set_bright", 7]})
+        self.assertEqual(self.sent[-1], ("set_bright", 7))
+        self.assertLessEqual(len(self.sent), 3)
+        self.assertGreaterEqual(limiter.stats.dropped, 5)
+
+    def test_error(self):
+        def send(method: str, params: List[Any]) -> None:
+            raise DeviceTimeout(method)
+
+        limiter = CommandLimiter(send, rate=100)
+        with self.assertRaises(DeviceTimeout):
+            limiter.call("set_power", ["on"])
+        self.assertEqual(limiter.stats.sent, 1)
+
+
+class HttpHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections: List[socket.socket] = []
+
+    def do_POST(self) -> None:
+        if self.connection not in self.connections:
+            self.connections.append(self.connection)
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("slow"):
+            sleep(0.05)
+        body = json.dumps({"path": self.path, "data": json.loads(data)}).encode()
+        self.send_response(200)
+        if self.path.endswith("truncated"):
+            self.send_header("Content-Length", str(len(body) + 10))
+            self.close_connection = True
+        else:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.connection not in self.connections:
+            self.connections.append(self.connection)
+        if self.path.endswith("silent"):
+            sleep(0.2)
+        self.send_response(200)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in (b'{"path": ', json.dumps(self.path).encode(), b"}"):
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class TestHttpConnection(unittest.TestCase):
+    def setUp(self) -> None:
+        HttpHandler.connections = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), HttpHandler)
+        self.server.daemon_threads = True
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.conn = HttpConnection(f"http://127.0.0.1:{self.server.server_port}/sony")
+
+    def tearDown(self) -> None:
+        self.conn.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        for i in range(10):
+            resp = self.conn.post("system", data={"id": i})
+            self.assertEqual(resp.code, 200)
+            self.assertEqual(resp.json, {"path": "/sony/system", "data": {"id": i}})
+        self.assertEqual(len(HttpHandler.connections), 1)
+
+    def test_stale_connection(self):
+        self.assertEqual(self.conn.post("system", data={"id": 1}).code, 200)
+        HttpHandler.connections[0].shutdown(socket.SHUT_RDWR)
+        sleep(0.05)
+        resp = self.conn.post("system", data={"id": 2})
+        self.assertEqual(resp.json["data"], {"id": 2})
+        self.assertEqual(len(HttpHandler.connections), 2)
+
+    def test_max_connections(self):
+        self.conn.pool = HostPool(
+            "http", "127.0.0.1", self.server.server_port, max_connections=2
+        )
+        with ThreadPoolExecutor(6) as pool:
+            codes = list(
+                pool.map(
+                    lambda i: self.conn.post("slow", data={"id": i}).code, range(6)
+                )
+            )
+        self.assertEqual(codes, [200] * 6)
+        self.assertEqual(len(HttpHandler.connections), 2)
+
+    def test_truncated_body(self):
+        self.conn.pool = HostPool(
+            "http", "127.0.0.1", self.server.server_port, max_connections=2
+        )
+        for i in range(5):
+            resp = self.conn.post("truncated", data={"id": i})
+            self.assertIsInstance(resp.resp, http.client.IncompleteRead)
+        self.assertEqual(self.conn.post("system", data={"id": 5}).code, 200)
+
+    def test_no_free_connection(self):
+        self.conn.pool = HostPool(
+            "http", "127.0.0.1", self.server.server_port, max_connections=1
+        )
+        self.conn.timeout = 0.05
+        with self.conn.post("system", data={"id": 1}, stream=True):
+            self.assertEqual(self.conn.post("system", data={"id": 2}).code, 408)
+        self.assertEqual(self.conn.post("system", data={"id": 3}).code, 200)
+
+    def test_json_cached(self):
+        resp = self.conn.post("system", data={"id": 1})
+        self.assertIs(resp.json, resp.json)
+
+    def test_stream_close(self):
+        for i in range(5):
+            with self.conn.post("system", data={"id": i}, stream=True) as resp:
+                self.assertEqual(resp.code, 200)
+        self.assertEqual(self.conn.post("system", data={"id": 5}).json["data"]["id"], 5)
+        self.assertEqual(len(HttpHandler.connections), 1)
+
+    def test_iter_content(self):
+        resp = self.conn.get("info", stream=True)
+        self.assertEqual(b"".join(resp.iter_content(4)), b'{"path": "/sony/info"}')
+        with self.assertRaises(ValueError):
+            resp.body
+        self.assertEqual(self.conn.get("info").json, {"path": "/sony/info"})
+        self.assertEqual(len(HttpHandler.connections), 1)
+
+    def test_stream_unknown_length(self):
+        self.conn.get("info", stream=True).close()
+        self.assertEqual(self.conn.get("info").code, 200)
+        self.assertEqual(len(HttpHandler.connections), 2)
+
+
+class TestAsyncHttpConnection(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        HttpHandler.connections = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), HttpHandler)
+        self.server.daemon_threads = True
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.conn = AsyncHttpConnection(
+            f"http://127.0.0.1:{self.server.server_port}/sony"
+        )
+
+    def tearDown(self) -> None:
+        self.conn.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def test_keep_alive(self):
+        for i in range(10):
+            resp = await self.conn.post("system", data={"id": i})
+            self.assertEqual(resp.code, 200)
+            self.assertEqual(resp.json, {"path": "/sony/system", "data": {"id": i}})
+        self.assertEqual(len(HttpHandler.connections), 1)
+
+    async def test_chunked(self):
+        resp = await self.conn.get("info", query={"a": "1"})
+        self.assertEqual(resp.json, {"path": "/sony/info?a=1"})
+        self.assertEqual((await self.conn.get("info")).code, 200)
+        self.assertEqual(len(HttpHandler.connections), 1)
+
+    async def test_concurrent(self):
+        self.conn.pool = AsyncHostPool(
+            "http", "127.0.0.1", self.server.server_port, max_connections=3
+        )
+        start = monotonic()
+        resps = await asyncio.gather(
+            *(self.conn.post("slow", data={"id": i}) for i in range(6))
+        )
+        self.assertLess(monotonic() - start, 0.25)
+        self.assertEqual([resp.json["data"]["id"] for resp in resps], list(range(6)))
+        self.assertEqual(len(HttpHandler.connections), 3)
+
+    async def test_stale_connection(self):
+        self.assertEqual((await self.conn.post("system", data={"id": 1})).code, 200)
+        HttpHandler.connections[0].shutdown(socket.SHUT_RDWR)
+        await asyncio.sleep(0.05)
+        resp = await self.conn.post("system", data={"id": 2})
+        self.assertEqual(resp.json["data"], {"id": 2})
+        self.assertEqual(len(HttpHandler.connections), 2)
+
+    async def test_timeout(self):
+        self.conn.timeout = 0.05
+        self.assertEqual((await self.conn.get("silent")).code, 408)
+        self.conn.timeout = 1
+        self.assertEqual((await self.conn.get("info")).code, 200)
+
+
+class BraviaHandler(BaseHTTPRequestHandler):
+    """Answer Bravia JSON-RPC calls after 0.1 s"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    results = {
+        "getPowerStatus": {"result": [{"status": "active"}], "id": 10},
+        "getSystemInformation": {"result": [{"model": "KDL-48W585B"}], "id": 10},
+        "getPlayingContentInfo": {"error": [7, "Illegal State"], "id": 10},
+    }
+
+    def do_POST(self) -> None:
+        msg = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        sleep(0.1)
+        body = json.dumps(self.results[msg["method"]]).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class TestBraviaBatch(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), BraviaHandler)
+        self.server.daemon_threads = True
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api = BraviaApi(f"127.0.0.1:{self.server.server_port}")
+        self.calls = [
+            ("system", "getPowerStatus"),
+            ("system", "getSystemInformation"),
+            ("avContent", "getPlayingContentInfo"),
+        ]
+
+    def tearDown(self) -> None:
+        self.api.conn.pool.close()
+        self.api.aconn.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def check_results(self, results: List[Any]) -> None:
+        self.assertEqual(self.api.parse_power(results[0]), "on")
+        self.assertEqual(results[1], {"model": "KDL-48W585B"})
+        self.assertIsInstance(results[2], BraviaError)
+
+    def test_batch(self):
+        start = monotonic()
+        self.check_results(self.api.batch(self.calls, return_exceptions=True))
+        self.assertLess(monotonic() - start, 0.2)
+        with self.assertRaises(BraviaError):
+            self.api.batch(self.calls)
+
+    async def test_async_batch(self):
+        start = monotonic()
+        self.check_results(
+            await self.api.async_batch(self.calls, return_exceptions=True)
+        )
+        self.assertLess(monotonic() - start, 0.2)
+        self.assertEqual(await self.api.async_batch([]), [])
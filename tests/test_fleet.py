@@ -0,0 +1,81 @@
+import unittest
+from pyiot import BaseDevice
+from pyiot.status import Attribute
+from pyiot.traits import TemperatureStatus
+
+try:
+    from pyiot.fleet import FleetStore
+except ImportError:
+    FleetStore = None
+
+
+class Sensor(BaseDevice, TemperatureStatus):
+    def __init__(self, sid: str, linkquality: int, temperature: str) -> None:
+        super().__init__(sid)
+        self.status.register_attribute(Attribute("linkquality", int))
+        self.status.register_attribute(Attribute("voltage", int))
+        self.status.update({"linkquality": linkquality, "temperature": temperature})
+
+
+@unittest.skipUnless(FleetStore, "fleet needs numpy")
+class TestFleetStore(unittest.TestCase):
+    def setUp(self):
+        self.store = FleetStore(columns=["temperature"], capacity=2)
+        self.devices = [
+            Sensor(f"s{i}", linkquality=10 * i + 5, temperature=f"{2000 + i * 100}")
+            for i in range(6)
+        ]
+        for dev in self.devices:
+            self.store.add_device(dev)
+
+    def test_columns(self):
+        self.assertEqual(len(self.store), 6)
+        self.assertIn("temperature", self.store.columns)
+        self.assertNotIn("sid", self.store.columns)
+        self.assertEqual(
+            list(self.store.column("linkquality")), [5, 15, 25, 35, 45, 55]
+        )
+
+    def test_select(self):
+        low = self.store.column("linkquality") < 30
+        self.assertEqual(self.store.select(low), ["s0", "s1", "s2"])
+
+    def test_incremental_update(self):
+        self.devices[4].status.linkquality = 1
+        self.devices[5].status.voltage = 2700
+        mask = self.store.column("linkquality") < 5
+        mask |= self.store.column("voltage") < 2800
+        self.assertEqual(self.store.select(mask), ["s4", "s5"])
+
+    def test_aggregate_and_top_k(self):
+        self.assertEqual(self.store.aggregate("temperature", "max"), 2500)
+        self.assertEqual(self.store.aggregate("voltage", "count"), 0)
+        self.assertEqual(
+            self.store.top_k("linkquality", 2), [("s5", 55.0), ("s4", 45.0)]
+        )
+        self.assertEqual(
+            self.store.top_k("linkquality", 1, largest=False), [("s0", 5.0)]
+        )
+
+    def test_remove(self):
+        self.store.remove_device("s1")
+        self.devices[1].status.linkquality = 99
+        self.assertNotIn("s1", self.store)
+        self.assertEqual(sorted(self.store.sid_list), ["s0", "s2", "s3", "s4", "s5"])
+        self.assertEqual(self.store.aggregate("linkquality", "max"), 55)
+
+    def test_zero_value_added(self):
+        store = FleetStore()
+        sensor = Sensor("zero", linkquality=5, temperature="0")
+        sensor.status.linkquality = 0
+        store.add_device(sensor)
+        self.assertEqual(list(store.column("linkquality")), [0])
+        self.assertEqual(store.aggregate("voltage", "count"), 0)
+
+    def test_column_copy(self):
+        column = self.store.column("linkquality")
+        self.devices[0].status.linkquality = 99
+        self.store.remove_device("s1")
+        self.assertEqual(list(column), [5, 15, 25, 35, 45, 55])
+        self.assertEqual(self.store.select(column < 30), ["s0", "s5", "s2"])
+        self.assertEqual(self.store.select(column > 50), [])
@@ -0,0 +1,73 @@
+import unittest
+from pyiot import BaseDevice
+from pyiot.registry import DeviceRegistry
+from pyiot.traits import OnOff, TemperatureStatus
+
+
+class Light(BaseDevice, OnOff):
+    def __init__(self, sid: str, place: str) -> None:
+        super().__init__(sid)
+        self.status.model = "light"
+        self.status.place = {"en": place}
+
+    def on(self):
+        pass
+
+    def off(self):
+        pass
+
+    def is_on(self) -> bool:
+        return False
+
+    def is_off(self) -> bool:
+        return True
+
+
+class Thermometer(BaseDevice, TemperatureStatus):
+    def __init__(self, sid: str, place: str) -> None:
+        super().__init__(sid)
+        self.status.model = "sensor_ht"
+        self.status.place = {"en": place, "pl": "Kuchnia"}
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = DeviceRegistry()
+        self.kitchen_light = Light("l1", "kitchen")
+        self.hall_light = Light("l2", "hall")
+        self.thermometer = Thermometer("t1", "kitchen")
+        for dev in (self.kitchen_light, self.hall_light, self.thermometer):
+            self.registry.add(dev)
+
+    def test_lookup(self):
+        self.assertIs(self.registry.get("l1"), self.kitchen_light)
+        self.assertEqual(len(self.registry.by_trait("OnOff")), 2)
+        self.assertEqual(self.registry.by_model("sensor_ht"), [self.thermometer])
+        self.assertEqual(self.registry.by_place("Kuchnia"), [self.thermometer])
+        self.assertEqual(
+            self.registry.find(trait="OnOff", place="kitchen"), [self.kitchen_light]
+        )
+        self.assertEqual(self.registry.find(trait="OnOff", model="sensor_ht"), [])
+
+    def test_place_change(self):
+        self.hall_light.status.place = {"en": "kitchen"}
+        self.assertEqual(len(self.registry.find(trait="OnOff", place="kitchen")), 2)
+        self.assertEqual(self.registry.by_place("hall"), [])
+
+    def test_reindex(self):
+        self.hall_light.status.place["en"] = "kitchen"
+        self.assertEqual(
+            self.registry.find(trait="OnOff", place="kitchen"), [self.kitchen_light]
+        )
+        self.registry.reindex(self.hall_light)
+        self.assertEqual(len(self.registry.find(trait="OnOff", place="kitchen")), 2)
+        self.assertEqual(self.registry.by_place("hall"), [])
+        with self.assertRaises(ValueError):
+            self.registry.reindex(Light("l3", "hall"))
+
+    def test_remove(self):
+        self.registry.remove("l1")
+        self.kitchen_light.status.model = "other"
+        self.assertNotIn("l1", self.registry)
+        self.assertEqual(self.registry.by_model("other"), [])
+        self.assertEqual(self.registry.by_place("kitchen"), [self.thermometer])
@@ -26,3 +26,54 @@ class TestTraits(unittest.TestCase):
         d = Dev("ddddd")
         print(c.status.switches)
         print(d.status.switches)
+
+
+class Lamp(BaseDevice, OnOff, Dimmer):
+    def on(self):
+        pass
+
+    def off(self):
+        pass
+
+    def is_on(self) -> bool:
+        return True
+
+    def is_off(self) -> bool:
+        return False
+
+    def set_bright(self, value: int):
+        pass
+
+
+class ColorLamp(Lamp, Rgb):
+    def set_rgb(self, red: int, green: int, blue: int):
+        pass
+
+    def set_color(self, rgb: int):
+        pass
+
+
+class TestTraitRegistry(unittest.TestCase):
+    def test_resolved_per_class(self):
+        self.assertEqual(Lamp._traits, ("OnOff", "Dimmer"))
+        self.assertEqual(ColorLamp._traits, ("OnOff", "Dimmer", "Rgb"))
+        self.assertEqual(
+            ColorLamp._cmds, ("on", "off", "set_bright", "set_rgb", "set_color")
+        )
+
+    def test_instances_share_schema(self):
+        a = ColorLamp("aaaaa")
+        b = ColorLamp("bbbbb")
+        self.assertIs(a.traits, b.traits)
+        self.assertEqual(len(ColorLamp._attr_list), 3)
+        self.assertIn("rgb", a.status.get_attr_names())
+        self.assertEqual(b.status.sid, "bbbbb")
+
+    def test_device_status_cache(self):
+        lamp = Lamp("lamp")
+        status = lamp.get_device_status()
+        self.assertIs(status, lamp.get_device_status())
+        self.assertEqual(status["bright"], "0")
+        lamp.status.bright = 20
+        self.assertEqual(lamp.get_device_status()["bright"], "20")
+        self.assertIn('"bright": "20"', lamp.get_device_status_json())
@@ -0,0 +1,554 @@
+import asyncio
+import json
+import socket
+import unittest
+from threading import Event
+from time import monotonic, sleep
+from typing import Any, Callable, Dict, List, Optional
+from pyiot import BaseDevice
+from pyiot.exceptions import DeviceTimeout
+from pyiot.status import Attribute
+from pyiot.watchers import (
+    DEFAULT_WORKERS,
+    AsyncPollingWatcher,
+    AsyncWatcher,
+    AsyncWatcherBaseDriver,
+    OverflowPolicy,
+    Watcher,
+    WatcherBaseDriver,
+    get_worker_pool,
+)
+from pyiot.watchers.reactor import Reactor
+from pyiot.watchers.sony import BraviaWatcher
+from pyiot.sony.bravia import KDL48W585B
+from pyiot.watchers import aqara, scheduler
+from pyiot.watchers.zigbee2mqtt import AsyncZigbee2mqttWatcher
+
+
+class ManualDriver(WatcherBaseDriver):
+    def __init__(self) -> None:
+        self.ready = Event()
+        self.emit: Callable[[Dict[str, Any]], None] = print
+
+    def watch(self, handler: Callable[[Optional[Dict[str, Any]]], None]) -> None:
+        self.emit = handler
+        self.ready.set()
+
+    def stop(self) -> None:
+        pass
+
+
+def wait_for(check: Callable[[], bool], timeout: float = 2) -> None:
+    for _ in range(int(timeout / 0.01)):
+        if check():
+            return
+        sleep(0.01)
+
+
+class TestWatcher(unittest.TestCase):
+    def _watcher(self, **kwargs: Any) -> Watcher:
+        self.driver = ManualDriver()
+        watcher = Watcher(self.driver, **kwargs)
+        self.driver.ready.wait(1)
+        self.events: List[Dict[str, Any]] = []
+        self.release = Event()
+        self.release.set()
+
+        def handler(event: Dict[str, Any]) -> None:
+            self.release.wait(2)
+            self.events.append(event)
+
+        watcher.add_report_handler(handler)
+        return watcher
+
+    def test_order_per_sid(self):
+        watcher = self._watcher(workers=4)
+        for i in range(50):
+            self.driver.emit({"sid": f"dev{i % 3}", "data": {"n": i}})
+        wait_for(lambda: watcher.stats.handled == 50)
+        for sid in ("dev0", "dev1", "dev2"):
+            numbers = [e["data"]["n"] for e in self.events if e["sid"] == sid]
+            self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual(watcher.stats.queued, 0)
+
+    def test_drop_oldest(self):
+        watcher = self._watcher(workers=1, queue_depth=2)
+        self.release.clear()
+        for i in range(5):
+            self.driver.emit({"sid": "dev", "data": {"n": i}})
+            sleep(0.02)
+        self.release.set()
+        wait_for(lambda: watcher.stats.queued == 0 and len(self.events) == 3)
+        self.assertEqual([e["data"]["n"] for e in self.events], [0, 3, 4])
+        self.assertEqual(watcher.stats.dropped, 2)
+
+    def test_coalesce(self):
+        watcher = self._watcher(
+            workers=1, queue_depth=1, overflow=OverflowPolicy.COALESCE
+        )
+        self.release.clear()
+        self.driver.emit({"sid": "dev", "data": {"power": "on"}})
+        sleep(0.05)
+        self.driver.emit({"sid": "dev", "data": {"bright": 1}})
+        self.driver.emit({"sid": "dev", "data": {"bright": 2, "ct": 3}})
+        self.release.set()
+        wait_for(lambda: len(self.events) == 2)
+        self.assertEqual(self.events[1]["data"], {"bright": 2, "ct": 3})
+        self.assertEqual(watcher.stats.coalesced, 1)
+
+    def test_coalesce_bounded(self):
+        watcher = self._watcher(
+            workers=1,
+            queue_depth=2,
+            overflow=OverflowPolicy.COALESCE,
+            never_merge=("status",),
+        )
+        self.release.clear()
+        self.driver.emit({"sid": "sw", "data": {"status": 0}})
+        wait_for(lambda: watcher.stats.queued == 0)
+        for i in range(1, 10):
+            self.driver.emit({"sid": "sw", "data": {"status": i}})
+            self.assertLessEqual(len(watcher._queues["sw"]), 2)
+        self.release.set()
+        wait_for(lambda: watcher.stats.queued == 0 and len(self.events) == 3)
+        self.assertEqual([e["data"]["status"] for e in self.events], [0, 8, 9])
+        self.assertEqual(watcher.stats.dropped, 7)
+        self.assertEqual(watcher.stats.coalesced, 0)
+
+    def test_coalesce_window(self):
+        watcher = self._watcher(coalesce_window=0.05, never_merge=("status",))
+        for i in range(20):
+            self.driver.emit({"cmd": "report", "sid": "plug", "data": {"power": i}})
+        self.driver.emit({"cmd": "report", "sid": "sw", "data": {"status": "click"}})
+        self.driver.emit({"cmd": "report", "sid": "sw", "data": {"status": "click"}})
+        self.driver.emit({"cmd": "report", "sid": "plug", "data": {"status": "on"}})
+        wait_for(lambda: watcher.stats.handled == 4)
+        sleep(0.1)
+        plug = [e["data"] for e in self.events if e["sid"] == "plug"]
+        self.assertEqual(plug, [{"power": 19}, {"status": "on"}])
+        self.assertEqual(len([e for e in self.events if e["sid"] == "sw"]), 2)
+        self.assertEqual(watcher.stats.coalesced, 19)
+
+    def test_coalesce_window_flush(self):
+        watcher = self._watcher(coalesce_window=0.02)
+        self.driver.emit({"cmd": "report", "sid": "bulb", "data": {"bright": 1}})
+        self.driver.emit({"cmd": "report", "sid": "bulb", "data": {"ct": 2}})
+        wait_for(lambda: watcher.stats.handled == 1)
+        self.driver.emit({"cmd": "report", "sid": "bulb", "data": {"bright": 3}})
+        wait_for(lambda: watcher.stats.handled == 2)
+        self.assertEqual(
+            [e["data"] for e in self.events], [{"bright": 1, "ct": 2}, {"bright": 3}]
+        )
+
+    def test_idle_workers_exit(self):
+        watcher = self._watcher(workers=4, idle_timeout=0.05)
+        self.assertEqual(watcher.pool.workers, 0)
+        for i in range(8):
+            self.driver.emit({"sid": f"dev{i}", "data": {"n": i}})
+        wait_for(lambda: watcher.stats.handled == 8)
+        self.assertLessEqual(watcher.pool.workers, 4)
+        wait_for(lambda: watcher.pool.workers == 0)
+        self.assertEqual(watcher.pool.workers, 0)
+
+    def test_shared_pool(self):
+        first = self._watcher()
+        second = Watcher(ManualDriver())
+        self.assertIs(first.pool, second.pool)
+        self.assertIs(first.pool, get_worker_pool())
+        self.assertEqual(first.pool.max_workers, DEFAULT_WORKERS)
+
+    def test_empty_queues_removed(self):
+        watcher = self._watcher()
+        for i in range(50):
+            self.driver.emit({"sid": f"dev{i}", "data": {"n": i}})
+        wait_for(lambda: watcher.stats.handled == 50)
+        self.assertEqual(watcher._queues, {})
+        self.assertEqual(watcher._busy, set())
+
+
+class TestSubscriptions(unittest.TestCase):
+    def setUp(self) -> None:
+        self.watcher = Watcher(ManualDriver())
+        self.calls: List[str] = []
+
+    def handler(self, name: str) -> Callable[[Dict[str, Any]], None]:
+        return lambda event: self.calls.append(name)
+
+    def test_match(self):
+        self.watcher.add_report_handler(self.handler("all"))
+        self.watcher.subscribe(self.handler("sid"), sid="lamp1")
+        self.watcher.subscribe(
+            self.handler("sid_power"), sid="lamp1", attribute="power"
+        )
+        self.watcher.subscribe(self.handler("power"), attribute="power")
+        self.watcher.subscribe(self.handler("model"), model="plug")
+        self.watcher.subscribe(self.handler("heartbeat"), cmd="heartbeat")
+        self.watcher._handle_events(
+            {"cmd": "report", "sid": "lamp1", "model": "mono", "data": {"bright": 1}}
+        )
+        self.assertEqual(sorted(self.calls), ["all", "sid"])
+        self.calls.clear()
+        self.watcher._handle_events(
+            {"cmd": "report", "sid": "lamp1", "model": "mono", "data": {"power": "on"}}
+        )
+        self.assertEqual(sorted(self.calls), ["all", "power", "sid", "sid_power"])
+        self.calls.clear()
+        self.watcher._handle_events({"cmd": "heartbeat", "sid": "p", "model": "plug"})
+        self.assertEqual(sorted(self.calls), ["all", "heartbeat", "model"])
+
+    def test_unsubscribe(self):
+        handler = self.handler("all")
+        self.watcher.add_report_handler(handler)
+        self.watcher.add_report_handler(handler)
+        sub = self.watcher.subscribe(self.handler("sid"), sid="lamp1")
+        self.assertEqual(len(self.watcher.handlers), 2)
+        self.watcher.unsubscribe(sub)
+        self.watcher.remove_report_handler(handler)
+        self.assertEqual(len(self.watcher.handlers), 0)
+        self.watcher._handle_events({"sid": "lamp1"})
+        self.assertEqual(self.calls, [])
+
+
+class TestReactor(unittest.TestCase):
+    def setUp(self) -> None:
+        self.reactor = Reactor(threads=2, bufsize=1024)
+
+    def tearDown(self) -> None:
+        self.reactor.stop()
+
+    def test_datagram(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        received: List[bytes] = []
+        self.reactor.add_datagram(sock, lambda data, addr: received.append(data))
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            for i in range(3):
+                sender.sendto(b'{"n": %d}' % i, sock.getsockname())
+        wait_for(lambda: len(received) == 3)
+        self.assertEqual(received, [b'{"n": 0}', b'{"n": 1}', b'{"n": 2}'])
+        self.reactor.remove(sock)
+        sock.close()
+        self.assertEqual(len(self.reactor), 0)
+
+    def test_stream_lines(self):
+        local, remote = socket.socketpair()
+        lines: List[bytes] = []
+        closed = Event()
+        self.reactor.add_stream(local, lines.append, closed.set)
+        remote.sendall(b'{"a": 1}\r\n{"b"')
+        sleep(0.02)
+        remote.sendall(b": 2}\r\n\r\n")
+        wait_for(lambda: len(lines) == 2)
+        self.assertEqual(lines, [b'{"a": 1}', b'{"b": 2}'])
+        remote.close()
+        self.assertTrue(closed.wait(1))
+        self.reactor.remove(local)
+        local.close()
+
+    def test_eof_removed(self):
+        local, remote = socket.socketpair()
+        closed = Event()
+        self.reactor.add_stream(local, print, closed.set)
+        self.assertEqual(len(self.reactor), 1)
+        remote.close()
+        self.assertTrue(closed.wait(1))
+        self.assertEqual(len(self.reactor), 0)
+        self.assertEqual(sum(loop.count for loop in self.reactor._loops), 0)
+        local.close()
+
+    def test_long_line(self):
+        reactor = Reactor(bufsize=1024, max_line=4096)
+        local, remote = socket.socketpair()
+        lines: List[bytes] = []
+        closed = Event()
+        reactor.add_stream(local, lines.append, closed.set)
+        remote.sendall(b'{"a": 1}\n')
+        remote.sendall(b"x" * 5000)
+        self.assertTrue(closed.wait(1))
+        self.assertEqual(lines, [b'{"a": 1}'])
+        self.assertEqual(len(reactor), 0)
+        reactor.stop()
+        local.close()
+        remote.close()
+
+    def test_block_forbidden(self):
+        driver = ManualDriver()
+        driver.reactor_driven = True
+        with self.assertRaises(ValueError):
+            Watcher(driver, overflow=OverflowPolicy.BLOCK)
+        Watcher(driver, overflow=OverflowPolicy.COALESCE)
+
+
+class AsyncManualDriver(AsyncWatcherBaseDriver):
+    def __init__(self) -> None:
+        self.emit: Callable[[Dict[str, Any]], None] = print
+        self.stopped = False
+
+    async def watch(self, handler: Callable[[Dict[str, Any]], None]) -> None:
+        self.emit = handler
+        await asyncio.sleep(3600)
+
+    def stop(self) -> None:
+        self.stopped = True
+
+
+class Lamp(BaseDevice):
+    def __init__(self) -> None:
+        super().__init__("lamp")
+        self.status.register_attribute(Attribute("bright", int))
+        self.refreshed = 0
+
+    def refresh_status(self) -> None:
+        self.refreshed += 1
+        self.status.bright = self.refreshed
+
+
+class PollingWatcher(AsyncPollingWatcher):
+    def refresh(self) -> None:
+        self.device.refresh_status()
+
+
+async def async_wait_for(check: Callable[[], bool], timeout: float = 2) -> None:
+    for _ in range(int(timeout / 0.01)):
+        if check():
+            return
+        await asyncio.sleep(0.01)
+
+
+class FakeMqttClient:
+    """paho client stand-in with socketpair as broker connection"""
+
+    def __init__(self) -> None:
+        self.sock, self.broker = socket.socketpair()
+        self.reads = 0
+        self.reconnects = 0
+        self.on_disconnect: Callable[..., None] = print
+
+    def socket(self) -> socket.socket:
+        return self.sock
+
+    def want_write(self) -> bool:
+        return False
+
+    def loop_read(self) -> None:
+        self.reads += 1
+        self.sock.recv(1024)
+
+    def loop_write(self) -> None:
+        pass
+
+    def loop_misc(self) -> None:
+        pass
+
+    def drop(self) -> None:
+        self.on_socket_close(self, None, self.sock)
+        self.sock.close()
+        self.broker.close()
+        self.on_disconnect(self, None, 7)
+
+    def reconnect(self) -> None:
+        self.reconnects += 1
+        self.sock, self.broker = socket.socketpair()
+        self.on_socket_open(self, None, self.sock)
+
+
+class FakeMqttGateway:
+    _connected = True
+    _subdevices: Dict[str, Any] = {}
+
+
+class TestAsyncWatcher(unittest.IsolatedAsyncioTestCase):
+    async def test_handlers(self):
+        driver = AsyncManualDriver()
+        watcher = AsyncWatcher(driver)
+        events: List[Dict[str, Any]] = []
+
+        async def async_handler(event: Dict[str, Any]) -> None:
+            await asyncio.sleep(0)
+            events.append(event)
+
+        watcher.add_report_handler(async_handler)
+        watcher.start()
+        await asyncio.sleep(0)
+        for i in range(3):
+            driver.emit({"sid": "dev", "data": {"n": i}})
+        await asyncio.sleep(0.05)
+        await watcher.stop()
+        self.assertEqual([e["data"]["n"] for e in events], [0, 1, 2])
+        self.assertTrue(driver.stopped)
+
+    async def test_polling(self):
+        lamp = Lamp()
+        watcher = AsyncWatcher(PollingWatcher(0.02, lamp))
+        events: List[Dict[str, Any]] = []
+        watcher.add_report_handler(events.append)
+        watcher.start()
+        await async_wait_for(lambda: len(events) == 1)
+        lamp.status.bright = 100
+        await async_wait_for(lambda: len(events) == 2)
+        await watcher.stop()
+        self.assertEqual(events[0]["data"], {"bright": 1})
+        self.assertEqual(events[1]["data"], {"bright": 100})
+
+    async def test_mqtt_reconnect(self):
+        client = FakeMqttClient()
+        driver = AsyncZigbee2mqttWatcher(
+            client, FakeMqttGateway(), reconnect_delay=0.01
+        )
+        task = asyncio.get_running_loop().create_task(driver.watch(print))
+        await asyncio.sleep(0.01)
+        client.broker.send(b"a")
+        await async_wait_for(lambda: client.reads == 1)
+        client.drop()
+        await async_wait_for(lambda: client.reconnects == 1)
+        client.broker.send(b"b")
+        await async_wait_for(lambda: client.reads == 2)
+        driver.stop()
+        await task
+        self.assertEqual(client.reads, 2)
+        client.sock.close()
+        client.broker.close()
+
+    async def test_polling_offline(self):
+        lamp = Lamp()
+        refresh = lamp.refresh_status
+
+        def refresh_status() -> None:
+            if lamp.refreshed == 0:
+                lamp.refreshed += 1
+                raise DeviceTimeout
+            refresh()
+
+        lamp.refresh_status = refresh_status
+        watcher = AsyncWatcher(PollingWatcher(0.01, lamp))
+        events: List[Dict[str, Any]] = []
+        watcher.add_report_handler(events.append)
+        watcher.start()
+        await asyncio.sleep(0.05)
+        await watcher.stop()
+        self.assertGreater(lamp.refreshed, 1)
+        self.assertEqual(events[0]["data"], {"bright": 2})
+
+
+class FlakyLamp(BaseDevice):
+    def __init__(self) -> None:
+        super().__init__("lamp")
+        self.status.register_attribute(Attribute("bright", int))
+        self.status.register_attribute(Attribute("power", str))
+        self.polls: List[float] = []
+        self.offline = False
+
+    def refresh_status(self) -> None:
+        self.polls.append(monotonic())
+        if self.offline:
+            raise DeviceTimeout
+        self.status.bright = len(self.polls)
+
+
+class LampPollingWatcher(scheduler.PollingWatcher):
+    def refresh(self) -> None:
+        self.device.refresh_status()
+
+
+class TestPollingScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.scheduler = scheduler.PollingScheduler(workers=2, jitter=0)
+        self.lamp = FlakyLamp()
+        self.events: List[Dict[str, Any]] = []
+        self.driver = LampPollingWatcher(0.05, self.lamp, self.scheduler)
+        self.driver.job.fast_interval = 0.01
+
+    def tearDown(self) -> None:
+        self.driver.stop()
+
+    def test_poll_and_report(self):
+        self.driver.watch(self.events.append)
+        wait_for(lambda: len(self.events) >= 2)
+        self.assertEqual(self.events[0]["data"], {"bright": 1})
+        self.assertEqual(self.events[1]["data"], {"bright": 2})
+
+    def test_command_reported_without_poll(self):
+        self.driver.job.interval = 10
+        polls_at_report: List[int] = []
+
+        def handler(event: Dict[str, Any]) -> None:
+            polls_at_report.append(len(self.lamp.polls))
+            self.events.append(event)
+
+        self.driver.watch(handler)
+        self.lamp.status.power = "on"
+        wait_for(lambda: len(self.events) >= 1)
+        self.assertEqual(self.events[0]["data"], {"power": "on"})
+        self.assertEqual(polls_at_report[0], 0)
+        wait_for(lambda: len(self.lamp.polls) == 3)
+        self.assertEqual(len(self.lamp.polls), 3)
+
+    def test_backoff(self):
+        self.lamp.offline = True
+        self.driver.job.max_backoff = 0.2
+        self.driver.watch(self.events.append)
+        wait_for(lambda: len(self.lamp.polls) == 4)
+        gaps = [b - a for a, b in zip(self.lamp.polls, self.lamp.polls[1:])]
+        self.assertGreater(gaps[1], gaps[0] * 1.5)
+        self.assertLess(gaps[2], 0.3)
+        self.assertEqual(self.driver.job.failures, 4)
+        self.lamp.offline = False
+        wait_for(lambda: self.driver.job.failures == 0)
+        self.assertEqual(self.events[-1]["data"], {"bright": len(self.lamp.polls)})
+
+    def test_bravia_backoff(self):
+        tv = KDL48W585B("127.0.0.1:1")
+        driver = BraviaWatcher(0.02, tv, self.scheduler)
+        driver.job.max_backoff = 0.2
+        driver.watch(self.events.append)
+        wait_for(lambda: driver.job.failures >= 3)
+        driver.stop()
+        self.assertGreaterEqual(driver.job.failures, 3)
+        self.assertGreater(driver.job.next_delay(), 0.02)
+        self.assertEqual(tv.status.power, "off")
+
+
+class TestMulticastListener(unittest.TestCase):
+    def setUp(self) -> None:
+        self.reactor = Reactor()
+        self.listener = aqara.MulticastListener(self.reactor)
+        self.events: Dict[str, List[Dict[str, Any]]] = {"gw1": [], "gw2": []}
+        self.gw1 = aqara.SharedGatewayWatcher("gw1", "10.0.0.1", self.listener)
+        self.gw2 = aqara.SharedGatewayWatcher("gw2", "10.0.0.2", self.listener)
+        self.gw1.watch(self.events["gw1"].append)
+        self.gw2.watch(self.events["gw2"].append)
+
+    def tearDown(self) -> None:
+        self.gw1.stop()
+        self.gw2.stop()
+        self.reactor.stop()
+
+    def report(self, sid: str, ip: str) -> None:
+        data = json.dumps({"cmd": "report", "sid": sid, "data": '{"status":"on"}'})
+        self.listener._on_datagram(data.encode(), (ip, 4321))
+
+    def test_route_by_sid(self):
+        self.gw1.add_device("plug1")
+        self.gw2.add_device("plug2")
+        self.report("plug1", "10.0.0.9")
+        self.report("plug2", "10.0.0.9")
+        self.report("gw2", "10.0.0.9")
+        self.assertEqual([e["sid"] for e in self.events["gw1"]], ["plug1"])
+        self.assertEqual([e["sid"] for e in self.events["gw2"]], ["plug2", "gw2"])
+        self.assertEqual(self.events["gw1"][0]["data"], {"status": "on"})
+
+    def test_route_by_ip(self):
+        self.report("new_device", "10.0.0.2")
+        self.report("unknown", "10.0.0.9")
+        self.assertEqual(self.events["gw1"], [])
+        self.assertEqual([e["sid"] for e in self.events["gw2"]], ["new_device"])
+
+    def test_stop(self):
+        self.gw1.add_device("plug1")
+        self.gw1.stop()
+        self.report("plug1", "10.0.0.1")
+        self.assertEqual(self.events["gw1"], [])
+        self.assertEqual(len(self.listener), 1)
+        self.assertIsNotNone(self.listener.sock)
+        self.gw2.stop()
+        self.assertIsNone(self.listener.sock)